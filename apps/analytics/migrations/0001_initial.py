@@ -0,0 +1,120 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0012_policybranchofficeday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HighWaterMark',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='name')),
+                ('value', models.DateTimeField(null=True, verbose_name='value')),
+            ],
+            options={
+                'verbose_name': 'high water mark',
+                'verbose_name_plural': 'high water marks',
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentDay',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+                ('day', models.DateField(verbose_name='day')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='quantity')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total')),
+                ('total_amount_bs', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total bs')),
+                ('refreshed', models.DateTimeField(verbose_name='refreshed')),
+                ('status', models.SmallIntegerField(choices=[(0, 'pendiente'), (1, 'rechazado'), (2, 'aceptado')], verbose_name='status')),
+                ('coin', models.CharField(max_length=255, verbose_name='coin')),
+                ('adviser', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='adviser')),
+                ('branch_office', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.branchoffice', verbose_name='branch office')),
+                ('plan', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.plan', verbose_name='plan')),
+                ('use', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.use', verbose_name='use')),
+            ],
+            options={
+                'verbose_name': 'payment day',
+                'verbose_name_plural': 'payment days',
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PolicyDay',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+                ('day', models.DateField(verbose_name='day')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='quantity')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total')),
+                ('total_amount_bs', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total bs')),
+                ('refreshed', models.DateTimeField(verbose_name='refreshed')),
+                ('status', models.SmallIntegerField(choices=[(0, 'Pendiente de pago'), (1, 'Pendiente de aprobación'), (2, 'Aprobado'), (3, 'Vencido'), (4, 'Pago rechazado')], verbose_name='status')),
+                ('total_insured_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total insured')),
+                ('total_insured_amount_bs', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total insured bs')),
+                ('adviser', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='adviser')),
+                ('branch_office', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.branchoffice', verbose_name='branch office')),
+                ('plan', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.plan', verbose_name='plan')),
+                ('use', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.use', verbose_name='use')),
+            ],
+            options={
+                'verbose_name': 'policy day',
+                'verbose_name_plural': 'policy days',
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PremiumDay',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+                ('day', models.DateField(verbose_name='day')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='quantity')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total')),
+                ('total_amount_bs', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total bs')),
+                ('refreshed', models.DateTimeField(verbose_name='refreshed')),
+                ('status', models.SmallIntegerField(choices=[(0, 'Pendiente de pago'), (1, 'Pendiente de aprobación'), (2, 'Aprobado'), (3, 'Vencido'), (4, 'Pago rechazado')], verbose_name='status')),
+                ('total_insured_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total insured')),
+                ('total_insured_amount_bs', models.DecimalField(decimal_places=2, default=0.0, max_digits=50, verbose_name='total insured bs')),
+                ('coverage', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.coverage', verbose_name='coverage')),
+                ('adviser', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='adviser')),
+                ('branch_office', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.branchoffice', verbose_name='branch office')),
+                ('plan', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.plan', verbose_name='plan')),
+                ('use', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.use', verbose_name='use')),
+            ],
+            options={
+                'verbose_name': 'premium day',
+                'verbose_name_plural': 'premium days',
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='paymentday',
+            index=models.Index(fields=['day', 'branch_office'], name='analytics_payment_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='policyday',
+            index=models.Index(fields=['day', 'branch_office'], name='analytics_policy_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumday',
+            index=models.Index(fields=['day', 'branch_office'], name='analytics_premium_day_idx'),
+        ),
+    ]
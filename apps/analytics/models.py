@@ -0,0 +1,90 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from apps.core.models import ModelBase, BranchOffice, Plan, Use, Coverage, Policy
+from apps.payment.models import Payment
+
+
+class DailyRollup(ModelBase):
+    """
+    Totals of a day per branch office, adviser, plan, use and status, rebuilt by `refresh_rollups`.
+    """
+    day = models.DateField(verbose_name=_('day'))
+    branch_office = models.ForeignKey(BranchOffice, verbose_name=_('branch office'), related_name='+',
+                                      on_delete=models.CASCADE, null=True)
+    adviser = models.ForeignKey('security.User', verbose_name=_('adviser'), related_name='+',
+                                on_delete=models.CASCADE, null=True)
+    plan = models.ForeignKey(Plan, verbose_name=_('plan'), related_name='+', on_delete=models.CASCADE, null=True)
+    use = models.ForeignKey(Use, verbose_name=_('use'), related_name='+', on_delete=models.CASCADE, null=True)
+    quantity = models.PositiveIntegerField(verbose_name=_('quantity'), default=0)
+    total_amount = models.DecimalField(max_digits=50, decimal_places=2, verbose_name=_('total'), default=0.0)
+    total_amount_bs = models.DecimalField(max_digits=50, decimal_places=2, verbose_name=_('total bs'), default=0.0)
+    refreshed = models.DateTimeField(verbose_name=_('refreshed'))
+
+    class Meta:
+        abstract = True
+        ordering = ['day']
+
+
+class PolicyDay(DailyRollup):
+    created_by = models.ForeignKey('security.User', verbose_name=_('created by'), related_name='+',
+                                   on_delete=models.CASCADE, null=True)
+    status = models.SmallIntegerField(choices=Policy.STATUSES, verbose_name=_('status'))
+    total_insured_amount = models.DecimalField(max_digits=50, decimal_places=2, verbose_name=_('total insured'),
+                                               default=0.0)
+    total_insured_amount_bs = models.DecimalField(max_digits=50, decimal_places=2,
+                                                  verbose_name=_('total insured bs'), default=0.0)
+
+    class Meta(DailyRollup.Meta):
+        verbose_name = _('policy day')
+        verbose_name_plural = _('policy days')
+        indexes = [
+            models.Index(fields=['day', 'branch_office'], name='analytics_policy_day_idx'),
+        ]
+
+
+class PremiumDay(DailyRollup):
+    """
+    Premiums sold (`PolicyCoverage`) per coverage, the day and status are the ones of the policy.
+    """
+    coverage = models.ForeignKey(Coverage, verbose_name=_('coverage'), related_name='+', on_delete=models.CASCADE,
+                                 null=True)
+    status = models.SmallIntegerField(choices=Policy.STATUSES, verbose_name=_('status'))
+    total_insured_amount = models.DecimalField(max_digits=50, decimal_places=2, verbose_name=_('total insured'),
+                                               default=0.0)
+    total_insured_amount_bs = models.DecimalField(max_digits=50, decimal_places=2,
+                                                  verbose_name=_('total insured bs'), default=0.0)
+
+    class Meta(DailyRollup.Meta):
+        verbose_name = _('premium day')
+        verbose_name_plural = _('premium days')
+        indexes = [
+            models.Index(fields=['day', 'branch_office'], name='analytics_premium_day_idx'),
+        ]
+
+
+class PaymentDay(DailyRollup):
+    """
+    Payments per coin, the branch office, adviser, plan and use are the ones of the policy paid.
+    """
+    status = models.SmallIntegerField(choices=Payment._meta.get_field('status').choices, verbose_name=_('status'))
+    coin = models.CharField(max_length=255, verbose_name=_('coin'))
+
+    class Meta(DailyRollup.Meta):
+        verbose_name = _('payment day')
+        verbose_name_plural = _('payment days')
+        indexes = [
+            models.Index(fields=['day', 'branch_office'], name='analytics_payment_day_idx'),
+        ]
+
+
+class HighWaterMark(models.Model):
+    """
+    `updated` of the transactional rows up to which a rollup is current.
+    """
+    name = models.CharField(max_length=100, primary_key=True, verbose_name=_('name'))
+    value = models.DateTimeField(null=True, verbose_name=_('value'))
+
+    class Meta:
+        verbose_name = _('high water mark')
+        verbose_name_plural = _('high water marks')
@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+from apps.analytics.models import PolicyDay, PremiumDay, PaymentDay
+
+
+class PolicyDayDefaultSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = PolicyDay
+        exclude = ('created', 'updated',)
+
+
+class PremiumDayDefaultSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = PremiumDay
+        exclude = ('created', 'updated',)
+
+
+class PaymentDayDefaultSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = PaymentDay
+        exclude = ('created', 'updated',)
@@ -0,0 +1,121 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Sum, F, Q, Case, When, DecimalField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from money.currency import Currency
+
+from apps.analytics.models import PolicyDay, PremiumDay, PaymentDay, HighWaterMark
+from apps.core.models import Policy, PolicyCoverage
+from apps.payment.models import Payment
+
+HIGH_WATER_MARK = 'analytics'
+# Se solapa un margen por las transacciones que confirmaron despues de la ultima lectura
+ROLLUP_OVERLAP = datetime.timedelta(minutes=5)
+BATCH_SIZE = 1000
+
+AMOUNT = DecimalField(max_digits=50, decimal_places=2)
+
+
+def policy_rows(days=None):
+    policies = Policy.objects.annotate(day=TruncDate('created'))
+    if days is not None:
+        policies = policies.filter(day__in=days)
+    return policies.order_by().values(
+        'day', 'adviser_id', 'created_by_id', 'plan_id', 'status',
+        branch_office_id=F('created_by__branch_office_id'), use_id=F('vehicle__use_id'),
+    ).annotate(
+        quantity=Count('id'),
+        total_amount=Sum('total_amount'),
+        total_insured_amount=Sum('total_insured_amount'),
+        total_amount_bs=Sum(F('total_amount') * F('change_factor'), output_field=AMOUNT),
+        total_insured_amount_bs=Sum(F('total_insured_amount') * F('change_factor'), output_field=AMOUNT),
+    )
+
+
+def premium_rows(days=None):
+    items = PolicyCoverage.objects.filter(policy__isnull=False).annotate(day=TruncDate('policy__created'))
+    if days is not None:
+        items = items.filter(day__in=days)
+    return items.order_by().values(
+        'day', 'coverage_id',
+        branch_office_id=F('policy__created_by__branch_office_id'), adviser_id=F('policy__adviser_id'),
+        plan_id=F('policy__plan_id'), use_id=F('policy__vehicle__use_id'), status=F('policy__status'),
+    ).annotate(
+        quantity=Count('id'),
+        total_amount=Sum('cost'),
+        total_insured_amount=Sum('insured_amount'),
+        total_amount_bs=Sum(F('cost') * F('policy__change_factor'), output_field=AMOUNT),
+        total_insured_amount_bs=Sum(F('insured_amount') * F('policy__change_factor'), output_field=AMOUNT),
+    )
+
+
+def payment_rows(days=None):
+    payments = Payment.objects.annotate(day=TruncDate('created'))
+    if days is not None:
+        payments = payments.filter(day__in=days)
+    return payments.order_by().values(
+        'day', 'status', 'coin',
+        branch_office_id=F('policy__created_by__branch_office_id'), adviser_id=F('policy__adviser_id'),
+        plan_id=F('policy__plan_id'), use_id=F('policy__vehicle__use_id'),
+    ).annotate(
+        quantity=Count('id'),
+        total_amount=Sum('amount'),
+        total_amount_bs=Sum(Case(
+            When(coin=Currency.VEF.value, then=F('amount')),
+            default=F('amount') * F('change_factor'),
+            output_field=AMOUNT
+        )),
+    )
+
+
+def changed_days(queryset, since, field='created'):
+    return set(queryset.filter(since).annotate(day=TruncDate(field)).order_by().values_list(
+        'day', flat=True
+    ).distinct())
+
+
+def rebuild(model, rows, days, refreshed) -> int:
+    """
+    Replace the rows of `days` (every row when None) with the aggregate `rows`.
+    """
+    rollup = model.objects.all()
+    if days is not None:
+        if not days:
+            return 0
+        rollup = rollup.filter(day__in=days)
+    rollup.delete()
+    instances = [model(refreshed=refreshed, **row) for row in rows]
+    return len(model.objects.bulk_create(instances, batch_size=BATCH_SIZE))
+
+
+@transaction.atomic()
+def refresh_rollups(full=False) -> dict:
+    """
+    Rebuild the days of the rollups with rows updated since the high water mark, every day when `full` or
+    on the first run. Returns the rows written per rollup.
+    """
+    now = timezone.now()
+    mark, _ = HighWaterMark.objects.select_for_update().get_or_create(name=HIGH_WATER_MARK)
+    if full or mark.value is None:
+        policy_days = premium_days = payment_days = None
+    else:
+        since = mark.value - ROLLUP_OVERLAP
+        policy_days = changed_days(Policy.objects.all(), Q(updated__gte=since))
+        premium_days = policy_days | changed_days(
+            PolicyCoverage.objects.filter(policy__isnull=False), Q(updated__gte=since), 'policy__created'
+        )
+        # Las dimensiones de un pago son las de su poliza
+        payment_days = changed_days(
+            Payment.objects.all(), Q(updated__gte=since) | Q(policy__updated__gte=since)
+        )
+
+    result = {
+        'policies': rebuild(PolicyDay, policy_rows(policy_days), policy_days, now),
+        'premiums': rebuild(PremiumDay, premium_rows(premium_days), premium_days, now),
+        'payments': rebuild(PaymentDay, payment_rows(payment_days), payment_days, now),
+    }
+    mark.value = now
+    mark.save(update_fields=['value'])
+    return result
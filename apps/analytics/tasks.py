@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from apps.analytics.services import refresh_rollups
+
+
+@shared_task(ignore_result=False)
+def refresh_analytics(full=False):
+    return refresh_rollups(full=full)
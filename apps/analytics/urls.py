@@ -0,0 +1,13 @@
+from rest_framework import routers
+
+from apps.analytics.views import PolicyDayViewSet, PremiumDayViewSet, PaymentDayViewSet
+
+router = routers.SimpleRouter()
+router.register(r'policy_day', PolicyDayViewSet)
+router.register(r'premium_day', PremiumDayViewSet)
+router.register(r'payment_day', PaymentDayViewSet)
+
+urlpatterns = [
+]
+
+urlpatterns += router.urls
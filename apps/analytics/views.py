@@ -0,0 +1,107 @@
+from django.db.models import Sum
+from django_filters import rest_framework as filters
+from django_filters.rest_framework import DjangoFilterBackend
+from django.utils.translation import gettext_lazy as _
+from rest_framework import mixins, status, serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from apps.analytics.models import PolicyDay, PremiumDay, PaymentDay
+from apps.analytics.serializers import PolicyDayDefaultSerializer, PremiumDayDefaultSerializer, \
+    PaymentDayDefaultSerializer
+
+DIMENSIONS = ['day', 'branch_office', 'adviser', 'plan', 'use', 'status']
+
+
+class RollupFilter(filters.FilterSet):
+    min_day = filters.DateFilter(field_name="day", lookup_expr='gte')
+    max_day = filters.DateFilter(field_name="day", lookup_expr='lte')
+
+    class Meta:
+        fields = ['day', 'branch_office', 'adviser', 'plan', 'use', 'status']
+
+
+class PolicyDayFilter(RollupFilter):
+    class Meta(RollupFilter.Meta):
+        model = PolicyDay
+
+
+class PremiumDayFilter(RollupFilter):
+    class Meta(RollupFilter.Meta):
+        model = PremiumDay
+        fields = RollupFilter.Meta.fields + ['coverage']
+
+
+class PaymentDayFilter(RollupFilter):
+    class Meta(RollupFilter.Meta):
+        model = PaymentDay
+        fields = RollupFilter.Meta.fields + ['coin']
+
+
+class RollupViewSet(mixins.ListModelMixin, GenericViewSet):
+    """
+    Read only access to a rollup, it never queries the transactional tables.
+    """
+    filter_backends = [DjangoFilterBackend]
+    dimensions = DIMENSIONS
+    metrics = ['quantity', 'total_amount', 'total_amount_bs']
+
+    def get_queryset(self):
+        queryset = self.queryset
+        user = self.request.user
+        if user.is_superuser:
+            return queryset
+        if user.is_staff:
+            return queryset.filter(adviser_id=user.id)
+        return queryset.none()
+
+    def paginate_queryset(self, queryset):
+        """
+        Return a single page of results, or `None` if pagination is disabled.
+        """
+        not_paginator = self.request.query_params.get('not_paginator', None)
+        if self.paginator is None or not_paginator:
+            return None
+        return self.paginator.paginate_queryset(queryset, self.request, view=self)
+
+    @action(methods=['GET'], detail=False)
+    def summary(self, request):
+        """
+        Totals grouped by the dimensions of `group_by` (comma separated), the filters of the list apply.
+        """
+        group_by = [value for value in request.query_params.get('group_by', '').split(',') if value]
+        invalid = [value for value in group_by if value not in self.dimensions]
+        if invalid:
+            raise serializers.ValidationError(
+                detail={'error': _('Agrupación inválida: {0}').format(', '.join(invalid))}
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        totals = {metric: Sum(metric) for metric in self.metrics}
+        if group_by:
+            data = list(queryset.order_by(*group_by).values(*group_by).annotate(**totals))
+        else:
+            data = [queryset.aggregate(**totals)]
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class PolicyDayViewSet(RollupViewSet):
+    queryset = PolicyDay.objects.all()
+    filterset_class = PolicyDayFilter
+    serializer_class = PolicyDayDefaultSerializer
+    metrics = RollupViewSet.metrics + ['total_insured_amount', 'total_insured_amount_bs']
+
+
+class PremiumDayViewSet(RollupViewSet):
+    queryset = PremiumDay.objects.all()
+    filterset_class = PremiumDayFilter
+    serializer_class = PremiumDayDefaultSerializer
+    dimensions = DIMENSIONS + ['coverage']
+    metrics = RollupViewSet.metrics + ['total_insured_amount', 'total_insured_amount_bs']
+
+
+class PaymentDayViewSet(RollupViewSet):
+    queryset = PaymentDay.objects.all()
+    filterset_class = PaymentDayFilter
+    serializer_class = PaymentDayDefaultSerializer
+    dimensions = DIMENSIONS + ['coin']
@@ -1,66 +1,150 @@
+import asyncio
 import json
+import time
 
-from channels.auth import login
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from constance.admin import config
-from constance.backends.database.models import Constance
-from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.utils.encoders import JSONEncoder
 
-from .models import Room, Message
+from .models import Message
+from .presence import Presence
+from .serializers import RoomMessageSerializer
+from .services import history, room_group_name, get_room, can_read
+from .writer import get_writer
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         ''' Cliente se conecta '''
-        # Recoge el nombre de la sala
-        prefix_app = await self.get_prefix_app()
+        self.user = self.scope.get('user', None)
+        if self.user is None or not self.user.is_authenticated:
+            await self.close()
+            return
+        # La sala, el prefijo y el usuario se resuelven una sola vez por conexion
+        self.user_id = str(self.user.id)
+        self.user_name = self.user.full_name
         self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
-        self.room_group_name = prefix_app + "_%s" % self.room_name
+        group_name, room = await self.get_room()
+        if not can_read(room, self.user):
+            await self.close()
+            return
+        self.room_group_name, self.room_id = group_name, room.id
+        self.presence = Presence(self.channel_layer, self.room_group_name)
+        self.typing_until = 0
+        self.last_keystroke = 0
+        self.typing_task = None
         # Se une a la sala
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
         # Informa al cliente del éxito
         await self.accept()
+        if await self.presence.join(self.user_id, self.user_name, self.channel_name):
+            await self.send_presence("joined")
+        if self.presence.enabled:
+            self.heartbeat_task = asyncio.ensure_future(self.heartbeat())
 
     async def disconnect(self, close_code):
         ''' Cliente se desconecta '''
-        # Leave room group
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if hasattr(self, 'room_group_name'):
+            if hasattr(self, 'heartbeat_task'):
+                self.heartbeat_task.cancel()
+            if self.typing_task is not None:
+                self.typing_task.cancel()
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+            if await self.presence.leave(self.user_id, self.channel_name):
+                await self.send_presence("left")
+            # Lo pendiente se escribe antes de que el proceso pueda terminar
+            await get_writer().flush()
 
     async def receive(self, text_data):
         ''' Cliente envía información y nosotros la recibimos '''
-        prefix_app = await self.get_prefix_app()
         text_data_json = json.loads(text_data)
-        # login the user to this session.
-        await login(self.scope, self.scope['user'])
-        # save the session (if the session backend does not access the db you can use `sync_to_async`)
-        await database_sync_to_async(self.scope["session"].save)()
-        user_id = text_data_json["user_id"]
+        if text_data_json.get("type", None) == "load_more":
+            await self.load_more(text_data_json.get("cursor", None), text_data_json.get("limit", None))
+            return
+        if text_data_json.get("type", None) == "online":
+            await self.send(text_data=json.dumps({"type": "online", "members": await self.presence.members()}))
+            return
         text = text_data_json["text"]
         writing = text_data_json["writing"]
 
-        if not writing:
-            await self.create_message(text)
-
-        writing = text_data_json["writing"]
-
-        if not writing:
-            await self.create_message(text)
-            await self.notify(text)
+        if writing:
+            # Solo el primer aviso de cada ventana llega a la sala, los avisos no se guardan
+            if not await self.start_typing():
+                return
+        else:
+            if self.typing_task is not None and not self.typing_task.done():
+                self.typing_task.cancel()
+                await self.stop_typing()
+            get_writer().add(Message(type='chat_message', user_id=self.user.id, text=text), self.room_id)
 
         # Enviamos el mensaje a la sala
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 "type": "chat_message",
-                "user_id": user_id,
+                "user_id": self.user_id,
+                "user_name": self.user_name,
                 "text": text,
                 "writing": writing,
             },
         )
 
+    async def start_typing(self) -> bool:
+        now = time.monotonic()
+        self.last_keystroke = now
+        if now < self.typing_until:
+            return False
+        started = await self.presence.typing(self.user_id)
+        if self.presence.enabled:
+            self.typing_until = now + self.presence.typing_ttl
+            if self.typing_task is None or self.typing_task.done():
+                self.typing_task = asyncio.ensure_future(self.watch_typing())
+        return started
+
+    async def watch_typing(self):
+        ''' Avisa a la sala cuando pasa una ventana sin teclas '''
+        ttl = self.presence.typing_ttl
+        while time.monotonic() - self.last_keystroke < ttl:
+            await asyncio.sleep(ttl - (time.monotonic() - self.last_keystroke))
+        await self.stop_typing()
+
+    async def stop_typing(self):
+        self.typing_until = 0
+        await self.presence.stop_typing(self.user_id)
+        await self.send_presence("stopped_typing")
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(self.presence.ttl / 2)
+            await self.presence.refresh(self.user_id, self.channel_name)
+
+    async def send_presence(self, event):
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                "type": "presence_message",
+                "event": event,
+                "user_id": self.user_id,
+                "user_name": self.user_name,
+            },
+        )
+
+    async def presence_message(self, event):
+        ''' Entradas y salidas de la sala '''
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "presence",
+                    "event": event["event"],
+                    "user_id": event["user_id"],
+                    "user_name": event["user_name"],
+                    "room": self.room_group_name,
+                }
+            )
+        )
+
     async def smart_message(self, event):
         ''' Recibimos información de la sala '''
         await self.send(
@@ -71,41 +155,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         ''' Recibimos información de la sala '''
-        user = self.scope['user']
-        user_id = str(user.id)
-        text = event["text"]
-        writing = event["writing"]
-        user_name = user.full_name
         # Send message to WebSocket
         await self.send(
             text_data=json.dumps(
                 {
                     "type": "chat_message",
-                    "user_id": user_id,
-                    "user_name": user_name,
-                    "text": text,
+                    "user_id": event["user_id"],
+                    "user_name": event["user_name"],
+                    "text": event["text"],
                     "room": self.room_group_name,
-                    "writing": writing
+                    "writing": event["writing"]
                 }
             )
         )
 
-    def get_room(self):
-        staff_only = True if self.room_group_name == 'chat_admin' else False
-        room, _ = Room.objects.get_or_create(title=self.room_group_name.replace('chat_', ''), staff_only=staff_only)
-        return room
+    async def load_more(self, cursor, limit):
+        ''' Página del historial de la sala anterior a `cursor` '''
+        try:
+            data = await self.get_history(cursor, limit)
+        except (TypeError, ValueError):
+            data = {"type": "history", "error": "Cursor inválido"}
+        await self.send(text_data=json.dumps(data, cls=JSONEncoder))
 
     @database_sync_to_async
-    def create_message(self, text: str):
-        user = self.scope['user']
-        room = self.get_room()
-        room.messages.add(Message.objects.create(type='chat_message', user_id=user.id, text=text))
+    def get_history(self, cursor, limit):
+        rows, next_cursor = history(self.room_id, cursor, int(limit) if limit else None)
+        return {"type": "history", "results": RoomMessageSerializer(rows, many=True).data, "cursor": next_cursor}
 
     @database_sync_to_async
-    def get_prefix_app(self):
-        try:
-            prefix_app = Constance.objects.get(key="PREFIX_APP").value
-        except ObjectDoesNotExist:
-            getattr(config, "PREFIX_APP")
-            prefix_app = Constance.objects.get(key="PREFIX_APP").value
-        return prefix_app
+    def get_room(self):
+        group_name = room_group_name(self.room_name)
+        return group_name, get_room(group_name, create=True)
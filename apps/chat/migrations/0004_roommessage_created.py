@@ -0,0 +1,33 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+def copy_created(apps, schema_editor):
+    Message = apps.get_model('chat', 'Message')
+    RoomMessage = apps.get_model('chat', 'RoomMessage')
+    RoomMessage.objects.update(
+        created=Subquery(Message.objects.filter(pk=OuterRef('message_id')).values('created')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_alter_member_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roommessage',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='created'),
+        ),
+        migrations.RunPython(copy_created, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='roommessage',
+            index=models.Index(fields=['room', '-created', '-id'], name='room_message_history_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 import uuid
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from apps.core.models import ModelBase
 
@@ -38,8 +39,13 @@ class RoomMessage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     message = models.ForeignKey('Message', verbose_name=_('message'), on_delete=models.CASCADE)
     room = models.ForeignKey('Room', verbose_name=_('room'), on_delete=models.CASCADE)
+    # Copia de message.created para paginar el historial de la sala con un solo indice
+    created = models.DateTimeField(verbose_name=_('created'), default=timezone.now)
 
     class Meta:
         verbose_name = _('room message')
         verbose_name_plural = _('room messages')
+        indexes = [
+            models.Index(fields=['room', '-created', '-id'], name='room_message_history_idx'),
+        ]
 
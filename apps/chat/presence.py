@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+
+ONLINE_KEY = 'presence:online:{0}'
+NAMES_KEY = 'presence:names:{0}'
+TYPING_KEY = 'presence:typing:{0}:{1}'
+
+
+class Presence:
+    """
+    Online and typing state of a room kept in Redis through the connection pool of the `channels_redis` layer.
+
+    - Online: sorted set of `user_id:channel_name` scored with the time the connection expires, the consumers
+      refresh it every `PRESENCE_TTL / 2` seconds so the connections of a dead process drop by themselves.
+    - Typing: a key per user expiring after `PRESENCE_TYPING_TTL` seconds, only the first keystroke of each
+      window reaches the room and the consumer tells the room when the user stops.
+
+    With a layer that is not Redis (the in memory one of the tests) nothing is tracked and every typing frame
+    is broadcast as before.
+    """
+
+    def __init__(self, layer, group_name):
+        self.layer = layer
+        self.group_name = group_name
+        self.enabled = hasattr(layer, 'connection') and hasattr(layer, 'consistent_hash')
+        self.ttl = settings.PRESENCE_TTL
+        self.typing_ttl = settings.PRESENCE_TYPING_TTL
+        self.online_key = ONLINE_KEY.format(group_name)
+        self.names_key = NAMES_KEY.format(group_name)
+
+    def connection(self):
+        # Todas las claves de la sala en el mismo servidor
+        return self.layer.connection(self.layer.consistent_hash(self.group_name))
+
+    async def online_channels(self, connection, now):
+        await connection.zremrangebyscore(self.online_key, max=now)
+        return await connection.zrangebyscore(self.online_key, min=now, encoding='utf-8')
+
+    async def join(self, user_id, user_name, channel_name) -> bool:
+        """
+        Register the connection, True when it is the first one of the user in the room.
+        """
+        if not self.enabled:
+            return False
+        now = time.time()
+        async with self.connection() as connection:
+            members = await self.online_channels(connection, now)
+            await connection.zadd(self.online_key, now + self.ttl, '{0}:{1}'.format(user_id, channel_name))
+            await connection.hset(self.names_key, user_id, user_name)
+            await connection.expire(self.online_key, self.ttl)
+            await connection.expire(self.names_key, self.ttl)
+        return not any(member.split(':', 1)[0] == user_id for member in members)
+
+    async def refresh(self, user_id, channel_name):
+        if not self.enabled:
+            return
+        async with self.connection() as connection:
+            await connection.zadd(self.online_key, time.time() + self.ttl, '{0}:{1}'.format(user_id, channel_name))
+            await connection.expire(self.online_key, self.ttl)
+            await connection.expire(self.names_key, self.ttl)
+
+    async def leave(self, user_id, channel_name) -> bool:
+        """
+        Remove the connection, True when the user has no other connection in the room.
+        """
+        if not self.enabled:
+            return False
+        async with self.connection() as connection:
+            await connection.zrem(self.online_key, '{0}:{1}'.format(user_id, channel_name))
+            await connection.delete(TYPING_KEY.format(self.group_name, user_id))
+            members = await self.online_channels(connection, time.time())
+        return not any(member.split(':', 1)[0] == user_id for member in members)
+
+    async def typing(self, user_id) -> bool:
+        """
+        Mark the user as typing, True when a new window starts so the room has to be told. The key is not
+        extended: a user that keeps typing is announced once per `PRESENCE_TYPING_TTL` window.
+        """
+        if not self.enabled:
+            return True
+        async with self.connection() as connection:
+            started = await connection.set(
+                TYPING_KEY.format(self.group_name, user_id), '1', expire=self.typing_ttl,
+                exist=connection.SET_IF_NOT_EXIST
+            )
+        return bool(started)
+
+    async def stop_typing(self, user_id):
+        if not self.enabled:
+            return
+        async with self.connection() as connection:
+            await connection.delete(TYPING_KEY.format(self.group_name, user_id))
+
+    async def members(self) -> list:
+        """
+        Users online in the room: `[{'user_id', 'user_name', 'typing'}]`.
+        """
+        if not self.enabled:
+            return []
+        async with self.connection() as connection:
+            channels = await self.online_channels(connection, time.time())
+            user_ids = sorted({member.split(':', 1)[0] for member in channels})
+            if not user_ids:
+                return []
+            names = await connection.hmget(self.names_key, *user_ids, encoding='utf-8')
+            typing = await connection.mget(
+                *[TYPING_KEY.format(self.group_name, user_id) for user_id in user_ids], encoding='utf-8'
+            )
+        return [
+            {'user_id': user_id, 'user_name': name, 'typing': flag is not None}
+            for user_id, name, flag in zip(user_ids, names, typing)
+        ]
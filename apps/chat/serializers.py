@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+from apps.chat.models import RoomMessage
+
+
+class RoomMessageSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source='message.type', read_only=True)
+    text = serializers.CharField(source='message.text', read_only=True)
+    user_id = serializers.UUIDField(source='message.user_id', read_only=True)
+    user_name = serializers.SerializerMethodField(read_only=True)
+
+    def get_user_name(self, obj: RoomMessage):
+        user = obj.message.user
+        return None if user is None else user.full_name
+
+    class Meta:
+        model = RoomMessage
+        fields = ('id', 'created', 'type', 'text', 'user_id', 'user_name',)
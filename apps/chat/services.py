@@ -0,0 +1,51 @@
+from django.conf import settings
+
+from apps.chat.models import Room, RoomMessage
+from rc871_backend.pagination import encode_cursor, decode_cursor, keyset_filter
+from rc871_backend.utils.config import get_prefix_app
+
+HISTORY_ORDERING = ('-created', '-id')
+
+
+def room_group_name(room_name) -> str:
+    return get_prefix_app() + "_%s" % room_name
+
+
+def get_room(group_name, create=False):
+    """
+    Room of a channels group, created when `create` and it does not exist yet.
+    """
+    title = group_name.replace('chat_', '')
+    if not create:
+        return Room.objects.filter(title=title).first()
+    # Solo por titulo, como la lectura: `staff_only` cambiado a mano no crea otra sala con el mismo titulo
+    room, _ = Room.objects.get_or_create(title=title, defaults={'staff_only': group_name == 'chat_admin'})
+    return room
+
+
+def can_read(room, user) -> bool:
+    """
+    Staff only rooms are read only by the staff, through the websocket and the history.
+    """
+    return not room.staff_only or user.is_staff
+
+
+def history(room_id, cursor=None, limit=None):
+    """
+    Messages of the room from the newest, `limit` per page (at most `CHAT_HISTORY_MAX_PAGE_SIZE`) after
+    `cursor`. Each page is one range scan of `room_message_history_idx`, whatever the size of the room.
+    Returns the rows and the cursor of the next page, None on the last one. Raises `ValueError` when the
+    cursor is not valid.
+    """
+    limit = max(1, min(limit or settings.CHAT_HISTORY_PAGE_SIZE, settings.CHAT_HISTORY_MAX_PAGE_SIZE))
+    queryset = RoomMessage.objects.filter(room_id=room_id).select_related('message__user').order_by(
+        *HISTORY_ORDERING
+    )
+    if cursor:
+        values, _ = decode_cursor(cursor, len(HISTORY_ORDERING))
+        queryset = queryset.filter(keyset_filter(HISTORY_ORDERING, values))
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1].created, rows[-1].id])
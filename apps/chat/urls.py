@@ -0,0 +1,11 @@
+from rest_framework import routers
+
+from apps.chat.views import RoomMessageViewSet
+
+router = routers.SimpleRouter()
+router.register(r'message', RoomMessageViewSet)
+
+urlpatterns = [
+]
+
+urlpatterns += router.urls
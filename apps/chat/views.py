@@ -1,3 +1,56 @@
-from django.shortcuts import render
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import mixins, serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
 
-# Create your views here.
+from apps.chat.models import RoomMessage
+from apps.chat.presence import Presence
+from apps.chat.serializers import RoomMessageSerializer
+from apps.chat.services import HISTORY_ORDERING, get_room, room_group_name, can_read
+from rc871_backend.pagination import KeysetPagination
+
+
+class HistoryPagination(KeysetPagination):
+    max_limit = settings.CHAT_HISTORY_MAX_PAGE_SIZE
+
+
+class RoomMessageViewSet(mixins.ListModelMixin, GenericViewSet):
+    """
+    History of the room `room` (the name used in the websocket url) from the newest message, paged with
+    `cursor`/`limit`.
+    """
+    queryset = RoomMessage.objects.all()
+    serializer_class = RoomMessageSerializer
+    pagination_class = HistoryPagination
+    keyset_ordering = HISTORY_ORDERING
+    keyset_only = True
+
+    def get_room(self):
+        """
+        Channels group and room of the `room` parameter, the room is None when the user can not read it.
+        """
+        room_name = self.request.query_params.get('room', None)
+        if not room_name:
+            raise serializers.ValidationError(detail={'error': _('La sala es requerida')})
+        group_name = room_group_name(room_name)
+        room = get_room(group_name)
+        if room is not None and not can_read(room, self.request.user):
+            room = None
+        return group_name, room
+
+    def get_queryset(self):
+        room = self.get_room()[1]
+        if room is None:
+            return self.queryset.none()
+        return self.queryset.filter(room=room).select_related('message__user')
+
+    @action(methods=['GET'], detail=False)
+    def online(self, request):
+        group_name, room = self.get_room()
+        if room is None:
+            return Response([])
+        return Response(async_to_sync(Presence(get_channel_layer(), group_name).members)())
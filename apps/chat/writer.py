@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import weakref
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from apps.chat.models import Message, RoomMessage
+
+logger = logging.getLogger(__name__)
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def write_messages(batch):
+    """
+    Insert the `(message, room_id)` pairs with one `bulk_create` per table.
+    """
+    with transaction.atomic():
+        Message.objects.bulk_create([message for message, _ in batch])
+        RoomMessage.objects.bulk_create([
+            RoomMessage(message=message, room_id=room_id, created=message.created) for message, room_id in batch
+        ])
+
+
+class MessageWriter:
+    """
+    Buffers the chat messages of the process and writes them in batches, every `interval` seconds or as soon as
+    `batch_size` are waiting. Messages still buffered when the process dies are lost.
+    """
+
+    def __init__(self, batch_size=100, interval=0.2):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []
+        self.full = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    def add(self, message: Message, room_id):
+        self.pending.append((message, room_id))
+        if len(self.pending) >= self.batch_size:
+            self.full.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        while self.pending:
+            try:
+                await asyncio.wait_for(self.full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self.lock:
+            while self.pending:
+                batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+                try:
+                    await database_sync_to_async(write_messages)(batch)
+                except Exception:
+                    logger.exception('No se pudieron guardar %s mensajes del chat', len(batch))
+
+
+def get_writer() -> MessageWriter:
+    """
+    Writer of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop, None)
+    if writer is None:
+        writer = _writers[loop] = MessageWriter(
+            settings.CHAT_WRITER_BATCH_SIZE, settings.CHAT_WRITER_INTERVAL_MS / 1000
+        )
+    return writer
@@ -3,15 +3,18 @@ from import_export.fields import Field
 
 from django.contrib import admin
 from django.core.exceptions import ValidationError, ObjectDoesNotExist, MultipleObjectsReturned
+from import_export.instance_loaders import CachedInstanceLoader
 from import_export.resources import ModelResource
 from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
 
 from apps.core.models import Banner, State, City, Municipality, Mark, Model, HistoricalChangeRate, Use, Vehicle, \
     BranchOffice, Plan, Coverage, Premium, Policy, PrePolicy, Incidence
 from apps.security.models import User
+from rc871_backend.utils.imports import BulkResourceMixin, CachedForeignKeyWidget, CachedCompositeInstanceLoader, \
+    lookup_key
 
 
-class BannerResource(ModelResource):
+class BannerResource(BulkResourceMixin, ModelResource):
     title = Field(attribute='title', column_name='Titulo')
     subtitle = Field(attribute='subtitle', column_name='Sub Titulo')
     content = Field(attribute='content', column_name='Contenido')
@@ -23,9 +26,12 @@ class BannerResource(ModelResource):
         model = Banner
         exclude = ('id', 'created', 'updated', 'image',)
         import_id_fields = ('title',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
-class BranchOfficeResource(ModelResource):
+class BranchOfficeResource(BulkResourceMixin, ModelResource):
     number = Field(attribute='number', column_name='Nro.', readonly=True)
     code = Field(attribute='code', column_name='Código')
     description = Field(attribute='description', column_name='Descripcion')
@@ -36,9 +42,12 @@ class BranchOfficeResource(ModelResource):
         model = BranchOffice
         exclude = ('id', 'created', 'updated', 'geo_location',)
         import_id_fields = ('code',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
-class UseResource(ModelResource):
+class UseResource(BulkResourceMixin, ModelResource):
     code = Field(attribute='code', column_name='Código')
     description = Field(attribute='description', column_name='Descripcion')
     is_active = Field(attribute='is_active', column_name='Activo')
@@ -47,6 +56,9 @@ class UseResource(ModelResource):
         model = Use
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('code',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
 class PlanResource(ModelResource):
@@ -61,6 +73,7 @@ class PlanResource(ModelResource):
         model = Plan
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('code',)
+        instance_loader_class = CachedInstanceLoader
 
 
 class CoverageResource(ModelResource):
@@ -76,17 +89,18 @@ class CoverageResource(ModelResource):
         model = Coverage
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('code',)
+        instance_loader_class = CachedInstanceLoader
 
 
-class PremiumResource(ModelResource):
+class PremiumResource(BulkResourceMixin, ModelResource):
     coverage = Field(
-        attribute='coverage', widget=ForeignKeyWidget(Coverage, 'code'), column_name='Cobertura'
+        attribute='coverage', widget=CachedForeignKeyWidget(Coverage, 'code'), column_name='Cobertura'
     )
     use = Field(
-        attribute='use', widget=ForeignKeyWidget(Use, 'code'), column_name='Uso'
+        attribute='use', widget=CachedForeignKeyWidget(Use, 'code'), column_name='Uso'
     )
     plan = Field(
-        attribute='plan', widget=ForeignKeyWidget(Plan, 'code'), column_name='Plan'
+        attribute='plan', widget=CachedForeignKeyWidget(Plan, 'code'), column_name='Plan'
     )
     insured_amount = Field(attribute='insured_amount', column_name='Monto Asegurado')
     cost = Field(attribute='cost', column_name='Costo')
@@ -95,16 +109,27 @@ class PremiumResource(ModelResource):
         model = Premium
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('coverage', 'use', 'plan',)
+        instance_loader_class = CachedCompositeInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
-class StateResource(ModelResource):
+class StateResource(BulkResourceMixin, ModelResource):
     class Meta:
         model = State
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('description',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
-class CityResource(ModelResource):
+class CityResource(BulkResourceMixin, ModelResource):
+
+    def __init__(self):
+        super().__init__()
+        self.fields['state'].widget = CachedForeignKeyWidget(State)
+        self.state_ids = None
 
     def before_import_row(self, row, row_number=None, **kwargs):
         state = row.get('state', None)
@@ -112,7 +137,9 @@ class CityResource(ModelResource):
         if not state:
             raise ValidationError("El codigo del estado es obligatorio")
         else:
-            row['state'] = State.objects.get(number=state).id
+            if self.state_ids is None:
+                self.state_ids = {lookup_key(number): pk for pk, number in State.objects.values_list('id', 'number')}
+            row['state'] = self.state_ids.get(lookup_key(state), None) or State.objects.get(number=state).id
 
         return row
 
@@ -120,9 +147,17 @@ class CityResource(ModelResource):
         model = City
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('description', 'state')
+        instance_loader_class = CachedCompositeInstanceLoader
+        use_bulk = True
+        skip_diff = True
+
 
+class MunicipalityResource(BulkResourceMixin, ModelResource):
 
-class MunicipalityResource(ModelResource):
+    def __init__(self):
+        super().__init__()
+        self.fields['city'].widget = CachedForeignKeyWidget(City)
+        self.city_ids = None
 
     def before_import_row(self, row, row_number=None, **kwargs):
         city = row.get('city', None)
@@ -130,7 +165,9 @@ class MunicipalityResource(ModelResource):
         if not city:
             raise ValidationError("El codigo de la ciudad es obligatorio")
         else:
-            row['city'] = City.objects.get(number=city).id
+            if self.city_ids is None:
+                self.city_ids = {lookup_key(number): pk for pk, number in City.objects.values_list('id', 'number')}
+            row['city'] = self.city_ids.get(lookup_key(city), None) or City.objects.get(number=city).id
 
         return row
 
@@ -138,9 +175,12 @@ class MunicipalityResource(ModelResource):
         model = Municipality
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('description', 'city')
+        instance_loader_class = CachedCompositeInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
-class MarkResource(ModelResource):
+class MarkResource(BulkResourceMixin, ModelResource):
     description = Field(attribute='description', column_name='Descripcion')
     is_active = Field(attribute='is_active', column_name='Activo', default=True)
 
@@ -148,11 +188,14 @@ class MarkResource(ModelResource):
         model = Mark
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('description',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
-class ModelVehicleResource(ModelResource):
+class ModelVehicleResource(BulkResourceMixin, ModelResource):
     mark = Field(
-        attribute='mark', widget=ForeignKeyWidget(Mark, 'description'), column_name='Marca'
+        attribute='mark', widget=CachedForeignKeyWidget(Mark, 'description'), column_name='Marca'
     )
     description = Field(attribute='description', column_name='Descripcion')
     is_active = Field(attribute='is_active', column_name='Activo')
@@ -161,14 +204,17 @@ class ModelVehicleResource(ModelResource):
         model = Model
         exclude = ('id', 'created', 'updated',)
         import_id_fields = ('mark', 'description',)
+        instance_loader_class = CachedCompositeInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
 
 class VehicleResource(ModelResource):
     use = Field(
-        attribute='use', widget=ForeignKeyWidget(Use, 'description'), column_name='Uso'
+        attribute='use', widget=CachedForeignKeyWidget(Use, 'description'), column_name='Uso'
     )
     model = Field(
-        attribute='model', widget=ForeignKeyWidget(Model, 'description'), column_name='Modelo'
+        attribute='model', widget=CachedForeignKeyWidget(Model, 'description'), column_name='Modelo'
     )
     license_plate = Field(attribute='license_plate', column_name='Placa')
     serial_bodywork = Field(attribute='serial_bodywork', column_name='Serial de Carroceria')
@@ -191,6 +237,7 @@ class VehicleResource(ModelResource):
         exclude = ('id', 'created', 'updated', 'owner_identity_card_image', 'owner_license',
                    'owner_medical_certificate', 'owner_circulation_card',)
         import_id_fields = ('license_plate',)
+        instance_loader_class = CachedInstanceLoader
 
 
 class PolicyResource(ModelResource):
@@ -227,7 +274,8 @@ class PolicyResource(ModelResource):
 
     class Meta:
         model = Policy
-        exclude = ('id', 'updated', 'qrcode', 'file')
+        exclude = ('id', 'updated', 'qrcode', 'file', 'file_hash', 'file_status', 'file_requested',
+                   'file_version')
 
 
 class PrePolicyResource(ModelResource):
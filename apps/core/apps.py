@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'apps.core'
+
+    def ready(self):
+        from apps.core import search
+        from apps.core.models import Policy, Vehicle
+
+        search.register(Policy)
+        search.register(Vehicle)
@@ -0,0 +1,116 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+DEFAULT_CHECKPOINT = os.path.join(settings.BASE_DIR, '.render_policy_pdfs.json')
+
+
+def setup_worker():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rc871_backend.settings')
+    django.setup()
+
+
+def render_policy(policy_id, force):
+    """
+    Runs in the pool, returns the policy id and whether it was rendered, skipped or failed.
+    """
+    from apps.core.models import Policy
+    from apps.core.pdf import build_policy_pdf
+
+    try:
+        policy = Policy.objects.get(pk=policy_id)
+        return policy_id, 'rendered' if build_policy_pdf(policy, force=force) else 'skipped', None
+    except Exception as e:
+        Policy.objects.filter(pk=policy_id).update(file_status=Policy.FILE_FAILED)
+        return policy_id, 'failed', str(e)
+
+
+class Command(BaseCommand):
+    help = 'Re-render the pdf of the approved policies in parallel, resuming an interrupted run from its checkpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+        parser.add_argument('--reset', action='store_true', help='Ignore the checkpoint and start from the beginning.')
+        parser.add_argument('--force', action='store_true', help='Render even if the content hash did not change.')
+
+    def handle(self, *args, **options):
+        from apps.core.models import Policy
+
+        checkpoint = options['checkpoint']
+        state = {'last_number': 0, 'rendered': 0, 'skipped': 0, 'failed': 0}
+        if not options['reset'] and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state.update(json.load(f))
+            self.stdout.write('Resuming after policy number {0}'.format(state['last_number']))
+
+        queryset = Policy.objects.filter(status=Policy.PASSED, number__isnull=False).order_by('number')
+        pending = queryset.filter(number__gt=state['last_number']).count()
+        self.stdout.write('{0} policies to process with {1} workers'.format(pending, options['workers']))
+
+        started = time.monotonic()
+        processed = 0
+        executor = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=setup_worker
+        )
+        with executor:
+            while True:
+                # Paginacion por llave: cada lote empieza despues del ultimo numero procesado
+                chunk = list(
+                    queryset.filter(number__gt=state['last_number']).values_list('id', 'number')[
+                        :options['chunk_size']
+                    ]
+                )
+                if not chunk:
+                    break
+
+                chunk_started = time.monotonic()
+                futures = [executor.submit(render_policy, str(policy_id), options['force']) for policy_id, _ in chunk]
+                for future in as_completed(futures):
+                    policy_id, result, error = future.result()
+                    state[result] += 1
+                    if error:
+                        self.stderr.write('Policy {0}: {1}'.format(policy_id, error))
+
+                # El checkpoint solo avanza cuando el lote completo termino
+                state['last_number'] = chunk[-1][1]
+                self.save_checkpoint(checkpoint, state)
+
+                processed += len(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    '{0}/{1} up to number {2}: {3:.2f} policies/s ({4:.2f} overall), '
+                    'rendered {5}, skipped {6}, failed {7}'.format(
+                        processed, pending, state['last_number'],
+                        len(chunk) / max(time.monotonic() - chunk_started, 1e-6), processed / max(elapsed, 1e-6),
+                        state['rendered'], state['skipped'], state['failed']
+                    )
+                )
+
+        # Recorrido completo: el checkpoint solo sirve para retomar uno interrumpido
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Processed {0} policies in {1:.1f}s ({2:.2f} policies/s)'.format(
+                processed, elapsed, processed / max(elapsed, 1e-6)
+            )
+        ))
+
+    @staticmethod
+    def save_checkpoint(checkpoint, state):
+        tmp = '{0}.tmp'.format(checkpoint)
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, checkpoint)
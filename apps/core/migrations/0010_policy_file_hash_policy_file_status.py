@@ -0,0 +1,29 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+def mark_rendered_files(apps, schema_editor):
+    Policy = apps.get_model('core', 'Policy')
+    Policy.objects.exclude(file__isnull=True).exclude(file='').update(file_status=2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_incidence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policy',
+            name='file_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='file hash'),
+        ),
+        migrations.AddField(
+            model_name='policy',
+            name='file_status',
+            field=models.SmallIntegerField(choices=[(0, 'Sin generar'), (1, 'Generando'), (2, 'Generado'), (3, 'Fallido')], default=0, verbose_name='file status'),
+        ),
+        migrations.RunPython(mark_rendered_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+def remove_duplicate_premiums(apps, schema_editor):
+    # Se conserva la prima modificada mas recientemente de cada combinacion
+    Premium = apps.get_model('core', 'Premium')
+    seen = set()
+    duplicates = []
+    for premium in Premium.objects.filter(plan__isnull=False).order_by('-updated', '-created').iterator():
+        key = (premium.coverage_id, premium.use_id, premium.plan_id)
+        if key in seen:
+            duplicates.append(premium.id)
+        else:
+            seen.add(key)
+    Premium.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_policy_file_hash_policy_file_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_premiums, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='premium',
+            constraint=models.UniqueConstraint(fields=('coverage', 'use', 'plan'), name='unique_premium_coverage_use_plan'),
+        ),
+    ]
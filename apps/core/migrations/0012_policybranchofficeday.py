@@ -0,0 +1,40 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0011_premium_unique_premium_coverage_use_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolicyBranchOfficeDay',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+                ('day', models.DateField(verbose_name='day')),
+                ('status', models.SmallIntegerField(choices=[(0, 'Pendiente de pago'), (1, 'Pendiente de aprobación'), (2, 'Aprobado'), (3, 'Vencido'), (4, 'Pago rechazado')], verbose_name='status')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='quantity')),
+                ('refreshed', models.DateTimeField(verbose_name='refreshed')),
+                ('branch_office', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='policy_days', to='core.branchoffice', verbose_name='branch office')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+            ],
+            options={
+                'verbose_name': 'policy branch office day',
+                'verbose_name_plural': 'policy branch office days',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='policybranchofficeday',
+            index=models.Index(fields=['day', 'branch_office'], name='policy_branch_office_day_idx'),
+        ),
+    ]
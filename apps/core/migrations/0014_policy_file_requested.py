@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policy',
+            name='file_requested',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='file requested'),
+        ),
+    ]
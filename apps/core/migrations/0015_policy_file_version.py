@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_policy_file_requested'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policy',
+            name='file_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='file version'),
+        ),
+    ]
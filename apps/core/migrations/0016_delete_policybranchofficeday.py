@@ -0,0 +1,16 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_policy_file_version'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PolicyBranchOfficeDay',
+        ),
+    ]
@@ -3,18 +3,22 @@ import datetime
 from decimal import Decimal
 from os import remove
 from os import path
-from constance import config
 from constance.backends.database.models import Constance
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models.signals import post_save
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models.signals import post_save, post_delete
 from rest_framework import serializers
 from sequences import get_next_value
 from django.contrib.gis.db import models as geo_models
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
+from rc871_backend.utils.cache import bump_version
+from rc871_backend.utils.config import get_change_factor, invalidate_config
+from rc871_backend.utils.sequences import SequenceAllocator
+
 MONDAY = 0
 TUESDAY = 1
 WEDNESDAY = 2
@@ -253,12 +257,7 @@ class Premium(ModelBase):
 
     @property
     def insured_amount_change(self):
-        try:
-            change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-        except ObjectDoesNotExist:
-            getattr(config, "CHANGE_FACTOR")
-            change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-        return float(format(self.insured_amount * Decimal(change_factor), ".2f"))
+        return float(format(self.insured_amount * Decimal(get_change_factor()), ".2f"))
 
     @property
     def insured_amount_change_display(self):
@@ -266,13 +265,7 @@ class Premium(ModelBase):
 
     @property
     def cost_change(self):
-        try:
-            change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-        except ObjectDoesNotExist:
-            getattr(config, "CHANGE_FACTOR")
-            change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-
-        return float(format(self.cost * Decimal(change_factor), ".2f"))
+        return float(format(self.cost * Decimal(get_change_factor()), ".2f"))
 
     @property
     def cost_change_display(self):
@@ -281,6 +274,9 @@ class Premium(ModelBase):
     class Meta:
         verbose_name = _('premium')
         verbose_name_plural = _('premiums')
+        constraints = [
+            models.UniqueConstraint(fields=['coverage', 'use', 'plan'], name='unique_premium_coverage_use_plan'),
+        ]
 
 
 class Mark(ModelBase):
@@ -386,14 +382,24 @@ class Vehicle(ModelBase):
                                     help_text="Correo del dueño")
     taker = models.ForeignKey('security.User', verbose_name=_('taker'), on_delete=models.PROTECT, null=True)
     is_active = models.BooleanField(verbose_name=_('is active'), default=True)
+    search_document = models.TextField(verbose_name=_('search document'), blank=True, default='', editable=False)
+
+    SEARCH_FIELDS = ('serial_bodywork', 'serial_engine', 'license_plate', 'transmission', 'taker__username',
+                     'model__description', 'use__description')
 
     class Meta:
         verbose_name = _('vehicle')
         verbose_name_plural = _('vehicles')
+        indexes = [
+            GinIndex(fields=['search_document'], name='vehicle_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+
+state_numbers = SequenceAllocator('state_number', block_size=20)
 
 
 def get_state_number():
-    return get_next_value('state_number')
+    return state_numbers.next_value()
 
 
 class State(ModelBase):
@@ -406,8 +412,11 @@ class State(ModelBase):
         verbose_name_plural = _('state')
 
 
+city_numbers = SequenceAllocator('city_number', block_size=50)
+
+
 def get_city_number():
-    return get_next_value('city_number')
+    return city_numbers.next_value()
 
 
 class City(ModelBase):
@@ -421,8 +430,11 @@ class City(ModelBase):
         verbose_name_plural = _('cities')
 
 
+municipality_numbers = SequenceAllocator('municipality_number', block_size=50)
+
+
 def get_municipality_number():
-    return get_next_value('municipality_number')
+    return municipality_numbers.next_value()
 
 
 class Municipality(ModelBase):
@@ -436,8 +448,16 @@ class Municipality(ModelBase):
         verbose_name_plural = _('municipalities')
 
 
+# Los numeros de poliza no pueden tener saltos
+policy_numbers = SequenceAllocator('get_policy_number', gapless=True)
+
+
 def get_policy_number():
-    return get_next_value('get_policy_number')
+    return policy_numbers.next_value()
+
+
+def get_policy_numbers(count):
+    return policy_numbers.next_values(count)
 
 
 def qrcode_image_path(policy: 'Policy', file_name):
@@ -473,6 +493,17 @@ class Policy(ModelBase):
         (NEW, _('Nueva')),
     )
 
+    FILE_NONE = 0
+    FILE_RENDERING = 1  # en cola o generandose
+    FILE_READY = 2
+    FILE_FAILED = 3
+    FILE_STATUSES = (
+        (FILE_NONE, _('Sin generar')),
+        (FILE_RENDERING, _('Generando')),
+        (FILE_READY, _('Generado')),
+        (FILE_FAILED, _('Fallido')),
+    )
+
     number = models.PositiveIntegerField(
         verbose_name='number', primary_key=False, null=True, db_index=True, default=None
     )
@@ -492,6 +523,18 @@ class Policy(ModelBase):
     change_factor = models.DecimalField(max_digits=50, decimal_places=2, verbose_name=_('change factor'), default=0.0)
     qrcode = models.ImageField(upload_to=qrcode_image_path, null=True, verbose_name=_('qrcode image'))
     file = models.FileField(upload_to=file_policy_path, null=True, verbose_name=_('file policy pdf'))
+    file_hash = models.CharField(max_length=64, null=True, blank=True, verbose_name=_('file hash'))
+    file_status = models.SmallIntegerField(choices=FILE_STATUSES, default=FILE_NONE, verbose_name=_('file status'))
+    file_requested = models.DateTimeField(null=True, blank=True, verbose_name=_('file requested'))
+    # Cambia con cada escritura de la poliza, un pdf generado de una version anterior no queda listo
+    file_version = models.PositiveIntegerField(default=0, verbose_name=_('file version'))
+    search_document = models.TextField(verbose_name=_('search document'), blank=True, default='', editable=False)
+
+    SEARCH_FIELDS = ('number', 'taker__name', 'adviser__name', 'vehicle__model__mark__description',
+                     'vehicle__model__description')
+    # Escribir solo estos campos no cambia el contenido del pdf
+    FILE_FIELDS = frozenset(['qrcode', 'file', 'file_hash', 'file_status', 'file_requested', 'file_version',
+                             'search_document'])
 
     @property
     def total_amount_display(self):
@@ -521,6 +564,9 @@ class Policy(ModelBase):
         verbose_name = _('policy')
         verbose_name_plural = _('policies')
         ordering = ['-number']
+        indexes = [
+            GinIndex(fields=['search_document'], name='policy_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
 
 class PrePolicy(ModelBase):
@@ -540,8 +586,11 @@ class PrePolicy(ModelBase):
         verbose_name_plural = _('pre policies')
 
 
+policy_coverage_numbers = SequenceAllocator('get_policy_coverage_number', block_size=200)
+
+
 def get_policy_coverage_number():
-    return get_next_value('get_policy_coverage_number')
+    return policy_coverage_numbers.next_value()
 
 
 class PolicyCoverage(ModelBase):
@@ -616,6 +665,7 @@ def update_change_rate(sender, instance: HistoricalChangeRate, **kwargs):
                 key="CHANGE_FACTOR",
                 value=float(instance.rate)
             )
+        transaction.on_commit(invalidate_config, using=using)
 
 
 post_save.connect(update_change_rate, sender=HistoricalChangeRate)
@@ -630,8 +680,65 @@ def post_save_policy(sender, instance: Policy, raw=False, **kwargs):
             instance.due_date = datetime.datetime.now() + datetime.timedelta(days=365)
             instance.number = get_policy_number()
             instance.save(update_fields=['number', 'due_date'])
+            from apps.core.tasks import schedule_policy_pdf
+            schedule_policy_pdf(instance)
     except ValueError as e:
         raise serializers.ValidationError(detail={'error': _(e.__str__())})
 
 
 post_save.connect(post_save_policy, sender=Policy)
+
+
+def mark_policy_files_stale(policy_ids, using=None):
+    """
+    Flag the generated pdf of the policies as outdated, the next request queues a new render. A render in
+    progress is left running but it will not mark its file as ready.
+    """
+    Policy.objects.using(using).filter(
+        id__in=policy_ids, file_status__in=[Policy.FILE_READY, Policy.FILE_RENDERING]
+    ).update(
+        file_version=models.F('file_version') + 1,
+        file_status=models.Case(
+            models.When(file_status=Policy.FILE_READY, then=models.Value(Policy.FILE_NONE)),
+            default=models.F('file_status')
+        ),
+    )
+
+
+def post_save_policy_file(sender, instance: Policy, raw=False, using=None, update_fields=None, **kwargs):
+    if raw or instance.file_status not in (Policy.FILE_READY, Policy.FILE_RENDERING):
+        return
+    if update_fields is not None and set(update_fields) <= Policy.FILE_FIELDS:
+        return
+    mark_policy_files_stale([instance.pk], using)
+    instance.file_version += 1
+    if instance.file_status == Policy.FILE_READY:
+        instance.file_status = Policy.FILE_NONE
+
+
+def post_save_policy_coverage(sender, instance: PolicyCoverage, raw=False, using=None, **kwargs):
+    if raw or not instance.policy_id:
+        return
+    mark_policy_files_stale([instance.policy_id], using)
+
+
+post_save.connect(post_save_policy_file, sender=Policy)
+post_save.connect(post_save_policy_coverage, sender=PolicyCoverage)
+post_delete.connect(post_save_policy_coverage, sender=PolicyCoverage)
+
+
+DASHBOARD_NAMESPACE = 'dashboard'
+
+
+def invalidate_dashboard(using=None):
+    transaction.on_commit(lambda: bump_version(DASHBOARD_NAMESPACE), using=using)
+
+
+def post_save_dashboard(sender, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    invalidate_dashboard(using)
+
+
+post_save.connect(post_save_dashboard, sender=Policy)
+post_delete.connect(post_save_dashboard, sender=Policy)
@@ -0,0 +1,89 @@
+import hashlib
+import io
+from base64 import b64encode
+from datetime import timedelta
+
+import pdfkit
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Case, When, Value
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from apps.core.models import Policy, file_policy_path
+from apps.core.serializers import PolicyDefaultSerializer
+
+
+def policy_file_name(policy: Policy):
+    return '{0}.pdf'.format(str(policy.number))
+
+
+def make_qrcode(policy: Policy) -> bytes:
+    """
+    QR with the public url of the pdf, it only depends on the number so the image is stable between renders.
+    """
+    img = qrcode.make(settings.MEDIA_URL + file_policy_path(policy, policy_file_name(policy)))
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+def render_policy_html(policy: Policy, qr_image: bytes) -> str:
+    data = PolicyDefaultSerializer(policy).data
+    # La imagen va embebida para que wkhtmltopdf no dependa de la url del media
+    data['qrcode'] = 'data:image/png;base64,{0}'.format(b64encode(qr_image).decode())
+    return render_to_string("report-pdf.html", data)
+
+
+def content_hash(html: str) -> str:
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def has_file(policy: Policy) -> bool:
+    return bool(policy.file) and policy.file.storage.exists(policy.file.name)
+
+
+def is_rendering(policy: Policy) -> bool:
+    """
+    True while a render queued less than `PDF_RENDER_TIMEOUT` seconds ago may still finish, a lost message or a
+    killed worker leave the policy rendering and it is queued again after that.
+    """
+    if policy.file_status != Policy.FILE_RENDERING or policy.file_requested is None:
+        return False
+    return policy.file_requested > timezone.now() - timedelta(seconds=settings.PDF_RENDER_TIMEOUT)
+
+
+def ready_status(version):
+    # Si la poliza cambio mientras se generaba, el pdf queda desactualizado y se genera otra vez al pedirlo
+    return Case(When(file_version=version, then=Value(Policy.FILE_READY)), default=Value(Policy.FILE_NONE))
+
+
+def build_policy_pdf(policy: Policy, force=False) -> bool:
+    """
+    Render the pdf of the policy and store it, keyed by the hash of its content.
+
+    The file is marked ready only if the policy was not written since it was loaded (`file_version`). Returns
+    False when the stored file already matches the content and nothing was rendered.
+    """
+    version = policy.file_version
+    qr_image = make_qrcode(policy)
+    html = render_policy_html(policy, qr_image)
+    file_hash = content_hash(html)
+    if not force and file_hash == policy.file_hash and has_file(policy):
+        Policy.objects.filter(pk=policy.pk).update(file_status=ready_status(version))
+        return False
+
+    pdf = pdfkit.from_string(html, False)
+
+    if policy.file:
+        policy.file.delete(save=False)
+    if policy.qrcode:
+        policy.qrcode.delete(save=False)
+    policy.qrcode.save('qrcode.png', ContentFile(qr_image), save=False)
+    policy.file.save(policy_file_name(policy), ContentFile(pdf), save=False)
+    policy.file_hash = file_hash
+    Policy.objects.filter(pk=policy.pk).update(
+        qrcode=policy.qrcode.name, file=policy.file.name, file_hash=file_hash, file_status=ready_status(version)
+    )
+    return True
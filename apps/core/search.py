@@ -0,0 +1,169 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import pre_save, post_save, post_init
+
+BATCH_SIZE = 500
+
+# Modelo relacionado -> [(modelo con documento, lookup hasta el relacionado)]
+DEPENDENTS = {}
+
+
+def build_document(instance, fields) -> str:
+    """
+    Lowercase text of the `fields` of the instance, related values are read following the `__` lookups.
+    """
+    values = []
+    for path in fields:
+        value = instance
+        for name in path.split('__'):
+            value = getattr(value, name, None)
+            if value is None:
+                break
+        if value is not None and value != '':
+            values.append(str(value))
+    return ' '.join(values).lower()
+
+
+def relations(fields):
+    return sorted({path.rsplit('__', 1)[0] for path in fields if '__' in path})
+
+
+def refresh_documents(queryset, fields=None) -> int:
+    """
+    Rebuild the `search_document` of the rows of the queryset, only the rows that changed are written.
+    """
+    model = queryset.model
+    fields = fields or model.SEARCH_FIELDS
+    changed = 0
+    pending = []
+    for instance in queryset.select_related(*relations(fields)).order_by().iterator(chunk_size=BATCH_SIZE):
+        document = build_document(instance, fields)
+        if instance.search_document != document:
+            instance.search_document = document
+            pending.append(instance)
+        if len(pending) >= BATCH_SIZE:
+            changed += model.objects.bulk_update(pending, ['search_document'])
+            pending = []
+    if pending:
+        changed += model.objects.bulk_update(pending, ['search_document'])
+    return changed
+
+
+def dependencies(model):
+    """
+    `(related model, lookup, fields)` for every relation of `SEARCH_FIELDS`, `fields` are the fields of the
+    related model that end up in the document of `model`.
+    """
+    result = {}
+    for path in model.SEARCH_FIELDS:
+        parts = path.split('__')
+        current = model
+        for index, name in enumerate(parts[:-1]):
+            current = current._meta.get_field(name).related_model
+            lookup = '__'.join(parts[:index + 1])
+            result.setdefault((current, lookup), set()).add(parts[index + 1])
+    return [(related, lookup, fields) for (related, lookup), fields in result.items()]
+
+
+def local_fields(model):
+    return {path.split('__')[0] for path in model.SEARCH_FIELDS}
+
+
+def local_attnames(model):
+    return sorted({model._meta.get_field(name).attname for name in local_fields(model)})
+
+
+def touches(update_fields, fields):
+    return update_fields is None or bool(set(update_fields) & fields)
+
+
+def register(model):
+    """
+    Keep the `search_document` of `model` up to date when it or the instances of `SEARCH_FIELDS` relations
+    are saved. Call it once the models are loaded, from `AppConfig.ready`.
+    """
+    fields = local_fields(model)
+    attnames = local_attnames(model)
+
+    def state(instance):
+        # Valores locales y ids de las relaciones del documento, los diferidos no cuentan
+        return tuple(instance.__dict__.get(attname, DEFERRED) for attname in attnames)
+
+    def post_init_document(sender, instance, **kwargs):
+        instance._search_state = state(instance)
+
+    def pre_save_document(sender, instance, raw=False, update_fields=None, **kwargs):
+        # Sin cambios en lo que forma el documento no se leen las relaciones
+        if raw or update_fields is not None:
+            return
+        if instance._state.adding or state(instance) != getattr(instance, '_search_state', None):
+            instance.search_document = build_document(instance, model.SEARCH_FIELDS)
+
+    def post_save_document(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+        current = state(instance)
+        changed = current != getattr(instance, '_search_state', None)
+        instance._search_state = current
+        # Los guardados con `update_fields` no escriben el documento en la misma sentencia
+        if raw or update_fields is None or not touches(update_fields, fields) or not changed:
+            return
+        document = build_document(instance, model.SEARCH_FIELDS)
+        if instance.search_document != document:
+            instance.search_document = document
+            model.objects.using(using).filter(pk=instance.pk).update(search_document=document)
+
+    post_init.connect(
+        post_init_document, sender=model, weak=False, dispatch_uid='search_post_init_' + model._meta.label
+    )
+    pre_save.connect(
+        pre_save_document, sender=model, weak=False, dispatch_uid='search_pre_save_' + model._meta.label
+    )
+    post_save.connect(
+        post_save_document, sender=model, weak=False, dispatch_uid='search_post_save_' + model._meta.label
+    )
+
+    for related, lookup, related_fields in dependencies(model):
+        register_dependency(model, related, lookup, related_fields)
+
+
+def schedule_refresh(model, lookup, value, using=None):
+    """
+    Queue the rebuild of the documents of `model` filtered by `lookup=value` once the transaction commits.
+    """
+    from apps.core.tasks import refresh_search_documents
+
+    label = model._meta.label
+    transaction.on_commit(lambda: refresh_search_documents.delay(label, lookup, value), using=using)
+
+
+def register_dependency(model, related, lookup, fields):
+    DEPENDENTS.setdefault(related, []).append((model, lookup))
+
+    def post_save_related(sender, instance, raw=False, created=False, using=None, update_fields=None, **kwargs):
+        if raw or created or not touches(update_fields, fields):
+            return
+        schedule_refresh(model, lookup, str(instance.pk), using)
+
+    post_save.connect(
+        post_save_related, sender=related, weak=False,
+        dispatch_uid='search_{0}_{1}'.format(model._meta.label, lookup)
+    )
+
+
+def refresh_related_documents(label, lookup, value) -> int:
+    model = apps.get_model(label)
+    return refresh_documents(model.objects.filter(**{lookup: value}))
+
+
+def refresh_written(model, pks, using=None):
+    """
+    What the signals of `register` do for rows written without `save()` (`update`, `bulk_create`,
+    `bulk_update`): the documents of the rows are rebuilt and those of their dependents queued.
+    """
+    pks = [str(pk) for pk in pks]
+    if not pks:
+        return
+    if hasattr(model, 'SEARCH_FIELDS'):
+        refresh_documents(model.objects.db_manager(using).filter(pk__in=pks))
+    for dependent, lookup in DEPENDENTS.get(model, []):
+        schedule_refresh(dependent, '{0}__in'.format(lookup), pks, using)
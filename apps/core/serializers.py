@@ -1,21 +1,22 @@
 # coding=utf-8
 from decimal import Decimal
 
-from constance import config
-from constance.backends.database.models import Constance
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Q, Count
+from django.db.models import Prefetch
 from django_restql.mixins import DynamicFieldsMixin
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from apps.core.models import Banner, BranchOffice, Use, Plan, Coverage, Premium, Mark, Model, Vehicle, State, City, \
-    Municipality, Policy, PolicyCoverage, HistoricalChangeRate, Location, Section, PrePolicy, Incidence
-from apps.payment.models import Payment
+    Municipality, Policy, PolicyCoverage, HistoricalChangeRate, Location, Section, PrePolicy, Incidence, \
+    policy_coverage_numbers
+from apps.core.services import PremiumMatrix, get_premium_matrix
 from apps.security.models import User
-from apps.security.serializers import UserDefaultSerializer
+from apps.security.serializers import UserDefaultSerializer, USER_SELECT_RELATED, USER_PREFETCH_RELATED
+from rc871_backend.utils.config import get_change_factor, get_adviser_default_id
+from rc871_backend.utils.related import prefixed
 
 
 class BannerDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
@@ -149,16 +150,19 @@ class UseDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     def get_premiums(self, instance: Use):
         request = self.context.get("request")
-        plans = instance.plan_set.all().values_list('id', flat=True)
-        queryset = instance.premium_set.filter(plan_id__in=plans)
-        plan = request.query_params.get('plan', None)
+        plan = request.query_params.get('plan', None) if request else None
         if plan:
+            plans = instance.plan_set.all().values_list('id', flat=True)
             _plan = Plan.objects.get(pk=plan)
-            queryset = queryset.filter(
-                plan_id=_plan.id, coverage_id__in=_plan.coverage.all().values_list('id', flat=True)
+            queryset = instance.premium_set.filter(
+                plan_id__in=plans, plan_id=_plan.id, coverage_id__in=_plan.coverage.all().values_list('id', flat=True)
             )
+            return PremiumUseSerializer(queryset, many=True).data
 
-        return PremiumUseSerializer(queryset, many=True).data
+        # Se filtra en memoria para aprovechar `USE_PREFETCH_RELATED`
+        plans = {plan.id for plan in instance.plan_set.all()}
+        premiums = [premium for premium in instance.premium_set.all() if premium.plan_id in plans]
+        return PremiumUseSerializer(premiums, many=True).data
 
     class Meta:
         model = Use
@@ -169,17 +173,13 @@ class CoveragePlanSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     premium = serializers.SerializerMethodField(read_only=True)
 
     def get_premium(self, obj: Coverage):
-        request = self.context.get("request")
         plan = self.context.get('plan', None)
-        use = request.query_params.get('use', None)
-        if use and plan:
-            try:
-                premium = Premium.objects.get(plan_id=plan, coverage_id=obj.id, use_id=use)
+        if plan:
+            premium = get_premium_matrix(self.context, [plan]).premium(plan, obj.id)
+            if premium is not None:
                 return PremiumCoverageSerializer(
                     premium, exclude=['created', 'updated']
                 ).data
-            except ObjectDoesNotExist:
-                return None
 
         return None
 
@@ -208,32 +208,24 @@ class PlanWithCoverageSerializer(DynamicFieldsMixin, serializers.ModelSerializer
     insured_amount_total_change = serializers.SerializerMethodField(read_only=True)
     insured_amount_total_change_display = serializers.SerializerMethodField(read_only=True)
 
+    def get_premium_matrix(self):
+        if isinstance(self.parent, serializers.ListSerializer):
+            plans = self.parent.instance
+        else:
+            plans = [self.instance]
+        return get_premium_matrix(self.context, plans)
+
     def get_coverage(self, obj: Plan):
         self.context['plan'] = obj.id
         return CoveragePlanSerializer(
-            obj.coverage, many=True, read_only=True, exclude=['plans'], context=self.context
+            self.get_premium_matrix().coverages(obj), many=True, read_only=True, exclude=['plans'],
+            context=self.context
         ).data
 
     def get_cost_total(self, plan: Plan):
-        request = self.context.get("request")
-        use = request.query_params.get('use', None)
-        total = 0
-        if use and plan:
-            query = plan.coverage_set.filter(
-                Q(default=False) & Q(is_active=True) & Q(premium__use_id=use) &
-                Q(premium__cost__isnull=False)
-            )
-            query_default = Coverage.objects.filter(
-                Q(default=True) & Q(is_active=True) & Q(premium__use_id=use) & Q(premium__cost__isnull=False)
-            )
-            coverage_list = query_default.union(query)
-            try:
-                for coverage in coverage_list:
-                    premium = Premium.objects.get(plan_id=plan.id, coverage_id=coverage.id, use_id=use)
-                    total += premium.cost
-                return Decimal(total)
-            except ObjectDoesNotExist:
-                return None
+        matrix = self.get_premium_matrix()
+        if matrix.use and plan:
+            return matrix.cost_total(plan)
 
         return None
 
@@ -246,12 +238,7 @@ class PlanWithCoverageSerializer(DynamicFieldsMixin, serializers.ModelSerializer
     def get_cost_total_change(self, plan: Plan):
         cost_total = self.get_cost_total(plan)
         if cost_total:
-            try:
-                change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-            except ObjectDoesNotExist:
-                getattr(config, "CHANGE_FACTOR")
-                change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-            return float(format(cost_total * Decimal(change_factor), ".2f"))
+            return float(format(cost_total * Decimal(get_change_factor()), ".2f"))
         return None
 
     def get_cost_total_change_display(self, plan: Plan):
@@ -261,25 +248,9 @@ class PlanWithCoverageSerializer(DynamicFieldsMixin, serializers.ModelSerializer
         return '{} 0'.format(settings.CURRENCY_CHANGE_FORMAT)
 
     def get_insured_amount_total(self, plan: Plan):
-        request = self.context.get("request")
-        use = request.query_params.get('use', None)
-        total = 0
-        if use and plan:
-            query = plan.coverage_set.filter(
-                Q(default=False) & Q(is_active=True) & Q(premium__use_id=use) &
-                Q(premium__cost__isnull=False)
-            )
-            query_default = Coverage.objects.filter(
-                Q(default=True) & Q(is_active=True) & Q(premium__use_id=use) & Q(premium__cost__isnull=False)
-            )
-            coverage_list = query_default.union(query)
-            try:
-                for coverage in coverage_list:
-                    premium = Premium.objects.get(plan_id=plan.id, coverage_id=coverage.id, use_id=use)
-                    total += premium.insured_amount
-                return total
-            except ObjectDoesNotExist:
-                return None
+        matrix = self.get_premium_matrix()
+        if matrix.use and plan:
+            return matrix.insured_amount_total(plan)
 
         return None
 
@@ -292,12 +263,7 @@ class PlanWithCoverageSerializer(DynamicFieldsMixin, serializers.ModelSerializer
     def get_insured_amount_total_change(self, plan: Plan):
         insured_amount_total = self.get_insured_amount_total(plan)
         if insured_amount_total:
-            try:
-                change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-            except ObjectDoesNotExist:
-                getattr(config, "CHANGE_FACTOR")
-                change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-            return float(format(insured_amount_total * Decimal(change_factor), ".2f"))
+            return float(format(insured_amount_total * Decimal(get_change_factor()), ".2f"))
         return None
 
     def get_insured_amount_total_change_display(self, plan: Plan):
@@ -318,7 +284,16 @@ class PlanDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         queryset=Use.objects.all(), many=True, required=False
     )
     uses_display = UseDefaultSerializer(many=True, read_only=True, source="uses", exclude=['created', 'updated'])
-    coverage = CoveragePlanSerializer(many=True, read_only=True, exclude=['plans'])
+    coverage = serializers.SerializerMethodField(read_only=True)
+
+    def get_coverage(self, obj: Plan):
+        plans = [obj]
+        if isinstance(self.parent, serializers.ListSerializer) and self.parent.instance is not None:
+            plans = self.parent.instance
+        return CoveragePlanSerializer(
+            get_premium_matrix(self.context, plans).coverages(obj), many=True, read_only=True, exclude=['plans'],
+            context=self.context
+        ).data
 
     def validate(self, attrs):
         self.context['plan'] = attrs.get('id', None)
@@ -335,13 +310,13 @@ class CoverageDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer)
 
     def get_premiums(self, instance: Coverage):
         request = self.context.get("request")
-        plans = instance.plans.all().values_list('id', flat=True)
-        queryset = instance.premium_set.filter(plan_id__in=plans)
-        plan = request.query_params.get('plan', None)
+        plans = {plan.id for plan in instance.plans.all()}
+        plan = request.query_params.get('plan', None) if request else None
+        premiums = [premium for premium in instance.premium_set.all() if premium.plan_id in plans]
         if plan:
-            queryset = queryset.filter(plan_id=plan)
+            premiums = [premium for premium in premiums if str(premium.plan_id) == plan]
 
-        return PremiumUseSerializer(queryset, many=True).data
+        return PremiumUseSerializer(premiums, many=True).data
 
     class Meta:
         model = Coverage
@@ -520,14 +495,8 @@ class PrePolicyDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer
                 if taker is None:
                     validated_data['taker'] = request.user
 
-                try:
-                    change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-                except ObjectDoesNotExist:
-                    getattr(config, "CHANGE_FACTOR")
-                    change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-
                 prepolicy = PrePolicy.objects.create(
-                    change_factor=0.0 if change_factor is None else float(change_factor),
+                    change_factor=get_change_factor(),
                     **validated_data
                 )
                 return prepolicy
@@ -599,48 +568,32 @@ class PolicyDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
                 if user.is_adviser:
                     adviser = user
                 else:
-                    try:
-                        adviser_id = Constance.objects.get(key="ADVISER_DEFAULT_ID").value
-                    except ObjectDoesNotExist:
-                        getattr(config, "CHANGE_FACTOR")
-                        adviser_id = Constance.objects.get(key="ADVISER_DEFAULT_ID").value
+                    adviser_id = get_adviser_default_id()
                     if adviser_id is None:
                         adviser = User.objects.web()
                     else:
                         adviser = User.objects.get(pk=adviser_id)
 
                 use = vehicle.use
-                try:
-                    change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-                except ObjectDoesNotExist:
-                    getattr(config, "CHANGE_FACTOR")
-                    change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-
                 items = []
 
                 policy = Policy.objects.create(
                     adviser=adviser,
-                    change_factor=0.0 if change_factor is None else float(change_factor),
+                    change_factor=get_change_factor(),
                     **validated_data
                 )
 
                 total_insured_amount = 0.0
                 total_amount = 0.0
 
+                matrix = PremiumMatrix(use.id, plans=[plan])
                 if coverage:
                     coverage_list = coverage
                 else:
-                    query = plan.coverage_set.filter(
-                        Q(default=False) & Q(is_active=True) & Q(premium__use_id=use.id) &
-                        Q(premium__cost__isnull=False)
-                    )
-                    query_default = Coverage.objects.filter(
-                        Q(default=True) & Q(is_active=True) & Q(premium__use_id=use.id) & Q(premium__cost__isnull=False)
-                    )
-                    coverage_list = query_default.union(query).order_by('default', 'created', )
+                    coverage_list = matrix.priced_coverages(plan)
 
                 for item in coverage_list:
-                    premium = Premium.objects.get(plan_id=plan.id, use_id=use.id, coverage_id=item.id)
+                    premium = matrix.get(plan, item)
                     items.append(
                         {
                             'coverage': item,
@@ -651,8 +604,9 @@ class PolicyDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
                     total_insured_amount += float(premium.insured_amount)
                     total_amount += float(premium.cost)
 
+                numbers = policy_coverage_numbers.next_values(len(items))
                 _items = [
-                    PolicyCoverage(policy_id=policy.id, **item) for item in items
+                    PolicyCoverage(policy_id=policy.id, number=number, **item) for item, number in zip(items, numbers)
                 ]
 
                 PolicyCoverage.objects.bulk_create(_items)
@@ -678,75 +632,29 @@ class HistoricalChangeRateDefaultSerializer(DynamicFieldsMixin, serializers.Mode
         fields = serializers.ALL_FIELDS
 
 
-class HomeDataSerializer(serializers.ModelSerializer):
-    number_branches = serializers.SerializerMethodField(read_only=True)
-    number_clients = serializers.SerializerMethodField(read_only=True)
-    number_pending_policies = serializers.SerializerMethodField(read_only=True)
-    number_insured_vehicles = serializers.SerializerMethodField(read_only=True)
-    pending_payments = serializers.SerializerMethodField(read_only=True)
+class PolicyBranchOfficeDaySerializer(serializers.Serializer):
+    day = serializers.DateField(read_only=True)
+    branch_office = serializers.UUIDField(read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
 
-    def get_number_branches(self, obj: User):
-        return BranchOffice.objects.aggregate(quantity=Count('id')).get('quantity', 0)
 
-    def get_number_clients(self, obj: User):
-        if obj.is_superuser:
-            return User.objects.filter(
-                is_staff=False, is_superuser=False, is_adviser=False
-            ).aggregate(number=Count('id')).get('number', 0)
-        else:
-            return Policy.objects.filter(
-                created_by_id=obj.id, taker__is_staff=False, taker__is_superuser=False, taker__is_adviser=False
-            ).values('taker_id').distinct().aggregate(number=Count('taker_id')).get('number', 0)
-
-    def get_number_pending_policies(self, obj: User):
-        if obj.is_superuser:
-            return Policy.objects.filter(
-                Q(status=Policy.PENDING_APPROVAL) | Q(status=Policy.OUTSTANDING)
-            ).aggregate(number=Count('id')).get('number', 0)
-        else:
-            return Policy.objects.filter(
-                Q(Q(status=Policy.PENDING_APPROVAL) | Q(status=Policy.OUTSTANDING)) & Q(created_by_id=obj.id)
-            ).aggregate(number=Count('id')).get('number', 0)
-
-    def get_number_insured_vehicles(self, obj: User):
-        if obj.is_superuser:
-            return Policy.objects.filter(
-                Q(status=Policy.PASSED) | Q(status=Policy.EXPIRED)
-            ).values('vehicle_id').distinct().aggregate(number=Count('vehicle_id')).get('number', 0)
-        else:
-            return Policy.objects.filter(
-                Q(Q(status=Policy.PASSED) | Q(status=Policy.EXPIRED)) & Q(created_by_id=obj.id)
-            ).values('vehicle_id').distinct().aggregate(number=Count('vehicle_id')).get('number', 0)
-
-    def get_pending_payments(self, obj: User):
-        if obj.is_superuser:
-            return Payment.objects.filter(status=Payment.PENDING).aggregate(quantity=Count('id')).get('quantity', 0)
-        else:
-            return Payment.objects.filter(
-                status=Payment.PENDING, user_id=obj.id
-            ).aggregate(quantity=Count('id')).get('quantity', 0)
-
-    class Meta:
-        model = User
-        fields = ('number_branches', 'number_clients', 'number_pending_policies', 'number_insured_vehicles',
-                  'pending_payments',)
+class HomeDataSerializer(serializers.Serializer):
+    """
+    Counters of the home, the instance is the dict of `get_dashboard`.
+    """
+    number_branches = serializers.IntegerField(read_only=True)
+    number_clients = serializers.IntegerField(read_only=True)
+    number_pending_policies = serializers.IntegerField(read_only=True)
+    number_insured_vehicles = serializers.IntegerField(read_only=True)
+    pending_payments = serializers.IntegerField(read_only=True)
 
 
 class PolicyForBranchOfficeSerializer(serializers.ModelSerializer):
     quantity = serializers.SerializerMethodField(read_only=True)
 
     def get_quantity(self, obj: BranchOffice):
-        request = self.context.get("request")
-        user = request.user
-        if user.is_superuser:
-            return Policy.objects.filter(
-                created_by__branch_office_id=obj.id
-            ).aggregate(quantity=Count('id')).get('quantity', 0)
-        else:
-            return Policy.objects.filter(
-                created_by__branch_office_id=obj.id,
-                created_by_id=user.id
-            ).aggregate(quantity=Count('id')).get('quantity', 0)
+        # Conteos de `policy_counts_by_branch_office` que la vista pasa en el contexto
+        return self.context.get('policy_counts', {}).get(obj.id, 0)
 
     class Meta:
         model = BranchOffice
@@ -760,3 +668,33 @@ class IncidenceDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer
     class Meta:
         model = Incidence
         fields = serializers.ALL_FIELDS
+
+
+# Relaciones que dibuja cada serializador, para select_related/prefetch_related en las vistas
+USE_PREFETCH_RELATED = ['plan_set', 'premium_set']
+PLAN_PREFETCH_RELATED = ['uses'] + prefixed('uses', USE_PREFETCH_RELATED)
+COVERAGE_PREFETCH_RELATED = ['premium_set', 'plans'] + prefixed('plans', PLAN_PREFETCH_RELATED)
+
+VEHICLE_SELECT_RELATED = ['model__mark', 'use', 'taker'] + prefixed('taker', USER_SELECT_RELATED)
+VEHICLE_PREFETCH_RELATED = prefixed('use', USE_PREFETCH_RELATED) + prefixed('taker', USER_PREFETCH_RELATED)
+
+PRE_POLICY_SELECT_RELATED = ['taker', 'plan', 'vehicle'] + prefixed('taker', USER_SELECT_RELATED) + \
+    prefixed('vehicle', VEHICLE_SELECT_RELATED)
+PRE_POLICY_PREFETCH_RELATED = prefixed('taker', USER_PREFETCH_RELATED) + prefixed('plan', PLAN_PREFETCH_RELATED) + \
+    prefixed('vehicle', VEHICLE_PREFETCH_RELATED)
+
+POLICY_USERS = ['created_by', 'taker', 'adviser']
+POLICY_SELECT_RELATED = POLICY_USERS + ['plan', 'vehicle'] + prefixed('vehicle', VEHICLE_SELECT_RELATED) + [
+    lookup for user in POLICY_USERS for lookup in prefixed(user, USER_SELECT_RELATED)
+]
+POLICY_PREFETCH_RELATED = [
+    Prefetch('items', queryset=PolicyCoverage.objects.select_related('coverage')),
+] + prefixed('items__coverage', COVERAGE_PREFETCH_RELATED) + prefixed('plan', PLAN_PREFETCH_RELATED) + \
+    prefixed('vehicle', VEHICLE_PREFETCH_RELATED) + [
+    lookup for user in POLICY_USERS for lookup in prefixed(user, USER_PREFETCH_RELATED)
+]
+
+INCIDENCE_SELECT_RELATED = ['policy', 'vehicle'] + prefixed('policy', POLICY_SELECT_RELATED) + \
+    prefixed('vehicle', VEHICLE_SELECT_RELATED)
+INCIDENCE_PREFETCH_RELATED = prefixed('policy', POLICY_PREFETCH_RELATED) + \
+    prefixed('vehicle', VEHICLE_PREFETCH_RELATED)
@@ -0,0 +1,265 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+
+from apps.analytics.models import PolicyDay
+from apps.core.models import Coverage, Premium, Policy, BranchOffice, DASHBOARD_NAMESPACE
+from apps.payment.models import Payment
+from apps.security.models import User
+from rc871_backend.utils.cache import get_version
+
+
+class PremiumMatrix:
+    """
+    Premiums of a use for a set of plans, loaded once and resolved in memory.
+
+    It replaces the per coverage `Premium.objects.get(plan, coverage, use)` lookups done while quoting,
+    a listing of plans costs three queries no matter how many plans or coverages it has.
+    """
+
+    def __init__(self, use, plans=None):
+        self.use = use
+        self.plan_ids = None if plans is None else {getattr(plan, 'pk', plan) for plan in plans}
+
+        self._default_coverages = list(Coverage.objects.filter(default=True, is_active=True))
+
+        memberships = Coverage.plans.through.objects.filter(
+            coverage__default=False, coverage__is_active=True
+        ).select_related('coverage')
+        if self.plan_ids is not None:
+            memberships = memberships.filter(plan_id__in=self.plan_ids)
+        self._plan_coverages = defaultdict(list)
+        for membership in memberships:
+            self._plan_coverages[membership.plan_id].append(membership.coverage)
+
+        self._premiums = {}
+        if use:
+            premiums = Premium.objects.filter(use_id=use, coverage__is_active=True)
+            if self.plan_ids is not None:
+                premiums = premiums.filter(plan_id__in=self.plan_ids)
+            for premium in premiums:
+                self._premiums[(premium.plan_id, premium.coverage_id)] = premium
+
+    def covers(self, plan):
+        return self.plan_ids is None or getattr(plan, 'pk', plan) in self.plan_ids
+
+    def coverages(self, plan):
+        """
+        Same rows and order as `Plan.coverage`: default coverages plus the ones of the plan.
+        """
+        plan_id = getattr(plan, 'pk', plan)
+        coverages = {coverage.id: coverage for coverage in self._default_coverages}
+        for coverage in self._plan_coverages.get(plan_id, []):
+            coverages.setdefault(coverage.id, coverage)
+        return sorted(coverages.values(), key=lambda coverage: (coverage.default, coverage.created))
+
+    def priced_coverages(self, plan):
+        plan_id = getattr(plan, 'pk', plan)
+        return [coverage for coverage in self.coverages(plan_id) if (plan_id, coverage.id) in self._premiums]
+
+    def premium(self, plan, coverage):
+        return self._premiums.get((getattr(plan, 'pk', plan), getattr(coverage, 'pk', coverage)))
+
+    def get(self, plan, coverage):
+        premium = self.premium(plan, coverage)
+        if premium is None:
+            raise Premium.DoesNotExist('Premium matching query does not exist.')
+        return premium
+
+    def cost_total(self, plan):
+        return Decimal(sum(premium.cost for premium in self._priced_premiums(plan)))
+
+    def insured_amount_total(self, plan):
+        return Decimal(sum(premium.insured_amount for premium in self._priced_premiums(plan)))
+
+    def _priced_premiums(self, plan):
+        plan_id = getattr(plan, 'pk', plan)
+        return [self._premiums[(plan_id, coverage.id)] for coverage in self.priced_coverages(plan_id)]
+
+
+def get_premium_matrix(context: dict, plans=None) -> PremiumMatrix:
+    """
+    Matrix of the `use` requested shared through the serializer context, so every serializer of a response
+    reuses the same premiums.
+
+    When a plan is missing the matrix is rebuilt with the plans it had plus the new ones, serializers nested in a
+    list load it at most once per distinct plan.
+    """
+    request = context.get('request', None)
+    use = request.query_params.get('use', None) if request else None
+    matrix = context.get('premium_matrix', None)
+    if matrix is None or matrix.use != use:
+        matrix = PremiumMatrix(use, plans)
+        context['premium_matrix'] = matrix
+    elif not all(matrix.covers(plan) for plan in plans or []):
+        plan_ids = matrix.plan_ids | {getattr(plan, 'pk', plan) for plan in plans}
+        matrix = PremiumMatrix(use, plan_ids)
+        context['premium_matrix'] = matrix
+    return matrix
+
+
+UPSERT_PREMIUMS = """
+    INSERT INTO {table} (id, created, updated, coverage_id, use_id, plan_id, insured_amount, cost)
+    SELECT t.id, %(now)s, %(now)s, t.coverage_id, t.use_id, t.plan_id, t.insured_amount, t.cost
+    FROM unnest(%(id)s::uuid[], %(coverage)s::uuid[], %(use)s::uuid[], %(plan)s::uuid[],
+                %(insured_amount)s::numeric[], %(cost)s::numeric[])
+        AS t(id, coverage_id, use_id, plan_id, insured_amount, cost)
+    ON CONFLICT (coverage_id, use_id, plan_id) DO UPDATE
+        SET insured_amount = EXCLUDED.insured_amount, cost = EXCLUDED.cost, updated = EXCLUDED.updated
+    RETURNING id, coverage_id, use_id, plan_id, (xmax = 0) AS created
+"""
+
+
+def upsert_premiums(premiums) -> dict:
+    """
+    Insert or update the premiums by (coverage, use, plan) in a single statement.
+
+    `premiums` are dicts with coverage, use, plan, insured_amount and cost, when a combination is repeated the
+    last one wins as with consecutive `update_or_create`. Returns `{(coverage, use, plan): (id, created)}`.
+    """
+    rows = {}
+    for premium in premiums:
+        rows[(str(premium['coverage']), str(premium['use']), str(premium['plan']))] = premium
+    if not rows:
+        return {}
+
+    params = {
+        'now': timezone.now(),
+        'id': [str(uuid4()) for _ in rows],
+        'coverage': [key[0] for key in rows],
+        'use': [key[1] for key in rows],
+        'plan': [key[2] for key in rows],
+        'insured_amount': [Decimal(str(premium['insured_amount'])) for premium in rows.values()],
+        'cost': [Decimal(str(premium['cost'])) for premium in rows.values()],
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_PREMIUMS.format(table=Premium._meta.db_table), params)
+        return {
+            (str(coverage), str(use), str(plan)): (premium_id, created)
+            for premium_id, coverage, use, plan, created in cursor.fetchall()
+        }
+
+
+def count_querysets(**querysets) -> dict:
+    """
+    Count several querysets in a single SELECT of scalar subqueries, `{name: count}`.
+    """
+    columns = []
+    params = []
+    for name, queryset in querysets.items():
+        sql, query_params = queryset.order_by().values('pk').query.sql_with_params()
+        columns.append('(SELECT COUNT(*) FROM ({0}) AS q) AS {1}'.format(sql, connection.ops.quote_name(name)))
+        params.extend(query_params)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT {0}'.format(', '.join(columns)), params)
+        return dict(zip(querysets.keys(), cursor.fetchone()))
+
+
+def compute_dashboard(user) -> dict:
+    """
+    Counters of the home for the user in two queries: one conditional aggregate over the policies and one
+    with the counts of the other tables.
+    """
+    policies = Policy.objects.all()
+    payments = Payment.objects.filter(status=Payment.PENDING)
+    aggregates = {
+        'number_pending_policies': Count(
+            'id', filter=Q(status__in=[Policy.PENDING_APPROVAL, Policy.OUTSTANDING])
+        ),
+        'number_insured_vehicles': Count(
+            'vehicle_id', filter=Q(status__in=[Policy.PASSED, Policy.EXPIRED]), distinct=True
+        ),
+    }
+    counts = {'number_branches': BranchOffice.objects.all()}
+    if user.is_superuser:
+        counts['number_clients'] = User.objects.filter(is_staff=False, is_superuser=False, is_adviser=False)
+    else:
+        policies = policies.filter(created_by_id=user.id)
+        payments = payments.filter(user_id=user.id)
+        aggregates['number_clients'] = Count(
+            'taker_id', filter=Q(taker__is_staff=False, taker__is_superuser=False, taker__is_adviser=False),
+            distinct=True
+        )
+    counts['pending_payments'] = payments
+
+    data = policies.aggregate(**aggregates)
+    data.update(count_querysets(**counts))
+    return data
+
+
+def get_dashboard(user) -> dict:
+    """
+    Counters of the home cached for `DASHBOARD_CACHE_TIMEOUT` seconds, the superusers share one entry and the
+    rest have one per user. Saving a policy or a payment changes the version and the entries are recomputed.
+    """
+    key = 'dashboard:{0}:{1}'.format(
+        get_version(DASHBOARD_NAMESPACE), 'superuser' if user.is_superuser else user.id
+    )
+    data = cache.get(key)
+    if data is None:
+        data = compute_dashboard(user)
+        cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+
+def branch_office_filters(query_params) -> dict:
+    """
+    `min_created`, `max_created` (YYYY-MM-DD) and `status` (comma separated) of the branch office charts.
+    """
+    filters = {}
+    try:
+        for name in ('min_created', 'max_created'):
+            value = query_params.get(name, None)
+            if value:
+                filters[name] = datetime.date.fromisoformat(value)
+        status = query_params.get('status', None)
+        if status:
+            filters['statuses'] = [int(value) for value in status.split(',')]
+    except ValueError:
+        raise serializers.ValidationError(detail={'error': _('Filtros inválidos')})
+    return filters
+
+
+def policy_counts_by_branch_office(user, min_created=None, max_created=None, statuses=None) -> dict:
+    """
+    Policies per branch office of their creator in one grouped query, `{branch_office_id: quantity}`.
+    """
+    policies = Policy.objects.all()
+    if not user.is_superuser:
+        policies = policies.filter(created_by_id=user.id)
+    if min_created:
+        policies = policies.filter(created__date__gte=min_created)
+    if max_created:
+        policies = policies.filter(created__date__lte=max_created)
+    if statuses:
+        policies = policies.filter(status__in=statuses)
+    rows = policies.order_by().values('created_by__branch_office_id').annotate(quantity=Count('id'))
+    return {row['created_by__branch_office_id']: row['quantity'] for row in rows}
+
+
+def policy_branch_office_days(user, min_created=None, max_created=None, statuses=None):
+    """
+    Daily series per branch office read from the analytics rollup, `[{day, branch_office, quantity}]`.
+    """
+    days = PolicyDay.objects.filter(branch_office__isnull=False)
+    if not user.is_superuser:
+        days = days.filter(created_by_id=user.id)
+    if min_created:
+        days = days.filter(day__gte=min_created)
+    if max_created:
+        days = days.filter(day__lte=max_created)
+    if statuses:
+        days = days.filter(status__in=statuses)
+    return days.order_by('day', 'branch_office_id').values('day', 'branch_office').annotate(
+        quantity=Sum('quantity')
+    )
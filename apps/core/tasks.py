@@ -0,0 +1,53 @@
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.models import Policy
+from apps.core.pdf import build_policy_pdf
+from apps.core.search import refresh_related_documents
+
+
+@shared_task(ignore_result=False)
+def render_policy_pdf(policy_id, force=False):
+    policy = Policy.objects.filter(pk=policy_id, status=Policy.PASSED).first()
+    if policy is None:
+        # Ya no esta aprobada, se libera el estado para que no quede generandose
+        Policy.objects.filter(pk=policy_id, file_status=Policy.FILE_RENDERING).update(file_status=Policy.FILE_NONE)
+        return False
+    try:
+        return build_policy_pdf(policy, force=force)
+    except Exception:
+        Policy.objects.filter(pk=policy_id).update(file_status=Policy.FILE_FAILED)
+        raise
+
+
+def schedule_policy_pdf(policy: Policy, force=False):
+    """
+    Mark the pdf of the policy as rendering and queue it once the current transaction commits.
+    """
+    policy.file_status = Policy.FILE_RENDERING
+    policy.file_requested = timezone.now()
+    Policy.objects.filter(pk=policy.pk).update(file_status=Policy.FILE_RENDERING, file_requested=policy.file_requested)
+    policy_id = str(policy.pk)
+    transaction.on_commit(lambda: render_policy_pdf.delay(policy_id, force))
+
+
+def schedule_policy_pdfs(policy_ids, force=False):
+    """
+    Bulk version of `schedule_policy_pdf`.
+    """
+    policy_ids = [str(policy_id) for policy_id in policy_ids]
+    if not policy_ids:
+        return
+    Policy.objects.filter(pk__in=policy_ids).update(file_status=Policy.FILE_RENDERING, file_requested=timezone.now())
+
+    def enqueue():
+        for policy_id in policy_ids:
+            render_policy_pdf.delay(policy_id, force)
+
+    transaction.on_commit(enqueue)
+
+
+@shared_task(ignore_result=False)
+def refresh_search_documents(label, lookup, pk):
+    return refresh_related_documents(label, lookup, pk)
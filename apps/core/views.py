@@ -1,16 +1,10 @@
-import io
-from os import path, remove
+from decimal import Decimal, InvalidOperation
+from uuid import UUID
 
-import pdfkit
-import qrcode
-import tablib
 from django.conf import settings
-from django.core.files import File
-from django.core.files.images import ImageFile
 from django.db import transaction
 from django.db.models import Q
-from django.http import FileResponse, HttpResponse
-from django.template.loader import render_to_string
+from django.http import FileResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from money.currency import CurrencyHelper
 from rest_framework import status, serializers
@@ -20,8 +14,6 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from six import BytesIO
-from tablib import Dataset
 from django_filters import rest_framework as filters
 from django.utils.translation import gettext_lazy as _
 
@@ -29,13 +21,24 @@ from apps.core.admin import BannerResource, StateResource, CityResource, Municip
     ModelVehicleResource, HistoricalChangeRateResource, VehicleResource, BranchOfficeResource, UseResource, \
     PlanResource, CoverageResource, PremiumResource, PolicyResource, PrePolicyResource, IncidenceResource
 from apps.core.models import Banner, BranchOffice, Use, Plan, Coverage, Premium, Mark, Model, Vehicle, State, City, \
-    Municipality, Policy, HistoricalChangeRate, file_policy_path, Section, PrePolicy, Incidence
+    Municipality, Policy, HistoricalChangeRate, Section, PrePolicy, Incidence
 from apps.core.serializers import BannerDefaultSerializer, BannerEditSerializer, BranchOfficeDefaultSerializer, \
     UseDefaultSerializer, PlanDefaultSerializer, CoverageDefaultSerializer, PremiumDefaultSerializer, \
     ModelDefaultSerializer, MarkDefaultSerializer, VehicleDefaultSerializer, MunicipalityDefaultSerializer, \
     CityDefaultSerializer, StateDefaultSerializer, PolicyDefaultSerializer, HistoricalChangeRateDefaultSerializer, \
     PlanWithCoverageSerializer, HomeDataSerializer, PolicyForBranchOfficeSerializer, SectionDefaultSerializer, \
-    PrePolicyDefaultSerializer, IncidenceDefaultSerializer
+    PrePolicyDefaultSerializer, IncidenceDefaultSerializer, PolicyBranchOfficeDaySerializer, USE_PREFETCH_RELATED, \
+    PLAN_PREFETCH_RELATED, COVERAGE_PREFETCH_RELATED, VEHICLE_SELECT_RELATED, VEHICLE_PREFETCH_RELATED, \
+    POLICY_SELECT_RELATED, POLICY_PREFETCH_RELATED, PRE_POLICY_SELECT_RELATED, PRE_POLICY_PREFETCH_RELATED, \
+    INCIDENCE_SELECT_RELATED, INCIDENCE_PREFETCH_RELATED
+from apps.core.pdf import has_file, is_rendering
+from apps.core.services import upsert_premiums, get_dashboard, branch_office_filters, \
+    policy_counts_by_branch_office, policy_branch_office_days
+from apps.core.tasks import schedule_policy_pdf
+from rc871_backend.filters import TrigramSearchFilter
+from rc871_backend.mixins import RelatedQuerysetMixin, StreamingListMixin
+from rc871_backend.utils.export import export_response
+from rc871_backend.utils.imports import import_response
 
 
 class BannerFilter(filters.FilterSet):
@@ -83,65 +86,11 @@ class BannerViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = BannerResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=banners.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, BannerResource(), 'banners')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = BannerResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, BannerResource())
 
 
 class SectionFilter(filters.FilterSet):
@@ -250,65 +199,11 @@ class BranchOfficeViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = BranchOfficeResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=sucursales.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, BranchOfficeResource(), 'sucursales')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = BranchOfficeResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, BranchOfficeResource())
 
 
 class UseFilter(filters.FilterSet):
@@ -317,7 +212,7 @@ class UseFilter(filters.FilterSet):
         fields = ['code', 'description', 'is_active']
 
 
-class UseViewSet(ModelViewSet):
+class UseViewSet(RelatedQuerysetMixin, ModelViewSet):
     queryset = Use.objects.all()
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_class = UseFilter
@@ -325,6 +220,7 @@ class UseViewSet(ModelViewSet):
     search_fields = ['code', 'description', 'is_active']
     permission_classes = (AllowAny,)
     authentication_classes = []
+    prefetch_related_fields = USE_PREFETCH_RELATED
 
     def paginate_queryset(self, queryset):
         """
@@ -337,65 +233,11 @@ class UseViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = UseResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=usos.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, UseResource(), 'usos')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = UseResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, UseResource())
 
 
 class PlanFilter(filters.FilterSet):
@@ -419,13 +261,14 @@ class PlanFilter(filters.FilterSet):
         fields = ['code', 'description', 'is_active', 'use']
 
 
-class PlanViewSet(ModelViewSet):
+class PlanViewSet(RelatedQuerysetMixin, ModelViewSet):
     queryset = Plan.objects.all()
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_class = PlanFilter
     serializer_class = PlanDefaultSerializer
     search_fields = ['code', 'description', 'is_active']
     permission_classes = (AllowAny,)
+    prefetch_related_fields = PLAN_PREFETCH_RELATED
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve'] and self.request.query_params.get('use', None):
@@ -443,65 +286,11 @@ class PlanViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = PlanResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=planes.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, PlanResource(), 'planes')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = PlanResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, PlanResource())
 
 
 class CoverageFilter(filters.FilterSet):
@@ -510,13 +299,14 @@ class CoverageFilter(filters.FilterSet):
         fields = ['code', 'description', 'is_active']
 
 
-class CoverageViewSet(ModelViewSet):
+class CoverageViewSet(RelatedQuerysetMixin, ModelViewSet):
     queryset = Coverage.objects.all()
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_class = CoverageFilter
     serializer_class = CoverageDefaultSerializer
     search_fields = ['code', 'description', 'is_active']
     permission_classes = (AllowAny,)
+    prefetch_related_fields = COVERAGE_PREFETCH_RELATED
 
     def paginate_queryset(self, queryset):
         """
@@ -529,65 +319,11 @@ class CoverageViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = CoverageResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=coberturas.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, CoverageResource(), 'coberturas')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = CoverageResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, CoverageResource())
 
 
 class PremiumFilter(filters.FilterSet):
@@ -617,86 +353,50 @@ class PremiumViewSet(ModelViewSet):
     @transaction.atomic()
     def multiple(self, request):
         premiums = request.data.get('premiums', None)
+        if not premiums:
+            raise serializers.ValidationError(
+                detail={'error': _("Debe enviar al menos una prima")})
         try:
-            if premiums:
-                for premium in premiums:
-                    obj, created = Premium.objects.update_or_create(
-                        coverage_id=premium['coverage'],
-                        use_id=premium['use'],
-                        plan_id=premium['plan'],
-                        defaults={
-                            'insured_amount': premium['insured_amount'],
-                            'cost': premium['cost'],
-                        },
-                    )
-            else:
+            items = []
+            for premium in premiums:
+                items.append({
+                    'coverage': str(UUID(str(premium['coverage']))),
+                    'use': str(UUID(str(premium['use']))),
+                    'plan': str(UUID(str(premium['plan']))),
+                    'insured_amount': Decimal(str(premium['insured_amount'])),
+                    'cost': Decimal(str(premium['cost'])),
+                })
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise serializers.ValidationError(
+                detail={'error': _("Cada prima debe tener cobertura, uso, plan, monto asegurado y costo validos")})
+
+        for field, model in (('coverage', Coverage), ('use', Use), ('plan', Plan)):
+            ids = {item[field] for item in items}
+            found = {str(pk) for pk in model.objects.filter(id__in=ids).values_list('id', flat=True)}
+            if ids - found:
                 raise serializers.ValidationError(
-                    detail={'error': _("Debe enviar al menos una prima")})
-        except ValueError as e:
-            raise serializers.ValidationError(detail={'error': _(e.__str__())})
-        return Response(status=status.HTTP_200_OK)
+                    detail={'error': _("No existe {0} {1}".format(field, ', '.join(sorted(ids - found))))})
+
+        result = upsert_premiums(items)
+        data = []
+        for item in items:
+            premium_id, created = result[(item['coverage'], item['use'], item['plan'])]
+            data.append({
+                'id': premium_id,
+                'coverage': item['coverage'],
+                'use': item['use'],
+                'plan': item['plan'],
+                'created': created,
+            })
+        return Response(data, status=status.HTTP_200_OK)
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = PremiumResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=primas.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, PremiumResource(), 'primas')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = PremiumResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, PremiumResource())
 
 
 class MarkFilter(filters.FilterSet):
@@ -724,66 +424,11 @@ class MarkViewSet(ModelViewSet):
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = MarkResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                data_set.headers = data_set.headers
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, MarkResource())
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = MarkResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=marcas.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, MarkResource(), 'marcas')
 
 
 class ModelFilter(filters.FilterSet):
@@ -811,66 +456,11 @@ class ModelVehicleViewSet(ModelViewSet):
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = ModelVehicleResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                data_set.headers = data_set.headers
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, ModelVehicleResource())
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = ModelVehicleResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=modelos.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, ModelVehicleResource(), 'modelos')
 
 
 class VehicleFilter(filters.FilterSet):
@@ -880,17 +470,19 @@ class VehicleFilter(filters.FilterSet):
                   'model__description', 'taker_id', 'use_id']
 
 
-class VehicleViewSet(ModelViewSet):
+class VehicleViewSet(RelatedQuerysetMixin, StreamingListMixin, ModelViewSet):
     queryset = Vehicle.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_class = VehicleFilter
     serializer_class = VehicleDefaultSerializer
-    search_fields = ['serial_bodywork', 'serial_engine', 'license_plate', 'transmission', 'taker__username',
-                     'model__description', 'use__description']
+    search_fields = Vehicle.SEARCH_FIELDS
     permission_classes = (AllowAny,)
+    select_related_fields = VEHICLE_SELECT_RELATED
+    prefetch_related_fields = VEHICLE_PREFETCH_RELATED
+    keyset_ordering = ('-created', '-id')
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.with_related(self.queryset)
         user = self.request.user
 
         if user.is_superuser:
@@ -981,66 +573,11 @@ class VehicleViewSet(ModelViewSet):
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = VehicleResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                data_set.headers = data_set.headers
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, VehicleResource())
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = VehicleResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=modelos.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, VehicleResource(), 'modelos')
 
 
 class StateFilter(filters.FilterSet):
@@ -1074,58 +611,7 @@ class StateViewSet(ModelViewSet):
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = StateResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                data_set.headers = data_set.headers
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, StateResource())
 
 
 class CityFilter(filters.FilterSet):
@@ -1159,58 +645,7 @@ class CityViewSet(ModelViewSet):
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = CityResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                data_set.headers = data_set.headers
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, CityResource())
 
 
 class MunicipalityFilter(filters.FilterSet):
@@ -1244,58 +679,7 @@ class MunicipalityViewSet(ModelViewSet):
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = MunicipalityResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                data_set.headers = data_set.headers
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, MunicipalityResource())
 
 
 class PolicyFilter(filters.FilterSet):
@@ -1305,16 +689,18 @@ class PolicyFilter(filters.FilterSet):
                   'vehicle__model__description']
 
 
-class PolicyViewSet(ModelViewSet):
+class PolicyViewSet(RelatedQuerysetMixin, StreamingListMixin, ModelViewSet):
     queryset = Policy.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_class = PolicyFilter
     serializer_class = PolicyDefaultSerializer
-    search_fields = ['number', 'taker__name', 'adviser__name', 'vehicle__model__mark__description',
-                     'vehicle__model__description']
+    search_fields = Policy.SEARCH_FIELDS
+    select_related_fields = POLICY_SELECT_RELATED
+    prefetch_related_fields = POLICY_PREFETCH_RELATED
+    keyset_ordering = ('-created', '-id')
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.with_related(self.queryset)
         user = self.request.user
 
         if user.is_superuser:
@@ -1334,76 +720,48 @@ class PolicyViewSet(ModelViewSet):
             return None
         return self.paginator.paginate_queryset(queryset, self.request, view=self)
 
-    @action(methods=['GET'], detail=True)
-    def pdf(self, request, pk):
-        policy = self.get_object()
-        if policy.status == Policy.PASSED:
-            if policy.file and path.exists(policy.file.path):
-                remove(policy.file.path)
-            if policy.qrcode and path.exists(policy.qrcode.path):
-                remove(policy.qrcode.path)
-
-            data = file_policy_path(policy, '{0}.pdf'.format(str(policy.number)))
-            img = qrcode.make(settings.MEDIA_URL + data)
-            buf = BytesIO()  # BytesIO se da cuenta de leer y escribir bytes en la memoria
-            img.save(buf)
-            image_stream = buf.getvalue()
-            qr_image = ImageFile(io.BytesIO(image_stream), name='qrcode.png')
-            policy.qrcode = qr_image
-            policy.save(update_fields=['qrcode'])
-            context = PolicyDefaultSerializer(policy, context=self.get_serializer_context()).data
-            html = render_to_string("report-pdf.html", context)
-            pdf = pdfkit.from_string(html, False)
-            pdf_file = File(io.BytesIO(pdf), name='{0}.pdf'.format(str(policy.number)))
-            policy.file = pdf_file
-            policy.save()
-            response = HttpResponse(pdf, content_type='application/pdf')
-            response['Content-Disposition'] = 'attachment; filename="policy.pdf"'
-        else:
+    def pdf_response(self, policy: Policy):
+        """
+        Stream the stored pdf, or queue its rendering and answer 202 with `status_url` to poll. Writes to the
+        policy flag the stored pdf as outdated so it is rendered again here.
+        """
+        if policy.status != Policy.PASSED:
             raise serializers.ValidationError(
                 detail={'error': _("La poliza {0} no esta aprobada".format(policy.number))})
 
-        return response
+        if policy.file_status == Policy.FILE_READY and has_file(policy):
+            response = FileResponse(policy.file.open('rb'), content_type='application/pdf')
+            response['Content-Disposition'] = 'attachment; filename="policy.pdf"'
+            return response
+
+        # Mientras se genera no se encola otra vez, el cliente consulta `pdf_status`
+        if not is_rendering(policy):
+            schedule_policy_pdf(policy)
+        return Response(self.pdf_status_data(policy), status=status.HTTP_202_ACCEPTED)
+
+    def pdf_status_data(self, policy: Policy):
+        return {
+            'file_status': policy.file_status,
+            'file_status_display': policy.get_file_status_display(),
+            'status_url': self.reverse_action('pdf-status', args=[policy.pk]),
+            'download_url': self.reverse_action('download-pdf', args=[policy.pk]),
+        }
+
+    @action(methods=['GET'], detail=True)
+    def pdf(self, request, pk):
+        return self.pdf_response(self.get_object())
 
     @action(methods=['GET'], detail=True)
     def download_pdf(self, request, pk):
-        policy = self.get_object()
-        if policy.status == Policy.PASSED:
-            if policy.file and path.exists(policy.file.path):
-                filename = policy.file.path
-                response = FileResponse(open(filename, 'rb'))
-            else:
-                if policy.qrcode and path.exists(policy.qrcode.path):
-                    remove(policy.qrcode.path)
-
-                data = file_policy_path(policy, '{0}.pdf'.format(str(policy.number)))
-                img = qrcode.make(settings.MEDIA_URL + data)
-                buf = BytesIO()  # BytesIO se da cuenta de leer y escribir bytes en la memoria
-                img.save(buf)
-                image_stream = buf.getvalue()
-                qr_image = ImageFile(io.BytesIO(image_stream), name='qrcode.png')
-                policy.qrcode = qr_image
-                policy.save(update_fields=['qrcode'])
-                context = PolicyDefaultSerializer(policy, context=self.get_serializer_context()).data
-                html = render_to_string("report-pdf.html", context)
-                pdf = pdfkit.from_string(html, False)
-                pdf_file = File(io.BytesIO(pdf), name='{0}.pdf'.format(str(policy.number)))
-                policy.file = pdf_file
-                policy.save()
-                response = HttpResponse(pdf, content_type='application/pdf')
-                response['Content-Disposition'] = 'attachment; filename="policy.pdf"'
-        else:
-            raise serializers.ValidationError(
-                detail={'error': _("La poliza {0} no esta aprobada".format(policy.number))})
-        return response
+        return self.pdf_response(self.get_object())
+
+    @action(methods=['GET'], detail=True)
+    def pdf_status(self, request, pk):
+        return Response(self.pdf_status_data(self.get_object()), status=status.HTTP_200_OK)
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = PolicyResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=polizas.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, PolicyResource(), 'polizas')
 
 
 class PrePolicyFilter(filters.FilterSet):
@@ -1412,12 +770,14 @@ class PrePolicyFilter(filters.FilterSet):
         fields = ['taker__name', 'vehicle__model__mark__description', 'vehicle__model__description']
 
 
-class PrePolicyViewSet(ModelViewSet):
+class PrePolicyViewSet(RelatedQuerysetMixin, ModelViewSet):
     queryset = PrePolicy.objects.all()
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_class = PrePolicyFilter
     serializer_class = PrePolicyDefaultSerializer
     search_fields = ['taker__name', 'vehicle__model__mark__description', 'vehicle__model__description']
+    select_related_fields = PRE_POLICY_SELECT_RELATED
+    prefetch_related_fields = PRE_POLICY_PREFETCH_RELATED
 
     def paginate_queryset(self, queryset):
         """
@@ -1430,11 +790,7 @@ class PrePolicyViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = PrePolicyResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=prepolizas.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, PrePolicyResource(), 'prepolizas')
 
 
 class HistoricalChangeRateFilter(filters.FilterSet):
@@ -1469,59 +825,7 @@ class HistoricalChangeRateViewSet(ModelViewSet):
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = HistoricalChangeRateResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(
-                    data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(
-                    data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, HistoricalChangeRateResource())
 
 
 class IncidenceFilter(filters.FilterSet):
@@ -1531,15 +835,17 @@ class IncidenceFilter(filters.FilterSet):
         fields = ['vehicle', 'policy', 'amount', 'detail']
 
 
-class IncidenceViewSet(ModelViewSet):
+class IncidenceViewSet(RelatedQuerysetMixin, ModelViewSet):
     queryset = Incidence.objects.all()
     serializer_class = IncidenceDefaultSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_class = IncidenceFilter
     search_fields = ['vehicle__place', 'policy__number', 'amount', 'detail']
+    select_related_fields = INCIDENCE_SELECT_RELATED
+    prefetch_related_fields = INCIDENCE_PREFETCH_RELATED
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.with_related(self.queryset)
         user = self.request.user
 
         if user.is_superuser:
@@ -1562,67 +868,11 @@ class IncidenceViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = IncidenceResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=incidencias.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, IncidenceResource(), 'incidencias')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = IncidenceResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(
-                    data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(
-                    data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, IncidenceResource())
 
 
 class CoinAPIView(APIView):
@@ -1646,17 +896,29 @@ class HomeDataAPIView(GenericViewSet):
             return HomeDataSerializer
         if self.action == 'policy_for_branch_office':
             return PolicyForBranchOfficeSerializer
+        if self.action == 'policy_for_branch_office_daily':
+            return PolicyBranchOfficeDaySerializer
 
     @action(methods=['GET', ], detail=False)
     def data(self, request):
-        data = HomeDataSerializer(self.request.user).data
+        data = HomeDataSerializer(get_dashboard(self.request.user)).data
         return Response(data, status=status.HTTP_200_OK)
 
     @action(methods=['GET', ], detail=False)
     def policy_for_branch_office(self, request):
+        context = self.get_serializer_context()
+        context['policy_counts'] = policy_counts_by_branch_office(
+            request.user, **branch_office_filters(request.query_params)
+        )
         data = PolicyForBranchOfficeSerializer(
             BranchOffice.objects.filter(is_active=True),
-            context=self.get_serializer_context(),
+            context=context,
             many=True
         ).data
         return Response(data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET', ], detail=False)
+    def policy_for_branch_office_daily(self, request):
+        days = policy_branch_office_days(request.user, **branch_office_filters(request.query_params))
+        data = PolicyBranchOfficeDaySerializer(days, many=True).data
+        return Response(data, status=status.HTTP_200_OK)
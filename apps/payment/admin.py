@@ -2,12 +2,14 @@ from django.contrib import admin
 
 # Register your models here.
 from import_export.fields import Field
+from import_export.instance_loaders import CachedInstanceLoader
 from import_export.resources import ModelResource
 from import_export.widgets import ForeignKeyWidget
 
 from apps.core.models import Policy
 from apps.payment.models import Bank, Payment
 from apps.security.models import User
+from rc871_backend.utils.imports import BulkResourceMixin
 
 
 class PaymentResource(ModelResource):
@@ -35,7 +37,7 @@ class PaymentResource(ModelResource):
         import_id_fields = ('number',)
 
 
-class BankResource(ModelResource):
+class BankResource(BulkResourceMixin, ModelResource):
     code = Field(attribute='code', column_name='Código')
     description = Field(attribute='description', column_name='Descripción')
     status = Field(attribute='get_status_display', column_name='Estatus',  readonly=True)
@@ -44,4 +46,7 @@ class BankResource(ModelResource):
         model = Bank
         fields = ('code', 'description', 'status',)
         import_id_fields = ('code',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        skip_diff = True
 
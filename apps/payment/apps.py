@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class PaymentConfig(AppConfig):
     name = 'apps.payment'
+
+    def ready(self):
+        from apps.core import search
+        from apps.payment.models import Payment
+
+        search.register(Payment)
@@ -1,18 +1,19 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 # Create your models here.
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from money.currency import Currency, CurrencyHelper
 from multiselectfield import MultiSelectField
 from rest_framework import serializers
-from sequences import get_next_value
 
-from apps.core.models import ModelBase, Policy
+from apps.core.models import ModelBase, Policy, post_save_dashboard
 from django.utils.translation import gettext_lazy as _
 
 from rc871_backend.settings import COINS
 from rc871_backend.utils.functions import format_coin
+from rc871_backend.utils.sequences import SequenceAllocator
 
 TRANSFER = 0
 MOBILE_PAYMENT = 1
@@ -61,8 +62,11 @@ def payment_archive_igtf_path(payment: 'Payment', file_name):
     return 'img/payment/{0}/igtf/{1}'.format(payment.number, file_name)
 
 
+payment_numbers = SequenceAllocator('payment', block_size=10)
+
+
 def get_payment_number():
-    return get_next_value('payment')
+    return payment_numbers.next_value()
 
 
 class Payment(ModelBase):
@@ -92,6 +96,14 @@ class Payment(ModelBase):
         (REJECTED, _('rechazado')),
         (ACCEPTED, _('aceptado'))
     ))
+    search_document = models.TextField(verbose_name=_('search document'), blank=True, default='', editable=False)
+
+    SEARCH_FIELDS = ('number', 'status', 'bank__description', 'method', 'user__name', 'amount')
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_document'], name='payment_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     @property
     def amount_display(self):
@@ -116,16 +128,18 @@ def post_save_payment(sender, instance: Payment, raw=False, **kwargs):
             policy = instance.policy
             if instance.status == Payment.REJECTED:
                 policy.status = Policy.PAYMENT_REJECTED
-                policy.save(update_fields=['status'])
+                policy.save(update_fields=['status', 'updated'])
             elif instance.status == Payment.PENDING:
                 policy.status = Policy.PENDING_APPROVAL
-                policy.save(update_fields=['status'])
+                policy.save(update_fields=['status', 'updated'])
             elif instance.status == Payment.ACCEPTED and not policy.payments.filter(status=Payment.PENDING).exists():
                 policy.status = Policy.PASSED
-                policy.save(update_fields=['status'])
+                policy.save(update_fields=['status', 'updated'])
 
     except ValueError as e:
         raise serializers.ValidationError(detail={'error': _(e.__str__())})
 
 
 post_save.connect(post_save_payment, sender=Payment)
+post_save.connect(post_save_dashboard, sender=Payment)
+post_delete.connect(post_save_dashboard, sender=Payment)
@@ -1,4 +1,3 @@
-from constance.backends.database.models import Constance
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
@@ -6,10 +5,12 @@ from django_restql.mixins import DynamicFieldsMixin
 from money.currency import CurrencyHelper, Currency
 from rest_framework import serializers, fields
 from apps.core.models import Policy, Vehicle, Plan
-from apps.core.serializers import PolicyDefaultSerializer
+from apps.core.serializers import PolicyDefaultSerializer, POLICY_SELECT_RELATED, POLICY_PREFETCH_RELATED
 from apps.payment.models import Bank, Payment, METHODS
 from apps.security.models import User
-from apps.security.serializers import UserSimpleSerializer
+from apps.security.serializers import UserSimpleSerializer, USER_SIMPLE_PREFETCH_RELATED
+from rc871_backend.utils.config import get_change_factor
+from rc871_backend.utils.related import prefixed
 
 
 class BankDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
@@ -66,6 +67,11 @@ class PaymentDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         fields = serializers.ALL_FIELDS
 
 
+# Relaciones que dibuja PaymentDefaultSerializer, para select_related/prefetch_related en las vistas
+PAYMENT_SELECT_RELATED = ['user', 'bank', 'policy'] + prefixed('policy', POLICY_SELECT_RELATED)
+PAYMENT_PREFETCH_RELATED = prefixed('user', USER_SIMPLE_PREFETCH_RELATED) + prefixed('policy', POLICY_PREFETCH_RELATED)
+
+
 class PaymentSimpleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault(), write_only=True)
     archive_display = serializers.SerializerMethodField(read_only=True)
@@ -136,8 +142,7 @@ class PaymentEditSerializer(serializers.ModelSerializer):
                     policy = PolicyDefaultSerializer(context=self.context).create({"plan": plan, "vehicle": vehicle})
                     validated_data["policy"] = policy
                 validated_data["amount"] = policy.total_amount
-                change_factor = Constance.objects.get(key="CHANGE_FACTOR").value
-                validated_data['change_factor'] = change_factor
+                validated_data['change_factor'] = get_change_factor()
                 payment = super(PaymentEditSerializer, self).create(validated_data)
         except ValidationError as error:
             raise serializers.ValidationError(detail={"error": error.messages})
@@ -0,0 +1,67 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.core.models import Policy, get_policy_numbers, invalidate_dashboard, mark_policy_files_stale
+from apps.core.search import refresh_written
+from apps.core.tasks import schedule_policy_pdfs
+from apps.payment.models import Payment
+
+
+def lock_policies(payments):
+    policy_ids = set(payments.exclude(policy__isnull=True).values_list('policy_id', flat=True))
+    return list(Policy.objects.select_for_update().filter(id__in=policy_ids).order_by('created').values_list(
+        'id', flat=True
+    ))
+
+
+@transaction.atomic()
+def approve_payments(payment_ids) -> int:
+    """
+    Accept the payments in one statement and leave their policies as `post_save_payment` and
+    `post_save_policy` would: a policy without pending payments is passed, numbered and its pdf queued.
+    """
+    payments = Payment.objects.filter(id__in=payment_ids)
+    policy_ids = lock_policies(payments)
+    count = payments.update(status=Payment.ACCEPTED, updated=timezone.now())
+    invalidate_dashboard()
+    refresh_written(Payment, payment_ids)
+
+    policies = Policy.objects.filter(id__in=policy_ids).annotate(
+        pending=Count('payments', filter=Q(payments__status=Payment.PENDING))
+    ).filter(pending=0).exclude(status=Policy.PASSED, number__isnull=False).order_by('created')
+    policies = list(policies.only('id', 'status', 'number', 'due_date'))
+    if not policies:
+        return count
+
+    now = timezone.now()
+    without_number = [policy for policy in policies if not policy.number]
+    for policy, number in zip(without_number, get_policy_numbers(len(without_number))):
+        policy.number = number
+        policy.due_date = datetime.datetime.now() + datetime.timedelta(days=365)
+    for policy in policies:
+        policy.status = Policy.PASSED
+        policy.updated = now
+    Policy.objects.bulk_update(policies, ['status', 'number', 'due_date', 'updated'])
+    mark_policy_files_stale([policy.id for policy in policies])
+    refresh_written(Policy, [policy.id for policy in without_number])
+    schedule_policy_pdfs([policy.id for policy in without_number])
+    return count
+
+
+@transaction.atomic()
+def reject_payments(payment_ids, commentary=None) -> int:
+    """
+    Reject the payments in one statement, their policies are left with the payment rejected.
+    """
+    payments = Payment.objects.filter(id__in=payment_ids)
+    policy_ids = lock_policies(payments)
+    now = timezone.now()
+    count = payments.update(status=Payment.REJECTED, commentary=commentary, updated=now)
+    invalidate_dashboard()
+    refresh_written(Payment, payment_ids)
+    Policy.objects.filter(id__in=policy_ids).update(status=Policy.PAYMENT_REJECTED, updated=now)
+    mark_policy_files_stale(policy_ids)
+    return count
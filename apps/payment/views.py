@@ -1,7 +1,6 @@
-import tablib
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse
 from rest_framework import mixins
 
 # Create your views here.
@@ -11,14 +10,19 @@ from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.permissions import AllowAny
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from tablib import Dataset
 
 from apps.payment.admin import BankResource, PaymentResource
 from apps.payment.models import Bank, Payment
 from django_filters import rest_framework as filters
 from rest_framework.response import Response
 
-from apps.payment.serializers import BankDefaultSerializer, PaymentDefaultSerializer, PaymentEditSerializer
+from apps.payment import services
+from apps.payment.serializers import BankDefaultSerializer, PaymentDefaultSerializer, PaymentEditSerializer, \
+    PAYMENT_SELECT_RELATED, PAYMENT_PREFETCH_RELATED
+from rc871_backend.filters import TrigramSearchFilter
+from rc871_backend.mixins import RelatedQuerysetMixin, StreamingListMixin
+from rc871_backend.utils.export import export_response
+from rc871_backend.utils.imports import import_response
 
 
 class BankFilter(filters.FilterSet):
@@ -53,65 +57,11 @@ class BankViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = BankResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=bancos.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, BankResource(), 'bancos')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = BankResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, BankResource())
 
     @action(methods=['GET'], detail=True)
     def download_image(self, request, pk):
@@ -128,13 +78,17 @@ class PaymentFilter(filters.FilterSet):
 
 
 class PaymentViewSet(
-    mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.ListModelMixin, GenericViewSet
+    RelatedQuerysetMixin, StreamingListMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+    mixins.UpdateModelMixin, mixins.ListModelMixin, GenericViewSet
 ):
-    queryset = Payment.objects.all().order_by('-number')
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    queryset = Payment.objects.all().order_by('-created', '-id')
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_class = PaymentFilter
     serializer_class = PaymentDefaultSerializer
-    search_fields = ['number', 'status', 'bank__description', 'method', 'user__name', 'amount']
+    search_fields = Payment.SEARCH_FIELDS
+    select_related_fields = PAYMENT_SELECT_RELATED
+    prefetch_related_fields = PAYMENT_PREFETCH_RELATED
+    keyset_ordering = ('-created', '-id')
 
     def get_serializer_class(self):
         if self.action in ['create', 'update']:
@@ -184,9 +138,7 @@ class PaymentViewSet(
         payments = request.data.get('payments', None)
         try:
             if payments:
-                for payment in Payment.objects.filter(id__in=payments):
-                    payment.status = Payment.ACCEPTED
-                    payment.save(update_fields=['status'])
+                services.approve_payments(payments)
             else:
                 raise serializers.ValidationError(
                     detail={'error': _("Debe seleccionar al menos un pago")})
@@ -201,10 +153,7 @@ class PaymentViewSet(
         payments = request.data.get('payments', None)
         try:
             if payments:
-                for payment in Payment.objects.filter(id__in=payments):
-                    payment.status = Payment.REJECTED
-                    payment.commentary = commentary
-                    payment.save(update_fields=['status', 'commentary'])
+                services.reject_payments(payments, commentary)
             else:
                 raise serializers.ValidationError(
                     detail={'error': _("Debe seleccionar al menos un pago")})
@@ -252,8 +201,4 @@ class PaymentViewSet(
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = PaymentResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=cobros.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, PaymentResource(), 'cobros')
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class SecurityConfig(AppConfig):
     name = 'apps.security'
+
+    def ready(self):
+        from apps.core import search
+        from apps.security.models import User
+
+        search.register(User)
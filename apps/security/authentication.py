@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.security.models import User, user_cache_key
+
+JWT_ID_CLAIM = 'jwt_id'
+
+
+def get_cached_user(user_id):
+    """
+    User with its branch office, kept in cache for `AUTH_USER_CACHE_TIMEOUT` seconds, None if it does not exist.
+    """
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.select_related('branch_office').filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def get_token_user(validated_token):
+    """
+    User of a validated token without touching the database on a cache hit.
+
+    Tokens issued with the `jwt_id` claim stop resolving once the `jwt_id` of the user changes.
+    """
+    try:
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    user = get_cached_user(user_id)
+    if user is None:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    jwt_id = validated_token.get(JWT_ID_CLAIM, None)
+    if jwt_id is not None and jwt_id != str(user.jwt_id):
+        raise AuthenticationFailed(_('Token revoked'), code='token_revoked')
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    `JWTAuthentication` resolving the user through `get_token_user`. The result is kept on the request so
+    the middleware and the view validate the token once.
+    """
+
+    def authenticate(self, request):
+        http_request = getattr(request, '_request', request)
+        if not hasattr(http_request, '_jwt_authentication'):
+            http_request._jwt_authentication = super().authenticate(request)
+        return http_request._jwt_authentication
+
+    def get_user(self, validated_token):
+        return get_token_user(validated_token)
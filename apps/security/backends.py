@@ -1,5 +1,4 @@
 from django.contrib.auth.backends import ModelBackend
-from django.db.models.query_utils import Q
 from rest_framework import exceptions
 from django.contrib.auth import get_user_model
 
@@ -25,18 +24,16 @@ class CustomAuthenticationBackend(ModelBackend):
         if username is None or password is None:
             return
         else:
-            try:
-                username = str(username).lower()
-                user = User.objects.get(Q(email=username) | Q(username=username))
-                # user = UserModel._default_manager.get_by_natural_key(str(username).lower())
-                if user.is_staff and user.branch_office is None and not user.is_superuser:
-                    raise exceptions.AuthenticationFailed(
-                        'Aún no tienes asignada la sucursal'
-                    )
-            except UserModel.DoesNotExist:
+            # Puede haber varias coincidencias sin distinguir mayusculas, se toma la mejor
+            user = User.objects.by_login(username).select_related('branch_office').first()
+            if user is None:
                 raise exceptions.AuthenticationFailed(
                     'El usuario o correo suministrado, no se encuentra registrado. Intente con uno diferente'
                 )
+            if user.is_staff and user.branch_office is None and not user.is_superuser:
+                raise exceptions.AuthenticationFailed(
+                    'Aún no tienes asignada la sucursal'
+                )
             if not user.check_password(password):
                 raise exceptions.AuthenticationFailed(
                     'La contraseña ingresada no es correcta. Por favor, inténtelo nuevamente'
@@ -0,0 +1,59 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+USER_SEARCH_FIELDS = ('username', 'name', 'email', 'email_alternative', 'code')
+BATCH_SIZE = 500
+
+
+def build_document(instance, fields):
+    values = []
+    for path in fields:
+        value = instance
+        for name in path.split('__'):
+            value = getattr(value, name, None)
+            if value is None:
+                break
+        if value is not None and value != '':
+            values.append(str(value))
+    return ' '.join(values).lower()
+
+
+def fill_documents(model, fields):
+    # Copia de apps.core.search para que los cambios posteriores no alteren la migracion
+    relations = sorted({path.rsplit('__', 1)[0] for path in fields if '__' in path})
+    pending = []
+    for instance in model.objects.select_related(*relations).order_by().iterator(chunk_size=BATCH_SIZE):
+        instance.search_document = build_document(instance, fields)
+        pending.append(instance)
+        if len(pending) >= BATCH_SIZE:
+            model.objects.bulk_update(pending, ['search_document'])
+            pending = []
+    if pending:
+        model.objects.bulk_update(pending, ['search_document'])
+
+
+def fill_search_documents(apps, schema_editor):
+    fill_documents(apps.get_model('security', 'User'), USER_SEARCH_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_search_document'),
+        ('security', '0003_user_document_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='search document'),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='user_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
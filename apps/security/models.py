@@ -1,13 +1,19 @@
 import uuid
 
 from django.contrib.gis.db import models as geo_models
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Q, Case, When, Value
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.functions import Lower
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import PermissionsMixin
 
 from apps.core.models import ModelBase, BranchOffice, Municipality
+from rc871_backend.utils.cache import bump_version, get_version
 
 
 class Module(ModelBase):
@@ -60,6 +66,33 @@ def circulation_card_image_path(user: 'security.User', file_name):
 
 
 class UserManager(BaseUserManager):
+    def by_login(self, identifier):
+        """
+        Users whose username or email is `identifier` ignoring case, served by the `lower()` indexes.
+
+        Neither column is unique ignoring case, the matches come ranked: the exact username, the username, the
+        email and then the oldest user.
+        """
+        identifier = str(identifier)
+        lower = identifier.lower()
+        return self.alias(username_lower=Lower('username'), email_lower=Lower('email')).filter(
+            Q(username_lower=lower) | Q(email_lower=lower)
+        ).alias(login_rank=Case(
+            When(username=identifier, then=Value(0)),
+            When(username_lower=lower, then=Value(1)),
+            default=Value(2),
+            output_field=models.IntegerField(),
+        )).order_by('login_rank', 'created')
+
+    def by_email(self, email):
+        """
+        Users whose email or alternative email is `email` ignoring case, served by the `lower()` indexes.
+        """
+        email = str(email).lower()
+        return self.alias(email_lower=Lower('email'), email_alternative_lower=Lower('email_alternative')).filter(
+            Q(email_lower=email) | Q(email_alternative_lower=email)
+        )
+
     def system(self):
         user, _ = self.get_or_create(
             username='system',
@@ -203,8 +236,11 @@ class User(AbstractBaseUser, PermissionsMixin, ModelBase):
     jwt_id = models.UUIDField(default=uuid.uuid4, blank=True, null=True)
     info = models.JSONField(default=dict)
     last_sync_date = models.DateTimeField(null=True, blank=True, verbose_name=_('last sync date'))
+    search_document = models.TextField(verbose_name=_('search document'), blank=True, default='', editable=False)
     objects = UserManager()
 
+    SEARCH_FIELDS = ('username', 'name', 'email', 'email_alternative', 'code')
+
     @property
     def last_ip_address(self):
         try:
@@ -243,3 +279,82 @@ class User(AbstractBaseUser, PermissionsMixin, ModelBase):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            GinIndex(fields=['search_document'], name='user_search_trgm_idx', opclasses=['gin_trgm_ops']),
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('email_alternative'), name='user_email_alternative_lower_idx'),
+        ]
+
+
+USER_CACHE_KEY = 'auth:user:{0}'
+
+
+def user_cache_key(user_id) -> str:
+    return USER_CACHE_KEY.format(user_id)
+
+
+def invalidate_user(user_id, using=None):
+    """
+    Drop the user cached by the token authentication, again on commit in case a request cached it meanwhile.
+    """
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key), using=using)
+
+
+def post_save_user(sender, instance: User, using=None, **kwargs):
+    invalidate_user(instance.pk, using)
+
+
+post_save.connect(post_save_user, sender=User)
+post_delete.connect(post_save_user, sender=User)
+
+
+WORKFLOWS_NAMESPACE = 'workflows'
+WORKFLOWS_CACHE_KEY = 'workflows:{0}:{1}'
+
+
+def workflows_cache_key(user_id) -> str:
+    return WORKFLOWS_CACHE_KEY.format(get_version(WORKFLOWS_NAMESPACE), user_id)
+
+
+def invalidate_workflows(user_ids=None, using=None):
+    """
+    Drop the effective workflows of `user_ids`, of every user when None.
+    """
+    if user_ids is None:
+        transaction.on_commit(lambda: bump_version(WORKFLOWS_NAMESPACE), using=using)
+        return
+    keys = [workflows_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys), using=using)
+
+
+def post_save_workflows(sender, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    invalidate_workflows(using=using)
+
+
+def m2m_changed_workflows(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, User):
+        invalidate_workflows([instance.pk], using)
+    elif action != 'post_clear' and sender is not Role.workflows.through:
+        # Desde el rol o el workflow se conocen los usuarios agregados o quitados
+        invalidate_workflows(pk_set, using)
+    else:
+        invalidate_workflows(using=using)
+
+
+post_save.connect(post_save_workflows, sender=Module)
+post_delete.connect(post_save_workflows, sender=Module)
+post_save.connect(post_save_workflows, sender=Workflow)
+post_delete.connect(post_save_workflows, sender=Workflow)
+post_save.connect(post_save_workflows, sender=Role)
+post_delete.connect(post_save_workflows, sender=Role)
+m2m_changed.connect(m2m_changed_workflows, sender=Role.workflows.through)
+m2m_changed.connect(m2m_changed_workflows, sender=User.roles.through)
+m2m_changed.connect(m2m_changed_workflows, sender=User.user_work_flows.through)
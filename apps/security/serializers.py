@@ -2,7 +2,7 @@
 from django.contrib.auth import password_validation
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.utils.translation import gettext_lazy as _
 from django_restql.mixins import DynamicFieldsMixin
 from drf_extra_fields import geo_fields
@@ -10,7 +10,11 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from apps.core.models import Municipality, BranchOffice
+from apps.security.authentication import JWT_ID_CLAIM
 from apps.security.models import User, Workflow, Role, Module
+from apps.security.services import get_workflows, compact_workflows
+
+WORKFLOWS_CLAIM = 'workflows'
 
 
 class MunicipalityUserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
@@ -211,6 +215,15 @@ class UserDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         fields = serializers.ALL_FIELDS
 
 
+# Relaciones que dibujan los serializadores de usuario, para select_related/prefetch_related
+ROLE_PREFETCH = Prefetch('roles', queryset=Role.objects.prefetch_related(
+    Prefetch('workflows', queryset=Workflow.objects.select_related('module'))
+))
+USER_SELECT_RELATED = ['branch_office', 'municipality']
+USER_PREFETCH_RELATED = ['groups', 'user_permissions', 'user_work_flows', ROLE_PREFETCH]
+USER_SIMPLE_PREFETCH_RELATED = [ROLE_PREFETCH]
+
+
 class ClientDefaultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(max_length=255, write_only=True, required=False)
     point = geo_fields.PointField(required=False)
@@ -235,6 +248,13 @@ class UserSimpleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[JWT_ID_CLAIM] = str(user.jwt_id)
+        token[WORKFLOWS_CLAIM] = compact_workflows(get_workflows(user))
+        return token
+
     def validate(self, attrs):
         super().validate(attrs)
         refresh = self.get_token(self.user)
@@ -268,7 +288,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         except ValidationError as error:
             raise serializers.ValidationError(detail={"error": error.messages})
         try:
-            user = User.objects.get(Q(email=email) | Q(email_alternative=email))
+            user = User.objects.by_email(email).get()
         except Exception as e:
             raise serializers.ValidationError(detail={"error": _('email invalid')})
 
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from apps.security.models import Workflow, workflows_cache_key
+
+
+def compute_workflows(user) -> list:
+    """
+    Workflows of the active roles of the user plus its own, grouped by module in the order they were defined:
+    `[{'id', 'title', 'icon', 'workflows': [{'id', 'title', 'url', 'icon'}]}]`.
+    """
+    workflows = Workflow.objects.filter(
+        Q(role__user=user, role__is_active=True) | Q(user=user)
+    ).distinct().select_related('module').order_by('module__created', 'created')
+
+    modules = {}
+    for workflow in workflows:
+        module = workflow.module
+        key = None if module is None else str(module.id)
+        if key not in modules:
+            modules[key] = {
+                'id': key,
+                'title': None if module is None else module.title,
+                'icon': None if module is None else module.icon,
+                'workflows': []
+            }
+        modules[key]['workflows'].append({
+            'id': str(workflow.id), 'title': workflow.title, 'url': workflow.url, 'icon': workflow.icon
+        })
+    return list(modules.values())
+
+
+def get_workflows(user) -> list:
+    """
+    `compute_workflows` kept in cache until the roles or workflows of the user change.
+    """
+    key = workflows_cache_key(user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = compute_workflows(user)
+        cache.set(key, data, settings.WORKFLOWS_CACHE_TIMEOUT)
+    return data
+
+
+def compact_workflows(modules) -> list:
+    """
+    Menu for the token claims: `[[module title, module icon, [[title, url, icon], ...]], ...]`.
+    """
+    return [
+        [module['title'], module['icon'], [
+            [workflow['title'], workflow['url'], workflow['icon']] for workflow in module['workflows']
+        ]]
+        for module in modules
+    ]
@@ -1,18 +1,20 @@
-import tablib
 from django.db.models.query_utils import Q
-from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action, authentication_classes
 from rest_framework.filters import SearchFilter
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView
-from tablib import Dataset
 from django_filters import rest_framework as filters
+from rc871_backend.filters import TrigramSearchFilter
+from rc871_backend.mixins import StreamingListMixin
+from rc871_backend.utils.export import export_response
+from rc871_backend.utils.imports import import_response
 from .admin import UserResource, RoleResource
 from .models import User, Workflow, Role
+from .services import get_workflows
 from .serializers import UserDefaultSerializer, CustomTokenObtainPairSerializer, RoleDefaultSerializer, \
     UserCreateSerializer, WorkflowDefaultSerializer, UserCreateClientSerializer, ClientDefaultSerializer
 
@@ -26,10 +28,10 @@ class UserFilter(filters.FilterSet):
 
 class UserViewSet(ModelViewSet):
     queryset = User.objects.filter(Q(is_staff=True) | Q(is_superuser=True))
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_class = UserFilter
     serializer_class = UserDefaultSerializer
-    search_fields = ['username', 'name', 'email', 'email_alternative', 'is_adviser', 'code', 'is_staff']
+    search_fields = User.SEARCH_FIELDS
     permission_classes = (AllowAny,)
 
     def paginate_queryset(self, queryset):
@@ -78,67 +80,17 @@ class UserViewSet(ModelViewSet):
     def current(self, request):
         return Response(UserDefaultSerializer(request.user).data)
 
+    @action(methods=['GET', ], detail=False, permission_classes=[IsAuthenticated])
+    def workflows(self, request):
+        return Response(get_workflows(request.user))
+
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = UserResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=usuarios.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, UserResource(), 'usuarios')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = UserResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, UserResource())
 
     @action(methods=['GET'], detail=False)
     def field_options(self, request):
@@ -172,13 +124,14 @@ class UserViewSet(ModelViewSet):
             return Response({"error": "the field parameter is mandatory"}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ClientViewSet(ModelViewSet):
+class ClientViewSet(StreamingListMixin, ModelViewSet):
     queryset = User.objects.filter(is_staff=False)
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_class = UserFilter
     serializer_class = ClientDefaultSerializer
-    search_fields = ['username', 'name', 'email', 'email_alternative', 'code', 'is_staff']
+    search_fields = User.SEARCH_FIELDS
     permission_classes = (AllowAny,)
+    keyset_ordering = ('-created', '-id')
 
     def paginate_queryset(self, queryset):
         """
@@ -191,66 +144,11 @@ class ClientViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = UserResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=clientes.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, UserResource(), 'clientes')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = UserResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                data_set.headers = format_headers_import(data_set.headers)
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, UserResource())
 
     @action(methods=['GET'], detail=False)
     def field_options(self, request):
@@ -301,65 +199,11 @@ class RoleViewSet(ModelViewSet):
 
     @action(methods=['GET'], detail=False)
     def export(self, request):
-        dataset = RoleResource().export()
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename=roles.xlsx'
-        response.write(dataset.xlsx)
-        return response
+        return export_response(self, RoleResource(), 'roles')
 
     @action(methods=['POST'], detail=False)
     def _import(self, request):
-        try:
-            resource = RoleResource()
-            errors = []
-            invalids = []
-            if request.FILES:
-                file = request.FILES['file']
-                data_set = Dataset()
-                data_set.load(file.read())
-                result = resource.import_data(data_set, dry_run=True)  # Test the data import
-            else:
-                headers = request.data['headers']
-                data_set = tablib.Dataset(headers=headers)
-                for d in request.data['data']:
-                    data_set.append(d)
-                result = resource.import_data(data_set, dry_run=True)
-
-            if result.has_errors() or len(result.invalid_rows) > 0:
-                for row in result.invalid_rows:
-                    invalids.append(
-                        {
-                            "row": row.number + 1,
-                            "error": row.error,
-                            "error_dict": row.error_dict,
-                            "values": row.values
-                        }
-                    )
-
-                for row in result.row_errors():
-                    err = row[1]
-                    errors.append(
-                        {
-                            "errors": [e.error.__str__() for e in err],
-                            "values": err[0].row,
-                            "row": row[0]
-                        }
-                    )
-
-                return Response({
-                    "rows_error": errors,
-                    "invalid_rows": invalids,
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                result = resource.import_data(data_set, dry_run=False)  # Actually import now
-                return Response({
-                    "totals": result.totals,
-                    "total_rows": result.total_rows,
-                }, status=status.HTTP_200_OK)
-        except ValueError as e:
-            return Response(e, status=status.HTTP_400_BAD_REQUEST)
+        return import_response(request, RoleResource())
 
 
 class WorkflowViewSet(ReadOnlyModelViewSet):
@@ -0,0 +1,33 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+
+def import_group_name(user_id):
+    return 'imports_{0}'.format(user_id)
+
+
+class ImportConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Progress of the import jobs of the connected user.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user', None)
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = import_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def import_progress(self, event):
+        await self.send_json(event)
+
+    async def import_finished(self, event):
+        await self.send_json(event)
+
+    async def import_failed(self, event):
+        await self.send_json(event)
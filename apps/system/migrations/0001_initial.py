@@ -0,0 +1,42 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:00
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+                ('title', models.CharField(max_length=255, verbose_name='title')),
+                ('body', models.TextField(verbose_name='body')),
+                ('users', django.contrib.postgres.fields.ArrayField(base_field=models.UUIDField(), default=list, size=None, verbose_name='users')),
+                ('status', models.SmallIntegerField(choices=[(0, 'Pendiente'), (1, 'Enviando'), (2, 'Enviada'), (3, 'Fallida')], default=0, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('last_token', models.TextField(blank=True, null=True, verbose_name='last token')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='sent')),
+                ('deactivated', models.PositiveIntegerField(default=0, verbose_name='deactivated')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='error')),
+            ],
+            options={
+                'verbose_name': 'notification',
+                'verbose_name_plural': 'notifications',
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['status', 'updated'], name='notification_status_idx'),
+        ),
+    ]
@@ -1 +1,41 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.utils.translation import gettext_lazy as _
 
+from apps.core.models import ModelBase
+
+
+class Notification(ModelBase):
+    """
+    Push notification waiting in the outbox, `dispatch_notification` sends it to the devices of `users`.
+    """
+    PENDING = 0
+    SENDING = 1
+    SENT = 2
+    FAILED = 3
+
+    STATUSES = (
+        (PENDING, _('Pendiente')),
+        (SENDING, _('Enviando')),
+        (SENT, _('Enviada')),
+        (FAILED, _('Fallida')),
+    )
+
+    title = models.CharField(max_length=255, verbose_name=_('title'))
+    body = models.TextField(verbose_name=_('body'))
+    users = ArrayField(models.UUIDField(), verbose_name=_('users'), default=list)
+    status = models.SmallIntegerField(choices=STATUSES, default=PENDING, verbose_name=_('status'))
+    attempts = models.PositiveSmallIntegerField(verbose_name=_('attempts'), default=0)
+    # Ultimo token enviado, un reintento sigue desde ahi
+    last_token = models.TextField(verbose_name=_('last token'), null=True, blank=True)
+    sent = models.PositiveIntegerField(verbose_name=_('sent'), default=0)
+    deactivated = models.PositiveIntegerField(verbose_name=_('deactivated'), default=0)
+    error = models.TextField(verbose_name=_('error'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('notification')
+        verbose_name_plural = _('notifications')
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['status', 'updated'], name='notification_status_idx'),
+        ]
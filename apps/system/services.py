@@ -0,0 +1,98 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, F, QuerySet
+from django.utils.timezone import now
+from fcm_django.models import FCMDevice
+
+from apps.system.models import Notification
+from rc871_backend.utils.config import get_icon_fcm
+from rc871_backend.utils.push import get_push_client, deactivate_devices
+
+logger = logging.getLogger(__name__)
+
+# Una notificacion pendiente mas vieja perdio su tarea, una enviando su worker
+PENDING_DELAY = timedelta(minutes=1)
+SENDING_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_notification(title: str, body: str, users) -> Notification:
+    """
+    Save the notification for `users` (queryset, instances or ids) and queue its dispatch once the transaction
+    commits, the request never waits for the push service.
+    """
+    if isinstance(users, QuerySet):
+        user_ids = list(users.values_list('pk', flat=True))
+    else:
+        user_ids = [getattr(user, 'pk', user) for user in users]
+    notification = Notification.objects.create(title=title, body=body, users=user_ids)
+
+    from apps.system.tasks import dispatch_notification
+    transaction.on_commit(lambda: dispatch_notification.delay(str(notification.pk)))
+    return notification
+
+
+def claim(notification_id) -> bool:
+    """
+    Mark the notification as sending, False when another worker has it or it ran out of attempts.
+    """
+    return Notification.objects.filter(
+        Q(status__in=[Notification.PENDING, Notification.FAILED]) |
+        Q(status=Notification.SENDING, updated__lt=now() - SENDING_TIMEOUT),
+        pk=notification_id,
+        attempts__lt=settings.PUSH_MAX_ATTEMPTS,
+    ).update(status=Notification.SENDING, attempts=F('attempts') + 1, updated=now()) == 1
+
+
+def dispatch_notification(notification_id) -> bool:
+    """
+    Send the notification to the active devices of its users in batches of `PUSH_BATCH_SIZE` tokens, walking them
+    by token so a retry goes on from the last batch sent. The rejected devices are deactivated with one update.
+    """
+    if not claim(notification_id):
+        return False
+    notification = Notification.objects.get(pk=notification_id)
+    client = get_push_client()
+    payload = {"title": notification.title, "body": notification.body, "image": get_icon_fcm()}
+    tokens = FCMDevice.objects.filter(
+        user_id__in=notification.users, active=True
+    ).order_by('registration_id').values_list('registration_id', flat=True).distinct()
+
+    deactivated = []
+    try:
+        while True:
+            batch = tokens
+            if notification.last_token is not None:
+                batch = batch.filter(registration_id__gt=notification.last_token)
+            batch = list(batch[:settings.PUSH_BATCH_SIZE])
+            if not batch:
+                break
+            deactivated += client.send(payload, batch)
+            notification.last_token = batch[-1]
+            notification.sent += len(batch)
+            notification.save(update_fields=['last_token', 'sent', 'updated'])
+    except Exception as e:
+        logger.exception('No se pudo enviar la notificacion %s', notification.pk)
+        notification.status = Notification.FAILED
+        notification.error = str(e)
+    else:
+        notification.status = Notification.SENT
+        notification.error = None
+    finally:
+        notification.deactivated += deactivate_devices(deactivated)
+        notification.save(update_fields=['status', 'error', 'deactivated', 'updated'])
+    return notification.status == Notification.SENT
+
+
+def pending_notifications() -> QuerySet:
+    """
+    Notifications whose task was lost or failed and still have attempts left.
+    """
+    return Notification.objects.filter(
+        Q(status=Notification.PENDING, updated__lt=now() - PENDING_DELAY) |
+        Q(status=Notification.FAILED) |
+        Q(status=Notification.SENDING, updated__lt=now() - SENDING_TIMEOUT),
+        attempts__lt=settings.PUSH_MAX_ATTEMPTS,
+    )
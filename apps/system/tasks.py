@@ -0,0 +1,69 @@
+import json
+
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.system import services
+from apps.system.consumers import import_group_name
+from rc871_backend.utils.imports import read_file, import_rows
+
+
+def to_json(value):
+    # Los reportes traen ValidationError y Decimal, se dejan como los devolveria la API
+    return json.loads(json.dumps(value, cls=JSONEncoder))
+
+
+@shared_task(bind=True)
+def import_file(self, resource_class, path, user_id):
+    """
+    Import a file saved by `import_job_response`, the progress is pushed to the channel group of the user only:
+    the result is stored in the TaskResult once the import is over.
+    """
+    channel_layer = get_channel_layer()
+    group = import_group_name(user_id)
+    resource = import_string(resource_class)()
+
+    def send(event):
+        async_to_sync(channel_layer.group_send)(group, dict(event, task_id=self.request.id))
+
+    def progress(rows, chunk_report):
+        # Corre dentro de la transaccion del import, un estado en TaskResult no se veria hasta el final
+        send(dict(to_json(chunk_report), type='import.progress', rows=rows))
+
+    try:
+        with default_storage.open(path, 'rb') as file:
+            headers, rows = read_file(file, path)
+            report, success = import_rows(resource, headers, rows, progress=progress)
+    except Exception as e:
+        send({"type": "import.failed", "error": str(e)})
+        raise
+    finally:
+        default_storage.delete(path)
+
+    result = to_json(dict(report, success=success))
+    send({"type": "import.finished", "success": success, "totals": result["totals"],
+          "total_rows": result["total_rows"]})
+    return result
+
+
+@shared_task
+def dispatch_notification(notification_id):
+    """
+    Send a notification of the outbox, see `apps.system.services.dispatch_notification`.
+    """
+    return services.dispatch_notification(notification_id)
+
+
+@shared_task
+def dispatch_pending_notifications():
+    """
+    Queue again the notifications whose dispatch was lost or failed.
+    """
+    notification_ids = [str(pk) for pk in services.pending_notifications().values_list('pk', flat=True)]
+    for notification_id in notification_ids:
+        dispatch_notification.delay(notification_id)
+    return len(notification_ids)
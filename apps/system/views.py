@@ -15,6 +15,7 @@ from rest_framework.viewsets import ModelViewSet
 
 from apps.system.serializers import ConstanceSerializer, IntervalScheduleSerializer, PeriodicTaskDefaultSerializer, \
     TaskResultDefaultSerializer
+from rc871_backend.utils.config import invalidate_config
 from rc871_backend.utils.functions import get_settings
 
 
@@ -36,6 +37,7 @@ class ConfigurationViewSet(ModelViewSet):
         value = request.data.get('value', None)
         instance.value = value
         instance.save()
+        transaction.on_commit(invalidate_config)
         return Response(ConstanceSerializer(instance).data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['PUT', ])
@@ -45,6 +47,7 @@ class ConfigurationViewSet(ModelViewSet):
             instance = Constance.objects.get(key=item.get('key'))
             instance.value = item.get('value', None)
             instance.save(update_fields=['value'])
+        transaction.on_commit(invalidate_config)
         return Response(request.data, status=status.HTTP_200_OK)
 
     def list(self, request, *args, **kwargs):
@@ -147,7 +150,7 @@ class TaskResultFilter(filters.FilterSet):
 
     class Meta:
         model = TaskResult
-        fields = ['id', 'task_name', 'status', 'result']
+        fields = ['id', 'task_id', 'task_name', 'status', 'result']
 
     def get_module(self, queryset, name, value):
         if value:
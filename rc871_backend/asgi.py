@@ -13,4 +13,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rc871_backend.settings')
 
-application = get_asgi_application()
+django_asgi_app = get_asgi_application()
+
+# Los modulos con modelos se importan despues de inicializar django
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from apps.chat import routing as chat_routing  # noqa: E402
+from apps.system import routing as system_routing  # noqa: E402
+from rc871_backend.channelsmiddleware import TokenAuthMiddleware  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AuthMiddlewareStack(
+        TokenAuthMiddleware(
+            URLRouter(chat_routing.websocket_urlpatterns + system_routing.websocket_urlpatterns)
+        )
+    ),
+})
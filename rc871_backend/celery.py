@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rc871_backend.settings')
+
+app = Celery('rc871_backend')
+
+# Los settings usan los nombres sin prefijo (BROKER_URL, CELERY_RESULT_BACKEND, ...)
+app.config_from_object('django.conf:settings')
+app.autodiscover_tasks()
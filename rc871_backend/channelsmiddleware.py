@@ -1,27 +1,27 @@
 from django.contrib.auth.models import AnonymousUser
 from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from jwt import decode as jwt_decode
-from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
 from urllib.parse import parse_qs
 
-from apps.security.models import User
+from apps.security.authentication import get_token_user
 
 from channels.db import database_sync_to_async
 
 
 @database_sync_to_async
-def get_user(user_id):
+def get_user(validated_token):
     try:
-        return User.objects.get(id=user_id)
-    except User.DoesNotExist:
+        return get_token_user(validated_token)
+    except AuthenticationFailed:
         return AnonymousUser()
 
 
 class TokenAuthMiddleware:
     """
-    Custom middleware (insecure) that takes user IDs from the query string.
+    Resolves `scope['user']` from the `token` of the query string with the same cached user lookup of the
+    REST views, the handshake is rejected when the token is missing or not valid.
     """
 
     def __init__(self, app):
@@ -32,19 +32,15 @@ class TokenAuthMiddleware:
         # Close old database connections to prevent usage of timed out connections
         close_old_connections()
 
-        token = parse_qs(scope["query_string"].decode("utf8"))["token"][0]
-
-        # Try to authenticate the user
+        token = parse_qs(scope["query_string"].decode("utf8")).get("token", [None])[0]
         try:
-            # This will automatically validate the token and raise an error if token is invalid
-            UntypedToken(token)
-        except (InvalidToken, TokenError) as e:
-            # Token is invalid
-            print(e)
+            # Sin token UntypedToken crearia uno nuevo, se valida y decodifica una sola vez
+            if not token:
+                raise TokenError('Token not provided')
+            validated_token = UntypedToken(token)
+        except TokenError:
+            await send({'type': 'websocket.close', 'code': 4001})
             return None
-        else:
-            #  Then token is valid, decode it
-            decoded_data = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        scope['user'] = await get_user(decoded_data["user_id"])
+        scope['user'] = await get_user(validated_token)
 
         return await self.app(scope, receive, send)
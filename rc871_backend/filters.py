@@ -0,0 +1,34 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from rest_framework.filters import SearchFilter
+
+SEARCH_DOCUMENT_FIELD = 'search_document'
+
+
+class TrigramSearchFilter(SearchFilter):
+    """
+    `search` over the `search_document` the model keeps denormalized (see `apps.core.search`), each term is
+    matched with `LIKE` on the lowercase document, served by its `gin_trgm_ops` index without joins, and the
+    rows are ordered by trigram word similarity with the search.
+
+    Models without a document fall back to `SearchFilter` over the `search_fields` of the view, views over a
+    model with a document set them to its `SEARCH_FIELDS` so the browsable api shows the search box.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not self.has_document(queryset.model):
+            return super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        for term in terms:
+            queryset = queryset.filter(**{'{0}__contains'.format(SEARCH_DOCUMENT_FIELD): term.lower()})
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        search = ' '.join(terms).lower()
+        return queryset.annotate(
+            search_rank=TrigramWordSimilarity(search, SEARCH_DOCUMENT_FIELD)
+        ).order_by('-search_rank', *ordering)
+
+    @staticmethod
+    def has_document(model):
+        return any(field.name == SEARCH_DOCUMENT_FIELD for field in model._meta.concrete_fields)
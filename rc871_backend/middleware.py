@@ -4,14 +4,25 @@ from django.utils.deprecation import MiddlewareMixin
 from django.utils.functional import SimpleLazyObject
 from django.contrib.auth import get_user
 
-from django.core.handlers.wsgi import WSGIRequest
-from rest_framework.authentication import TokenAuthentication
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from apps.security.authentication import CachedJWTAuthentication
 
 
 my_local_global = local()
 
 
+def get_jwt_user(request, user):
+    """
+    User of the bearer token of the request, `user` when there is none or it is not valid.
+    """
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return user
+    return user if result is None else result[0]
+
+
 class JWTAuthenticationMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
@@ -23,10 +34,7 @@ class JWTAuthenticationMiddleware(MiddlewareMixin):
         user = get_user(request)
         if user.is_authenticated:
             return user
-        jwt_authentication = JWTAuthentication()
-        if jwt_authentication.get_header(request):
-            user, jwt = jwt_authentication.authenticate(request)
-        return user
+        return get_jwt_user(request, user)
 
 
 class RestAuthMiddleware:
@@ -38,16 +46,10 @@ class RestAuthMiddleware:
         user = get_user(request)
         if user.is_authenticated:
             return user
-
-        token_authentication = TokenAuthentication()
-        try:
-            user, token = token_authentication.authenticate(request)
-        except:
-            pass
-        return user
+        return get_jwt_user(request, user)
 
     def __call__(self, request):
         request.user = SimpleLazyObject(lambda: self.__class__.get_user(request))
 
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
@@ -0,0 +1,76 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class RelatedQuerysetMixin:
+    """
+    Loads the relations the serializer renders with `select_related`/`prefetch_related`, only in the actions
+    that render the instances of the queryset.
+    """
+    select_related_fields = []
+    prefetch_related_fields = []
+    related_actions = ('list', 'retrieve')
+
+    def with_related(self, queryset):
+        if self.action not in self.related_actions:
+            return queryset
+        return queryset.select_related(*self.select_related_fields).prefetch_related(*self.prefetch_related_fields)
+
+    def get_queryset(self):
+        return self.with_related(super().get_queryset())
+
+
+def chunked_queryset(queryset, chunk_size):
+    """
+    Rows of the queryset in lists of `chunk_size`, the primary keys are read with `.iterator()` and each chunk
+    is loaded with the select_related/prefetch_related of the queryset.
+    """
+    def load(pks):
+        rows = {row.pk: row for row in queryset.filter(pk__in=pks)}
+        return [rows[pk] for pk in pks if pk in rows]
+
+    pks = []
+    for pk in queryset.values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+        pks.append(pk)
+        if len(pks) == chunk_size:
+            yield load(pks)
+            pks = []
+    if pks:
+        yield load(pks)
+
+
+class StreamingListMixin:
+    """
+    Streams the `not_paginator` lists as a JSON array serialized by chunks, instead of building the whole
+    response in memory. Above `unpaginated_max_rows` rows the list must be paginated.
+    """
+    stream_chunk_size = 500
+
+    def get_unpaginated_max_rows(self):
+        return getattr(self, 'unpaginated_max_rows', settings.UNPAGINATED_MAX_ROWS)
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('not_paginator', None):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        max_rows = self.get_unpaginated_max_rows()
+        if queryset.order_by()[:max_rows + 1].count() > max_rows:
+            raise serializers.ValidationError(
+                detail={'error': _('La consulta supera los {0} registros, use la paginación').format(max_rows)}
+            )
+        return StreamingHttpResponse(self.stream_list(queryset), content_type='application/json')
+
+    def stream_list(self, queryset):
+        yield '['
+        separator = ''
+        for chunk in chunked_queryset(queryset, self.stream_chunk_size):
+            for item in self.get_serializer(chunk, many=True).data:
+                yield separator + json.dumps(item, cls=JSONEncoder, ensure_ascii=False)
+                separator = ','
+        yield ']'
@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_CACHED = 'cached'
+COUNT_NONE = 'none'
+
+
+def estimate_count(queryset) -> int:
+    """
+    Rows the planner expects the queryset to return, read from `EXPLAIN` without running it.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) {0}'.format(sql), params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cached_count(queryset) -> int:
+    """
+    `COUNT(*)` of the queryset kept in cache for `PAGINATION_COUNT_CACHE_TIMEOUT` seconds per SQL.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = 'pagination:count:{0}'.format(hashlib.sha1('{0}{1}'.format(sql, params).encode('utf-8')).hexdigest())
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def encode_cursor(values, reverse=False) -> str:
+    """
+    Opaque cursor with the ordering values of a row, `reverse` when it pages backwards.
+    """
+    data = json.dumps({'v': values, 'r': reverse}, cls=JSONEncoder)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(encoded, size):
+    """
+    Values and direction of a cursor of `size` values, raises `ValueError` when it is not valid.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        values, reverse = data['v'], bool(data.get('r', False))
+    except (TypeError, ValueError, KeyError, UnicodeError, AttributeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values, reverse
+
+
+def keyset_filter(ordering, values):
+    """
+    Rows after `values` in `ordering`: (a, b) > (x, y) as `a > x OR (a = x AND b > y)`.
+    """
+    query = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = '{0}__lt' if field.startswith('-') else '{0}__gt'
+        query |= equal & Q(**{lookup.format(name): value})
+        equal &= Q(**{name: value})
+    return query
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    `limit`/`offset` pagination that switches to keyset pagination when the request sends `cursor` (empty for
+    the first page) and the view declares `keyset_ordering`, e.g. `('-created', '-id')`.
+
+    Each keyset page filters on the values of the last row instead of scanning an `OFFSET`, the last field of
+    the ordering must be unique. `count` chooses how the total is computed: `exact` (default with limit/offset),
+    `cached`, `estimate` (from the planner) or `none` (default with cursor). Views with `keyset_only = True`
+    always page with the cursor.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = _('Cursor inválido')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset_ordering = getattr(view, 'keyset_ordering', None)
+        self.use_cursor = self.keyset_ordering is not None and (
+            getattr(view, 'keyset_only', False) or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request) or self.default_limit
+        self.count = self.get_count_mode_count(queryset, COUNT_NONE)
+        values, reverse = self.decode_cursor(request)
+
+        ordering = [self.reverse_field(field) for field in self.keyset_ordering] if reverse \
+            else list(self.keyset_ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            try:
+                queryset = queryset.filter(keyset_filter(ordering, values))
+            except (DjangoValidationError, TypeError, ValueError):
+                # Un cursor bien formado con valores que no son del tipo de los campos
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        self.next_values = self.row_values(rows[-1]) if rows and has_next else None
+        self.previous_values = self.row_values(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_count(self, queryset):
+        return self.get_count_mode_count(queryset, COUNT_EXACT)
+
+    def get_count_mode_count(self, queryset, default):
+        mode = self.request.query_params.get(self.count_query_param, default)
+        if mode == COUNT_ESTIMATE:
+            return estimate_count(queryset)
+        if mode == COUNT_CACHED:
+            return cached_count(queryset)
+        if mode == COUNT_NONE and self.use_cursor:
+            return None
+        return super().get_count(queryset)
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else '-{0}'.format(field)
+
+    def row_values(self, row):
+        return [getattr(row, field.lstrip('-')) for field in self.keyset_ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param, '')
+        if not encoded:
+            return None, False
+        try:
+            return decode_cursor(encoded, len(self.keyset_ordering))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values, reverse=False):
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(values, reverse))
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        return None if self.next_values is None else self.encode_cursor(self.next_values)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        return None if self.previous_values is None else self.encode_cursor(self.previous_values, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
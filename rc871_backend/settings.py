@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 import os
 from datetime import timedelta
+from celery.schedules import crontab
 import environ
 from django.db.models import ImageField
 from money.currency import Currency
@@ -68,6 +69,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
 
     # Vendor
     'rest_framework',
@@ -95,6 +97,7 @@ INSTALLED_APPS = [
     'apps.system.apps.SystemConfig',
     'apps.payment.apps.PaymentConfig',
     'apps.chat.apps.ChatConfig',
+    'apps.analytics.apps.AnalyticsConfig',
 ]
 
 MIDDLEWARE = [
@@ -201,10 +204,10 @@ CONSTANCE_BACKEND = 'constance.backends.database.DatabaseBackend'
 
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'rc871_backend.pagination.KeysetPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.security.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
@@ -229,6 +232,7 @@ SIMPLE_JWT = {
 }
 
 SITE_NAME = env('SITE_NAME')
+PREFIX_APP = env('PREFIX_APP')
 SITE_LOGO = env('SITE_LOGO')
 SITE_VERSION = env('SITE_VERSION')
 
@@ -295,6 +299,45 @@ CELERY_RESULT_BACKEND = 'django-db'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERYBEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERYBEAT_SCHEDULE = {
+    'refresh-analytics': {
+        'task': 'apps.analytics.tasks.refresh_analytics',
+        'schedule': crontab(minute=15),
+    },
+    'dispatch-pending-notifications': {
+        'task': 'apps.system.tasks.dispatch_pending_notifications',
+        'schedule': crontab(),
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/1",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    },
+}
+
+# Seconds the token authentication keeps a user in cache, saving the user drops it before
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Seconds the effective workflows of a user stay in cache, role and workflow changes drop them before
+WORKFLOWS_CACHE_TIMEOUT = 60 * 60
+
+# Seconds a worker keeps using its cached Constance values before checking the shared version stamp
+CONFIG_CACHE_CHECK_INTERVAL = 5
+
+# Seconds the counters of the home are kept in cache
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Seconds a paginated list keeps its total when requested with `count=cached`
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# Rows above which a `not_paginator` list is rejected and must be paginated
+UNPAGINATED_MAX_ROWS = 5000
 
 CHANNEL_LAYERS = {
     "default": {
@@ -307,6 +350,32 @@ CHANNEL_LAYERS = {
 
 ASGI_APPLICATION = "rc871_backend.asgi.application"
 
+# Seconds after which a policy pdf still rendering is considered lost and queued again
+PDF_RENDER_TIMEOUT = 600
+
+# Chat messages are written in batches of this size or every this many milliseconds
+CHAT_WRITER_BATCH_SIZE = 100
+CHAT_WRITER_INTERVAL_MS = 200
+# Messages per page of the chat history sent through the websocket
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 100
+# Seconds a chat connection stays online without a heartbeat and a user stays typing without a keystroke
+PRESENCE_TTL = 60
+PRESENCE_TYPING_TTL = 6
+
+# Push notifications are sent by the worker through the local push service, tokens per request, seconds of
+# (connect, read) timeout and retries with exponential backoff; failed notifications are retried by beat
+PUSH_CLIENT = 'rc871_backend.utils.push.PushClient'
+PUSH_SERVICE_URL = 'http://127.0.0.1:5000/send'
+PUSH_BATCH_SIZE = 500
+PUSH_TIMEOUT = (3, 10)
+PUSH_RETRIES = 3
+PUSH_BACKOFF = 0.5
+PUSH_MAX_ATTEMPTS = 5
+
+# Pricing rules compiled and kept per process
+RULES_CACHE_SIZE = 256
+
 INTERNAL_IPS = [
     '127.0.0.1',
     '194.163.161.64'
@@ -48,6 +48,8 @@ urlpatterns = [
     path('api/security/', include('apps.security.urls')),
     path('api/system/', include('apps.system.urls')),
     path('api/payment/', include('apps.payment.urls')),
+    path('api/analytics/', include('apps.analytics.urls')),
+    path('api/chat/', include('apps.chat.urls')),
 
     path('api/coin/', CoinAPIView.as_view()),
     path('api/config/', ConfigurationGlobalViewSet.as_view()),
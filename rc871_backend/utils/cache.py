@@ -0,0 +1,23 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{0}'
+
+
+def get_version(namespace: str) -> str:
+    """
+    Version stamp shared by every worker through the cache, it changes each time `bump_version` is called.
+    """
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace: str) -> str:
+    version = uuid4().hex
+    cache.set(VERSION_KEY.format(namespace), version, None)
+    return version
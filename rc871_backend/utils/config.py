@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Optional
+
+from constance import config
+from constance.backends.database.models import Constance
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+
+from rc871_backend.utils.cache import get_version, bump_version
+
+CONFIG_NAMESPACE = 'constance'
+
+_lock = threading.Lock()
+_values = {}
+_state = {'version': None, 'checked': 0.0}
+
+
+def _check_version():
+    now = time.monotonic()
+    if now - _state['checked'] < settings.CONFIG_CACHE_CHECK_INTERVAL:
+        return
+    version = get_version(CONFIG_NAMESPACE)
+    with _lock:
+        if version != _state['version']:
+            _values.clear()
+            _state['version'] = version
+        _state['checked'] = now
+
+
+def get_config(key: str, default=None):
+    """
+    Value of a Constance key cached in the process.
+
+    Each worker checks the shared version stamp at most every `CONFIG_CACHE_CHECK_INTERVAL` seconds, so a change
+    saved by another worker is seen within that window.
+    """
+    _check_version()
+    try:
+        return _values[key]
+    except KeyError:
+        pass
+    try:
+        value = Constance.objects.get(key=key).value
+    except ObjectDoesNotExist:
+        value = getattr(config, key, default)
+    with _lock:
+        _values[key] = value
+    return value
+
+
+def invalidate_config():
+    with _lock:
+        _values.clear()
+        _state['version'] = bump_version(CONFIG_NAMESPACE)
+        _state['checked'] = time.monotonic()
+
+
+def get_change_factor() -> float:
+    change_factor = get_config('CHANGE_FACTOR')
+    return 0.0 if change_factor is None else float(change_factor)
+
+
+def get_adviser_default_id() -> Optional[str]:
+    return get_config('ADVISER_DEFAULT_ID') or None
+
+
+def get_prefix_app() -> str:
+    return get_config('PREFIX_APP', settings.PREFIX_APP)
+
+
+def get_icon_fcm() -> Optional[str]:
+    return get_config('ICON_FCM')
@@ -0,0 +1,91 @@
+import csv
+import tempfile
+
+from django.core.exceptions import FieldDoesNotExist
+from django.http import StreamingHttpResponse, FileResponse
+from import_export.resources import ModelResource
+from import_export.widgets import ForeignKeyWidget
+from openpyxl import Workbook
+
+CSV = 'csv'
+XLSX = 'xlsx'
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    File-like object whose write returns the line, so csv.writer can feed a generator.
+    """
+
+    def write(self, value):
+        return value
+
+
+def related_paths(resource: ModelResource, model):
+    """
+    select_related paths needed by the ForeignKeyWidget fields of the resource, e.g. `vehicle__model__mark`
+    for a widget on `vehicle` that renders `model__mark__description`.
+    """
+    paths = set()
+    for field in resource.get_export_fields():
+        if not isinstance(field.widget, ForeignKeyWidget) or not field.attribute:
+            continue
+        path = []
+        current = model
+        for name in [field.attribute] + field.widget.field.split('__'):
+            try:
+                model_field = current._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if not (model_field.many_to_one or model_field.one_to_one):
+                break
+            path.append(name)
+            current = model_field.related_model
+        if path:
+            paths.add('__'.join(path))
+    return sorted(paths)
+
+
+def export_rows(resource: ModelResource, queryset):
+    yield resource.get_export_headers()
+    for obj in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield resource.export_resource(obj)
+
+
+def csv_response(rows, filename):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename={0}.csv'.format(filename)
+    return response
+
+
+def xlsx_response(rows, filename):
+    # En modo write_only openpyxl escribe las filas a disco a medida que llegan
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in rows:
+        sheet.append(row)
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return FileResponse(
+        file, as_attachment=True, filename='{0}.xlsx'.format(filename),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def export_response(view, resource: ModelResource, filename, queryset=None):
+    """
+    Export the queryset of the view with the same filters as its list, one row at a time.
+
+    The format is chosen with the `file_format` query param (`xlsx` by default or `csv`).
+    """
+    if queryset is None:
+        queryset = view.filter_queryset(view.get_queryset())
+    paths = related_paths(resource, queryset.model)
+    if paths:
+        queryset = queryset.select_related(*paths)
+    rows = export_rows(resource, queryset)
+    if view.request.query_params.get('file_format', XLSX) == CSV:
+        return csv_response(rows, filename)
+    return xlsx_response(rows, filename)
@@ -2,15 +2,15 @@ from decimal import Decimal
 from json import JSONEncoder
 from uuid import UUID
 
-import requests
 from constance import config
 from constance.backends.database.models import Constance
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import QuerySet
-from fcm_django.models import FCMDevice
 from money.currency import Currency
 
 from rc871_backend import settings
+from rc871_backend.utils.config import get_icon_fcm
+from rc871_backend.utils.push import get_push_client, chunks, deactivate_devices
 
 
 class PythonObjectEncoder(JSONEncoder):
@@ -54,30 +54,17 @@ def get_settings(allow_settings):
 
 
 def send_fcm_external(title: str, body: str, registration_tokens=[]):
-    try:
-        image = Constance.objects.get(key="ICON_FCM").value
-    except ObjectDoesNotExist:
-        getattr(config, "ICON_FCM")
-        image = Constance.objects.get(key="ICON_FCM").value
-
-    try:
-        params = {
-            "notification": {
-                "title": title,
-                "body": body,
-                "image": image
-            },
-            "token": registration_tokens
-        }
-        response = requests.post('http://127.0.0.1:5000/send', json=params)
-        if response.status_code == 200:
-            resp = response.json()
-            if len(resp['deactivate_devices']) > 0:
-                FCMDevice.objects.filter(registration_id__in=resp['deactivate_devices']).update(active=False)
-                FCMDevice.objects._delete_inactive_devices_if_requested(resp['deactivate_devices'])
-        return response
-    except ValueError as e:
-        return e
+    """
+    Send right away to `registration_tokens` in batches through the pooled push client, returns the deactivated
+    tokens. Requests should queue with `apps.system.services.enqueue_notification` instead.
+    """
+    client = get_push_client()
+    notification = {"title": title, "body": body, "image": get_icon_fcm()}
+    deactivated = []
+    for batch in chunks(registration_tokens, settings.PUSH_BATCH_SIZE):
+        deactivated += client.send(notification, batch)
+    deactivate_devices(deactivated)
+    return deactivated
 
 
 def format_coin(coin):
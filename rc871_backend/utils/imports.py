@@ -0,0 +1,288 @@
+import csv
+import io
+import json
+from collections import Counter
+from itertools import islice
+from uuid import uuid4
+
+import tablib
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from import_export.instance_loaders import ModelInstanceLoader
+from import_export.resources import ModelResource
+from import_export.widgets import ForeignKeyWidget
+from openpyxl import load_workbook
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.utils.encoders import JSONEncoder
+
+CHUNK_SIZE = 500
+
+
+def lookup_key(value):
+    """
+    Key used to match a cell with a database value, xlsx cells bring numbers as floats (1.0 for "1").
+    """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+class CachedForeignKeyWidget(ForeignKeyWidget):
+    """
+    ForeignKeyWidget that loads `field` and the pk of the related table once and resolves the values from a
+    dictionary.
+
+    Values that are not in the dictionary, or that several rows share, fall back to the database lookup, so the
+    errors are the same.
+    """
+
+    def __init__(self, model, field='pk', *args, **kwargs):
+        super().__init__(model, field, *args, **kwargs)
+        self.instances = None
+
+    def load_instances(self):
+        instances = {}
+        ambiguous = set()
+        for instance in self.model.objects.only(self.field):
+            key = lookup_key(getattr(instance, self.field))
+            if key in instances:
+                ambiguous.add(key)
+            instances[key] = instance
+        for key in ambiguous:
+            del instances[key]
+        return instances
+
+    def clean(self, value, row=None, *args, **kwargs):
+        if not value:
+            return None
+        if self.instances is None:
+            self.instances = self.load_instances()
+        instance = self.instances.get(lookup_key(value), None)
+        if instance is None:
+            return super().clean(value, row, *args, **kwargs)
+        return instance
+
+
+class CachedCompositeInstanceLoader(ModelInstanceLoader):
+    """
+    Loads in one query the existing instances of the dataset when `import_id_fields` has several fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        model = self.resource._meta.model
+        self.id_fields = [self.resource.fields[name] for name in self.resource.get_import_id_fields()]
+        self.attnames = [model._meta.get_field(field.attribute).attname for field in self.id_fields]
+
+        first = self.id_fields[0]
+        values = set()
+        for row in self.dataset.dict:
+            try:
+                values.add(first.clean(row))
+            except Exception:
+                continue
+        queryset = self.get_queryset().filter(**{'{0}__in'.format(first.attribute): values})
+        self.all_instances = {
+            tuple(getattr(instance, attname) for attname in self.attnames): instance for instance in queryset
+        }
+
+    def get_instance(self, row):
+        key = []
+        for field in self.id_fields:
+            value = field.clean(row)
+            key.append(getattr(value, 'pk', value))
+        return self.all_instances.get(tuple(key), None)
+
+
+class BulkResourceMixin:
+    """
+    Keeps the errors of `bulk_create`/`bulk_update`, import_export only logs them, and refreshes the search
+    documents the written rows end up in.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bulk_errors = []
+
+    def bulk_create(self, using_transactions, dry_run, raise_errors, batch_size=None):
+        instances = list(self.create_instances)
+        try:
+            super().bulk_create(using_transactions, dry_run, True, batch_size)
+        except Exception as e:
+            self.bulk_errors.append(e)
+        else:
+            self.refresh_search(instances, dry_run)
+
+    def bulk_update(self, using_transactions, dry_run, raise_errors, batch_size=None):
+        instances = list(self.update_instances)
+        try:
+            super().bulk_update(using_transactions, dry_run, True, batch_size)
+        except Exception as e:
+            self.bulk_errors.append(e)
+        else:
+            self.refresh_search(instances, dry_run)
+
+    def refresh_search(self, instances, dry_run):
+        from apps.core.search import refresh_written
+
+        if not dry_run:
+            refresh_written(self._meta.model, [instance.pk for instance in instances])
+
+
+def read_file(file, name):
+    """
+    Headers and a row iterator of an uploaded file, the file is read as the rows are consumed.
+    """
+    name = name.lower()
+    if name.endswith('.csv'):
+        reader = csv.reader(io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig', newline=''))
+        return next(reader, []), reader
+    if name.endswith('.xlsx'):
+        sheet = load_workbook(file, read_only=True, data_only=True).worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        return list(next(rows, [])), rows
+    if name.endswith('.json'):
+        data = json.load(file)
+        return data['headers'], iter(data['data'])
+    data_set = tablib.Dataset()
+    data_set.load(file.read())
+    return data_set.headers, iter(data_set)
+
+
+def fit_rows(headers, rows):
+    """
+    Rows with the width of the headers as tablib's loader left them: empty rows are skipped, short rows padded
+    with '' and the cells past the headers dropped.
+    """
+    width = len(headers)
+    for row in rows:
+        row = list(row)
+        if all(value is None or value == '' for value in row):
+            continue
+        if len(row) < width:
+            row += [''] * (width - len(row))
+        yield row[:width]
+
+
+def read_rows(request):
+    """
+    Headers and a row iterator of the file or the json sent.
+    """
+    if request.FILES:
+        file = request.FILES['file']
+        return read_file(file, file.name)
+    return request.data['headers'], iter(request.data['data'])
+
+
+def import_rows(resource: ModelResource, headers, rows, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Validate and write the rows in a single pass, one savepoint per chunk.
+
+    Everything is rolled back if any chunk has errors. Returns the report of the old `_import` actions
+    and whether it succeeded. `progress` is called after each chunk with the rows processed so far and
+    the errors of the chunk.
+    """
+    errors = []
+    invalids = []
+    totals = Counter()
+    total_rows = 0
+    bulk = resource._meta.use_bulk
+    rows = fit_rows(headers, rows)
+
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            data_set = tablib.Dataset(*chunk, headers=headers)
+            offset = total_rows
+            with transaction.atomic():
+                # Con bulk no hay guardados por fila, el savepoint del bloque basta
+                result = resource.import_data(data_set, dry_run=False, use_transactions=not bulk)
+                bulk_errors = getattr(resource, 'bulk_errors', [])
+                failed = result.has_errors() or len(result.invalid_rows) > 0 or len(bulk_errors) > 0
+                if failed:
+                    transaction.set_rollback(True)
+
+            chunk_invalids = []
+            chunk_errors = []
+            for row in result.invalid_rows:
+                chunk_invalids.append(
+                    {
+                        "row": offset + row.number + 1,
+                        "error": row.error,
+                        "error_dict": row.error_dict,
+                        "values": row.values
+                    }
+                )
+            for row in result.row_errors():
+                err = row[1]
+                chunk_errors.append(
+                    {
+                        "errors": [e.error.__str__() for e in err],
+                        "values": err[0].row,
+                        "row": offset + row[0]
+                    }
+                )
+            for error in result.base_errors:
+                chunk_errors.append({"errors": [error.error.__str__()], "values": {}, "row": None})
+            for error in bulk_errors:
+                chunk_errors.append({"errors": [error.__str__()], "values": {}, "row": None})
+            bulk_errors.clear()
+
+            invalids.extend(chunk_invalids)
+            errors.extend(chunk_errors)
+            totals.update(result.totals)
+            total_rows += result.total_rows
+            if progress is not None:
+                progress(total_rows, {"rows_error": chunk_errors, "invalid_rows": chunk_invalids})
+
+        failed = len(errors) > 0 or len(invalids) > 0
+        if failed:
+            transaction.set_rollback(True)
+
+    report = {"totals": dict(totals), "total_rows": total_rows}
+    if failed:
+        report.update({"rows_error": errors, "invalid_rows": invalids})
+    return report, not failed
+
+
+def import_job_response(request, resource: ModelResource):
+    """
+    Persist the upload and queue it, the result is kept in the TaskResult of the returned task_id.
+    """
+    from apps.system.tasks import import_file
+
+    folder = 'imports/{0}'.format(uuid4().hex)
+    if request.FILES:
+        file = request.FILES['file']
+        path = default_storage.save('{0}/{1}'.format(folder, file.name), file)
+    else:
+        content = json.dumps({'headers': request.data['headers'], 'data': request.data['data']}, cls=JSONEncoder)
+        path = default_storage.save('{0}/data.json'.format(folder), ContentFile(content.encode('utf-8')))
+
+    resource_class = '{0}.{1}'.format(resource.__class__.__module__, resource.__class__.__name__)
+    task = import_file.delay(resource_class, path, str(request.user.id))
+    return Response({
+        "task_id": task.id,
+        "status_url": '{0}?task_id={1}'.format(reverse('taskresult-list', request=request), task.id),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def import_response(request, resource: ModelResource):
+    """
+    Shared body of the `_import` actions, `?background=true` runs the import as a job.
+    """
+    if request.query_params.get('background', None) in ('true', '1'):
+        return import_job_response(request, resource)
+    try:
+        headers, rows = read_rows(request)
+        report, success = import_rows(resource, headers, rows)
+        if success:
+            return Response(report, status=status.HTTP_200_OK)
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError as e:
+        return Response(e, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,76 @@
+import threading
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from fcm_django.models import FCMDevice
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_local = threading.local()
+
+
+class PushClient:
+    """
+    Client of the local push service, one pooled session per client with timeouts and retries with exponential
+    backoff on connection errors, 429 and 5xx.
+    """
+
+    def __init__(self, url=None, timeout=None, retries=None, backoff=None):
+        self.url = url or settings.PUSH_SERVICE_URL
+        self.timeout = timeout or settings.PUSH_TIMEOUT
+        retry = Retry(
+            total=settings.PUSH_RETRIES if retries is None else retries,
+            backoff_factor=settings.PUSH_BACKOFF if backoff is None else backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            method_whitelist=frozenset(['POST']),
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(max_retries=retry))
+        self.session.mount('https://', HTTPAdapter(max_retries=retry))
+
+    def send(self, notification: dict, tokens) -> list:
+        """
+        Send `notification` to at most `PUSH_BATCH_SIZE` tokens, returns the tokens the provider rejected.
+        """
+        response = self.session.post(
+            self.url, json={"notification": notification, "token": list(tokens)}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json().get('deactivate_devices', [])
+
+
+def get_push_client():
+    """
+    Client of the class `PUSH_CLIENT` shared by the thread, tests replace the class with a stub.
+    """
+    clients = getattr(_local, 'clients', None)
+    if clients is None:
+        clients = _local.clients = {}
+    client = clients.get(settings.PUSH_CLIENT, None)
+    if client is None:
+        client = clients[settings.PUSH_CLIENT] = import_string(settings.PUSH_CLIENT)()
+    return client
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def deactivate_devices(tokens) -> int:
+    """
+    Deactivate the devices of the rejected `tokens` with one update.
+    """
+    if not tokens:
+        return 0
+    count = FCMDevice.objects.filter(registration_id__in=tokens, active=True).update(active=False)
+    FCMDevice.objects._delete_inactive_devices_if_requested(tokens)
+    return count
@@ -0,0 +1,16 @@
+from django.db.models import Prefetch
+
+
+def prefixed(prefix, lookups):
+    """
+    `select_related`/`prefetch_related` lookups of a nested serializer as seen from the relation `prefix`.
+    """
+    result = []
+    for lookup in lookups:
+        if isinstance(lookup, Prefetch):
+            result.append(Prefetch(
+                '{0}__{1}'.format(prefix, lookup.prefetch_through), queryset=lookup.queryset, to_attr=lookup.to_attr
+            ))
+        else:
+            result.append('{0}__{1}'.format(prefix, lookup))
+    return result
@@ -1,18 +1,23 @@
 import ast
-import copy
-from typing import Union
+import builtins
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Union, Iterable, Tuple
 
 from bunch import Bunch
 from django.conf import settings
 from money.money import Money
 
-
-def convert_expr2_expression(expr) -> ast.Expression:
-    expr.lineno = 0
-    expr.col_offset = 0
-    result = ast.Expression(expr.value, lineno=0, col_offset=0)
-
-    return result
+# Lo unico de builtins que ven las reglas, sin __import__, open, eval ni exec
+SAFE_BUILTINS = {
+    name: getattr(builtins, name) for name in (
+        'abs', 'all', 'any', 'bool', 'dict', 'divmod', 'enumerate', 'float', 'int', 'isinstance', 'len', 'list',
+        'max', 'min', 'pow', 'range', 'round', 'set', 'sorted', 'str', 'sum', 'tuple', 'zip',
+        'ArithmeticError', 'KeyError', 'ValueError', 'ZeroDivisionError',
+    )
+}
 
 
 def reduce(value):
@@ -22,24 +27,99 @@ def reduce(value):
         return Bunch(**value)
 
 
-def exec_with_return(code: str, price: Union[Money, float], params: dict) -> any:
-    if 'fixed' in params:
-        params['fixed'] = Money(params['fixed'], settings.CURRENCY)
+@lru_cache(maxsize=None)
+def base_namespace(currency) -> dict:
+    return {
+        '__builtins__': SAFE_BUILTINS,
+        'Bunch': Bunch,
+        'Money': Money,
+        'reduce': reduce,
+        'currency': currency,
+        'ZERO': Money('0', currency),
+    }
+
 
+def prepare_params(params: dict) -> Bunch:
     params = Bunch(params)
-    price = price
+    if 'fixed' in params and not isinstance(params['fixed'], Money):
+        params['fixed'] = Money(params['fixed'], settings.CURRENCY)
+    return params
 
-    ZERO = Money('0', settings.CURRENCY)
-    currency = settings.CURRENCY
-    code_ast = ast.parse(code)
 
-    init_ast = copy.deepcopy(code_ast)
-    init_ast.body = code_ast.body[:-1]
+class CompiledRule:
+    """
+    Rule compiled once: the statements run with `exec` and the value of the last one, when it is an expression,
+    is returned with `eval`. Rules see `price`, `params`, `ZERO`, `currency`, `Money`, `Bunch`, `reduce` and
+    `SAFE_BUILTINS`, the variables they define live in the same namespace so comprehensions can use them.
+    """
 
-    last_ast = copy.deepcopy(code_ast)
-    last_ast.body = code_ast.body[-1:]
-    exec(compile(init_ast, "<ast>", "exec"), globals(), locals())
-    if type(last_ast.body[0]) == ast.Expr:
-        return eval(compile(convert_expr2_expression(last_ast.body[0]), "<ast>", "eval"), globals(), locals())
-    else:
-        exec(compile(last_ast, "<ast>", "exec"), globals(), locals())
+    def __init__(self, code: str, digest: str):
+        self.digest = digest
+        filename = '<rule {0}>'.format(digest[:8])
+        tree = ast.parse(code, filename)
+        self.result = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            self.result = compile(ast.Expression(tree.body.pop().value), filename, 'eval')
+        self.body = compile(tree, filename, 'exec') if tree.body else None
+
+    def run(self, namespace: dict):
+        if self.body is not None:
+            exec(self.body, namespace)
+        if self.result is not None:
+            return eval(self.result, namespace)
+        return None
+
+    def evaluate(self, price: Union[Money, float], params: dict) -> any:
+        namespace = dict(base_namespace(settings.CURRENCY), price=price, params=prepare_params(params))
+        return self.run(namespace)
+
+    def evaluate_many(self, rows: Iterable[Tuple[Union[Money, float], dict]]) -> list:
+        """
+        Evaluate the rule for each `(price, params)` row, the rule and the base namespace are looked up once.
+        """
+        base = base_namespace(settings.CURRENCY)
+        return [self.run(dict(base, price=price, params=prepare_params(params))) for price, params in rows]
+
+
+class RuleCache:
+    """
+    Compiled rules of the process by sha1 of their source, the least recently used are dropped past `size`.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.rules = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, code: str) -> CompiledRule:
+        digest = hashlib.sha1(code.encode('utf-8')).hexdigest()
+        with self.lock:
+            rule = self.rules.get(digest, None)
+            if rule is not None:
+                self.rules.move_to_end(digest)
+                return rule
+        rule = CompiledRule(code, digest)
+        with self.lock:
+            self.rules[digest] = rule
+            while len(self.rules) > self.size:
+                self.rules.popitem(last=False)
+        return rule
+
+    def clear(self):
+        with self.lock:
+            self.rules.clear()
+
+
+rules = RuleCache(settings.RULES_CACHE_SIZE)
+
+
+def compile_rule(code: str) -> CompiledRule:
+    return rules.get(code)
+
+
+def evaluate_many(code: str, rows: Iterable[Tuple[Union[Money, float], dict]]) -> list:
+    return compile_rule(code).evaluate_many(rows)
+
+
+def exec_with_return(code: str, price: Union[Money, float], params: dict) -> any:
+    return compile_rule(code).evaluate(price, params)
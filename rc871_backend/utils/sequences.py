@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from django.db import connections, router
+from sequences import get_next_value
+
+POSTGRESQL_UPSERT_MANY = """
+        INSERT INTO {db_table} (name, last)
+             VALUES (%s, %s)
+        ON CONFLICT (name)
+      DO UPDATE SET last = {db_table}.last + %s
+          RETURNING last;
+"""
+
+
+def upsert_values(connection, sequence_name, count, initial_value=1):
+    # Se importa aqui porque los modelos no pueden importarse antes de cargar la aplicacion
+    from sequences.models import Sequence
+
+    db_table = connection.ops.quote_name(Sequence._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            POSTGRESQL_UPSERT_MANY.format(db_table=db_table),
+            [sequence_name, initial_value + count - 1, count]
+        )
+        last = cursor.fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+def get_next_values(sequence_name, count, initial_value=1, using=None):
+    """
+    Next `count` values of a django-sequences sequence taken in a single statement.
+
+    Same numbers `count` calls to `get_next_value` would give, the row stays locked until the transaction ends.
+    """
+    from sequences.models import Sequence
+
+    if count <= 0:
+        return []
+    if using is None:
+        using = router.db_for_write(Sequence)
+    return upsert_values(connections[using], sequence_name, count, initial_value)
+
+
+@contextmanager
+def independent_connection(using):
+    """
+    Connection outside of the request transaction, what it reserves is committed at once. It is closed when the
+    block ends: blocks are reserved seldom and a connection kept per thread would outlive Django's cleanup.
+    """
+    connection = connections.create_connection(using)
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def reserve_block(sequence_name, count, initial_value=1, using=None):
+    from sequences.models import Sequence
+
+    if using is None:
+        using = router.db_for_write(Sequence)
+    with independent_connection(using) as connection:
+        return upsert_values(connection, sequence_name, count, initial_value)
+
+
+class SequenceAllocator:
+    """
+    Values of a django-sequences sequence with an explicit gap policy.
+
+    - `gapless=True`: every value is taken from the sequence row inside the transaction of the caller, a rollback
+      gives it back. The row stays locked until the transaction ends, use it only where gaps are not allowed.
+    - `gapless=False`: values are handed out from blocks of `block_size` reserved and committed at once on an
+      independent connection, so inserts do not wait on the row lock. Values of a rolled back transaction or of
+      a block left when the process ends are lost, and values are unique but not ordered between processes.
+    """
+
+    def __init__(self, sequence_name, block_size=50, gapless=False, initial_value=1):
+        self.sequence_name = sequence_name
+        self.block_size = block_size
+        self.gapless = gapless
+        self.initial_value = initial_value
+        self._lock = threading.Lock()
+        self._values = deque()
+        self._pid = os.getpid()
+
+    def _take(self, count):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Despues de un fork el bloque heredado lo tiene tambien el proceso padre
+                self._values.clear()
+                self._pid = os.getpid()
+            if len(self._values) < count:
+                self._values.extend(
+                    reserve_block(self.sequence_name, max(self.block_size, count - len(self._values)),
+                                  self.initial_value)
+                )
+            return [self._values.popleft() for _ in range(count)]
+
+    def next_value(self):
+        if self.gapless:
+            return get_next_value(self.sequence_name, self.initial_value)
+        return self._take(1)[0]
+
+    def next_values(self, count):
+        """
+        Values for a bulk operation in at most one round trip.
+        """
+        if count <= 0:
+            return []
+        if self.gapless:
+            return get_next_values(self.sequence_name, count, self.initial_value)
+        return self._take(count)
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import time
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from apps.chat.models import Message
+from apps.chat.routing import websocket_urlpatterns
+from apps.chat.writer import get_writer
+from apps.security.models import User
+
+CLIENTS = 20
+MESSAGES = 500
+
+
+def with_user(application, user):
+    """
+    The consumers without the token middleware, every connection is `user`.
+    """
+    async def app(scope, receive, send):
+        return await application(dict(scope, user=user), receive, send)
+    return app
+
+
+async def client(application, room, messages, writing):
+    communicator = WebsocketCommunicator(application, '/ws/chat/{0}/'.format(room))
+    connected, _ = await communicator.connect()
+    assert connected
+    sent = 0
+    for number in range(messages):
+        typing = writing and number % 2 == 0
+        await communicator.send_to(text_data=json.dumps({'text': 'mensaje {0}'.format(number), 'writing': typing}))
+        sent += not typing
+    # Se espera el eco de los mensajes para medir tambien el reparto de la sala, los avisos de escritura se
+    # agrupan por ventana y los eventos de presencia no se cuentan
+    echoed = 0
+    while echoed < sent:
+        data = json.loads(await communicator.receive_from(timeout=60))
+        echoed += data.get('type') == 'chat_message' and not data['writing']
+    await communicator.disconnect()
+
+
+async def benchmark(user, clients, messages, writing):
+    application = with_user(URLRouter(websocket_urlpatterns), user)
+    start = time.perf_counter()
+    # Cada cliente en su sala para que el reparto no multiplique los mensajes
+    await asyncio.gather(*[
+        client(application, 'benchmark{0}'.format(number), messages, writing) for number in range(clients)
+    ])
+    await get_writer().flush()
+    return time.perf_counter() - start
+
+
+def run(*args):
+    """
+    python manage.py runscript benchmark_chat --script-args [clients] [messages] [writing]
+
+    Messages per second a single process takes through `ChatConsumer`, with the configured channel layer and
+    the batched writer. `writing` sends half of the frames as typing notices.
+    """
+    clients = int(args[0]) if args else CLIENTS
+    messages = int(args[1]) if len(args) > 1 else MESSAGES
+    writing = 'writing' in args
+    user = User.objects.filter(is_active=True).first()
+
+    before = Message.objects.count()
+    elapsed = asyncio.run(benchmark(user, clients, messages, writing))
+    total = clients * messages
+    print('{0} mensajes en {1:.2f} s: {2:.0f} mensajes/s'.format(total, elapsed, total / elapsed))
+    print('{0} mensajes guardados'.format(Message.objects.count() - before))
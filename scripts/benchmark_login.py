@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db.models import Q
+
+from apps.security.models import User
+
+PREFIX = 'bench-login-'
+BATCH_SIZE = 10000
+ROUNDS = 500
+
+
+def create_users(database, total):
+    users = User.objects.using(database)
+    existing = users.filter(username__startswith=PREFIX).count()
+    # Un solo hash para todos, el benchmark mide la busqueda y no el hasher
+    password = make_password('benchmark')
+    for start in range(existing, total, BATCH_SIZE):
+        users.bulk_create([
+            User(
+                username='{0}{1}'.format(PREFIX, number), email='{0}{1}@example.com'.format(PREFIX, number),
+                name='Bench', last_name=str(number), password=password, info={}
+            )
+            for number in range(start, min(start + BATCH_SIZE, total))
+        ], batch_size=BATCH_SIZE)
+        print('{0} usuarios'.format(min(start + BATCH_SIZE, total)))
+    with connections[database].cursor() as cursor:
+        cursor.execute('ANALYZE {0}'.format(connections[database].ops.quote_name(User._meta.db_table)))
+
+
+def scan_lookup(database, identifier):
+    """
+    Lookup used before the `lower()` indexes, plus the query for the branch office.
+    """
+    user = User.objects.using(database).filter(Q(email=identifier) | Q(username=identifier)).first()
+    return user, user.branch_office
+
+
+def indexed_lookup(database, identifier):
+    user = User.objects.db_manager(database).by_login(identifier).select_related('branch_office').first()
+    return user, user.branch_office
+
+
+def explain(database, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connections[database].cursor() as cursor:
+        cursor.execute('EXPLAIN ANALYZE {0}'.format(sql), params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def measure(database, lookup, identifiers):
+    start = time.perf_counter()
+    for identifier in identifiers:
+        lookup(database, identifier)
+    return (time.perf_counter() - start) * 1000 / len(identifiers)
+
+
+def run(*args):
+    """
+    python manage.py runscript benchmark_login --script-args default 1000000 [clean]
+
+    Fills the database with `total` users (1M by default) and compares the login lookup before and after the
+    `lower()` indexes. Use a scratch database, `clean` deletes the users it created.
+    """
+    database = args[0] if args else 'default'
+    total = int(args[1]) if len(args) > 1 else 1000000
+
+    create_users(database, total)
+    numbers = [random.randrange(total) for _ in range(ROUNDS)]
+    emails = ['{0}{1}@example.com'.format(PREFIX, number) for number in numbers]
+    usernames = ['{0}{1}'.format(PREFIX, number).upper() for number in numbers]
+
+    identifier = emails[0]
+    print(explain(database, User.objects.using(database).filter(Q(email=identifier) | Q(username=identifier))))
+    print(explain(database, User.objects.db_manager(database).by_login(identifier).select_related('branch_office')))
+
+    print('Antes, correo: {0:.2f} ms'.format(measure(database, scan_lookup, emails)))
+    print('Indexado, correo: {0:.2f} ms'.format(measure(database, indexed_lookup, emails)))
+    print('Indexado, usuario en mayusculas: {0:.2f} ms'.format(measure(database, indexed_lookup, usernames)))
+
+    if 'clean' in args:
+        User.objects.using(database).filter(username__startswith=PREFIX).delete()
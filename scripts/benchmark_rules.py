@@ -0,0 +1,99 @@
+import ast
+import copy
+import random
+import time
+from decimal import Decimal
+from typing import Union
+
+from bunch import Bunch
+from django.conf import settings
+from money.money import Money
+
+from rc871_backend.utils.rules import compile_rule, rules, reduce
+
+RULE = """
+base = price * params.rate
+if 'fixed' in params:
+    base = base + params.fixed
+max(base, ZERO)
+"""
+
+
+def convert_expr2_expression(expr) -> ast.Expression:
+    expr.lineno = 0
+    expr.col_offset = 0
+    result = ast.Expression(expr.value, lineno=0, col_offset=0)
+
+    return result
+
+
+def legacy_exec_with_return(code: str, price: Union[Money, float], params: dict) -> any:
+    """
+    `exec_with_return` before the compiled rules, parses and compiles the rule on every call.
+    """
+    if 'fixed' in params:
+        params['fixed'] = Money(params['fixed'], settings.CURRENCY)
+
+    params = Bunch(params)
+    price = price
+
+    ZERO = Money('0', settings.CURRENCY)
+    currency = settings.CURRENCY
+    code_ast = ast.parse(code)
+
+    init_ast = copy.deepcopy(code_ast)
+    init_ast.body = code_ast.body[:-1]
+
+    last_ast = copy.deepcopy(code_ast)
+    last_ast.body = code_ast.body[-1:]
+    exec(compile(init_ast, "<ast>", "exec"), globals(), locals())
+    if type(last_ast.body[0]) == ast.Expr:
+        return eval(compile(convert_expr2_expression(last_ast.body[0]), "<ast>", "eval"), globals(), locals())
+    else:
+        exec(compile(last_ast, "<ast>", "exec"), globals(), locals())
+
+
+def make_rows(total):
+    rows = []
+    for _ in range(total):
+        params = {'rate': Decimal(random.choice(['0.01', '0.025', '0.05']))}
+        if random.random() < 0.5:
+            params['fixed'] = random.choice(['5', '10', '20'])
+        rows.append((Money(str(random.randrange(100, 10000)), settings.CURRENCY), params))
+    return rows
+
+
+def measure(label, function, total):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print('{0}: {1:.2f} us por fila'.format(label, elapsed * 1000000 / total))
+    return result
+
+
+def run(*args):
+    """
+    python manage.py runscript benchmark_rules --script-args 100000
+
+    Evaluates one pricing rule over `total` (price, params) rows with the previous `exec_with_return`, with the
+    compiled rule row by row, with `evaluate_many` and compiling on every row.
+    """
+    total = int(args[0]) if args else 100000
+    rows = make_rows(total)
+    rule = compile_rule(RULE)
+
+    expected = measure(
+        'Antes', lambda: [legacy_exec_with_return(RULE, price, dict(params)) for price, params in rows], total
+    )
+    compiled = measure('Compilada', lambda: [rule.evaluate(price, params) for price, params in rows], total)
+    many = measure('evaluate_many', lambda: rule.evaluate_many(rows), total)
+
+    def uncached():
+        result = []
+        for price, params in rows:
+            rules.clear()
+            result.append(compile_rule(RULE).evaluate(price, params))
+        return result
+
+    measure('Sin cache', uncached, total)
+    assert expected == compiled == many, 'Los resultados no coinciden'
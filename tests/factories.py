@@ -1,5 +1,7 @@
 import factory
 
+from apps.core.models import Use, Plan, Coverage, Premium, Mark, Model, Vehicle, Policy, PolicyCoverage
+from apps.payment.models import Bank, Payment, TRANSFER
 from apps.security.models import User
 
 
@@ -13,3 +15,120 @@ class UserAdminFactory(factory.django.DjangoModelFactory):
     email = "admin@admin.com"
     is_staff = True
     is_superuser = True
+
+
+class ClientFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = User
+
+    username = factory.Sequence(lambda n: 'client{0}'.format(n))
+    name = 'Client'
+    last_name = 'User'
+    email = factory.Sequence(lambda n: 'client{0}@example.com'.format(n))
+
+
+class UseFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Use
+
+    code = factory.Sequence(lambda n: 'U{0}'.format(n))
+    description = factory.Sequence(lambda n: 'Use {0}'.format(n))
+
+
+class PlanFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Plan
+
+    code = factory.Sequence(lambda n: 'P{0}'.format(n))
+    description = factory.Sequence(lambda n: 'Plan {0}'.format(n))
+
+
+class CoverageFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Coverage
+
+    code = factory.Sequence(lambda n: 'C{0}'.format(n))
+    description = factory.Sequence(lambda n: 'Coverage {0}'.format(n))
+
+
+class PremiumFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Premium
+
+    coverage = factory.SubFactory(CoverageFactory)
+    use = factory.SubFactory(UseFactory)
+    plan = factory.SubFactory(PlanFactory)
+    insured_amount = 1000
+    cost = 10
+
+
+class MarkFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Mark
+
+    description = factory.Sequence(lambda n: 'Mark {0}'.format(n))
+
+
+class ModelFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Model
+
+    mark = factory.SubFactory(MarkFactory)
+    description = factory.Sequence(lambda n: 'Model {0}'.format(n))
+
+
+class VehicleFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Vehicle
+
+    model = factory.SubFactory(ModelFactory)
+    use = factory.SubFactory(UseFactory)
+    taker = factory.SubFactory(ClientFactory)
+    license_plate = factory.Sequence(lambda n: 'AB{0:04d}'.format(n))
+
+
+class PolicyFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Policy
+
+    taker = factory.SubFactory(ClientFactory)
+    adviser = factory.SubFactory(ClientFactory, is_staff=True, is_adviser=True)
+    created_by = factory.SelfAttribute('adviser')
+    vehicle = factory.SubFactory(VehicleFactory, taker=factory.SelfAttribute('..taker'))
+    plan = factory.SubFactory(PlanFactory)
+    total_amount = 20
+    total_insured_amount = 2000
+    change_factor = 5
+
+
+class PolicyCoverageFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = PolicyCoverage
+
+    number = factory.Sequence(lambda n: n + 1)
+    policy = factory.SubFactory(PolicyFactory)
+    coverage = factory.SubFactory(CoverageFactory)
+    insured_amount = 1000
+    cost = 10
+
+
+class BankFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Bank
+
+    code = factory.Sequence(lambda n: 'B{0}'.format(n))
+    description = factory.Sequence(lambda n: 'Bank {0}'.format(n))
+    methods = [TRANSFER]
+    coins = ['USD']
+
+
+class PaymentFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Payment
+
+    number = factory.Sequence(lambda n: n + 1)
+    amount = 20
+    bank = factory.SubFactory(BankFactory)
+    policy = factory.SubFactory(PolicyFactory)
+    user = factory.SelfAttribute('policy.taker')
+    change_factor = 5
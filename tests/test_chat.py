@@ -0,0 +1,111 @@
+import json
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+
+from apps.chat.models import Message, Room, RoomMessage
+from apps.chat.routing import websocket_urlpatterns
+from apps.chat.services import get_room, room_group_name, history
+from tests.factories import UserAdminFactory, ClientFactory
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+def with_user(application, user):
+    async def app(scope, receive, send):
+        return await application(dict(scope, user=user), receive, send)
+    return app
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, CHAT_WRITER_BATCH_SIZE=2)
+class ChatTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = UserAdminFactory.create()
+        self.application = with_user(URLRouter(websocket_urlpatterns), self.user)
+
+    def test_messages_written_in_batches(self):
+        async def chat():
+            communicator = WebsocketCommunicator(self.application, '/ws/chat/general/')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            for text, writing in [('ho', True), ('hola', False), ('que tal', False), ('adios', False)]:
+                await communicator.send_to(text_data=json.dumps({'text': text, 'writing': writing}))
+                data = json.loads(await communicator.receive_from())
+                self.assertEqual(data['user_id'], str(self.user.id))
+                self.assertEqual(data['writing'], writing)
+            await communicator.disconnect()
+
+        async_to_sync(chat)()
+        self.assertEqual(
+            sorted(Message.objects.values_list('text', flat=True)), ['adios', 'hola', 'que tal']
+        )
+        self.assertEqual(RoomMessage.objects.count(), 3)
+
+    def create_history(self, count):
+        room = get_room(room_group_name('general'), create=True)
+        for number in range(count):
+            message = Message.objects.create(type='chat_message', user=self.user, text=str(number))
+            RoomMessage.objects.create(room=room, message=message, created=message.created)
+        return room
+
+    def test_history(self):
+        self.create_history(5)
+        self.client.force_login(self.user)
+        texts = []
+        url = '/api/chat/message/?room=general&limit=2'
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 2)
+            texts += [row['text'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(texts, ['4', '3', '2', '1', '0'])
+
+    def test_history_load_more(self):
+        room = self.create_history(3)
+        rows, cursor = history(room.id, limit=2)
+        self.assertEqual([row.message.text for row in rows], ['2', '1'])
+
+        async def chat():
+            communicator = WebsocketCommunicator(self.application, '/ws/chat/general/')
+            await communicator.connect()
+            await communicator.send_to(text_data=json.dumps({'type': 'load_more', 'cursor': cursor}))
+            data = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return data
+
+        data = async_to_sync(chat)()
+        self.assertEqual([row['text'] for row in data['results']], ['0'])
+        self.assertIsNone(data['cursor'])
+
+    def test_staff_only_room(self):
+        room = get_room(room_group_name('admin'), create=True)
+        room.staff_only = True
+        room.save(update_fields=['staff_only'])
+        client = ClientFactory.create()
+
+        async def connect(user):
+            communicator = WebsocketCommunicator(with_user(URLRouter(websocket_urlpatterns), user), '/ws/chat/admin/')
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        self.assertFalse(async_to_sync(connect)(client))
+        self.assertTrue(async_to_sync(connect)(self.user))
+
+    def test_room_flagged_staff_only(self):
+        # Una sala marcada a mano como solo staff no se duplica al conectar
+        room = get_room(room_group_name('general'), create=True)
+        room.staff_only = True
+        room.save(update_fields=['staff_only'])
+        client = ClientFactory.create()
+
+        async def connect():
+            communicator = WebsocketCommunicator(with_user(URLRouter(websocket_urlpatterns), client), '/ws/chat/general/')
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        self.assertFalse(async_to_sync(connect)())
+        self.assertEqual(Room.objects.filter(title='general').count(), 1)
@@ -0,0 +1,62 @@
+import io
+import json
+
+from django.core.exceptions import MultipleObjectsReturned
+from django.test import TestCase
+from openpyxl import Workbook
+
+from apps.core.admin import UseResource
+from apps.core.models import Use
+from rc871_backend.utils.imports import read_file, import_rows, CachedForeignKeyWidget
+from tests.factories import UseFactory
+
+HEADERS = ['Descripcion', 'Activo', 'Código']
+ROWS = [['Particular', 1, 'U1'], ['Carga', 0, 'U2']]
+
+
+class ImportTestCase(TestCase):
+    def import_file(self, content: bytes, name):
+        headers, rows = read_file(io.BytesIO(content), name)
+        return import_rows(UseResource(), headers, rows)
+
+    def assertImported(self, report, success, descriptions):
+        self.assertTrue(success, report)
+        self.assertEqual(report['total_rows'], len(descriptions))
+        self.assertEqual(sorted(Use.objects.values_list('description', flat=True)), sorted(descriptions))
+
+    def test_import_csv(self):
+        content = '\r\n'.join(','.join(str(value) for value in row) for row in [HEADERS] + ROWS)
+        report, success = self.import_file(content.encode('utf-8'), 'usos.csv')
+        self.assertImported(report, success, ['Particular', 'Carga'])
+        self.assertEqual(Use.objects.get(code='U2').is_active, False)
+
+    def test_import_xlsx(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in [HEADERS] + ROWS + [[None, None, None]]:
+            sheet.append(row)
+        content = io.BytesIO()
+        workbook.save(content)
+        report, success = self.import_file(content.getvalue(), 'usos.xlsx')
+        self.assertImported(report, success, ['Particular', 'Carga'])
+
+    def test_import_json(self):
+        content = json.dumps({'headers': HEADERS, 'data': ROWS})
+        report, success = self.import_file(content.encode('utf-8'), 'data.json')
+        self.assertImported(report, success, ['Particular', 'Carga'])
+
+    def test_import_malformed_csv(self):
+        # Lineas en blanco, una fila corta y una larga
+        content = 'Descripcion,Activo,Código\r\nParticular,1,U1\r\n\r\nCarga,0\r\nTaxi,1,U3,sobra\r\n\r\n'
+        report, success = self.import_file(content.encode('utf-8'), 'usos.csv')
+        self.assertImported(report, success, ['Particular', 'Carga', 'Taxi'])
+        self.assertEqual(Use.objects.get(description='Taxi').code, 'U3')
+
+    def test_cached_foreign_key_ambiguous(self):
+        # Una descripcion repetida no se resuelve desde el cache con cualquiera de las filas
+        particular = UseFactory.create(description='Particular')
+        UseFactory.create_batch(2, description='Carga')
+        widget = CachedForeignKeyWidget(Use, 'description')
+        self.assertEqual(widget.clean('Particular'), particular)
+        with self.assertRaises(MultipleObjectsReturned):
+            widget.clean('Carga')
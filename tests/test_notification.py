@@ -0,0 +1,55 @@
+from django.test import TestCase, override_settings
+from fcm_django.models import FCMDevice
+
+from apps.system.models import Notification
+from apps.system.services import enqueue_notification, dispatch_notification
+from tests.factories import UserAdminFactory
+
+
+class StubPushClient:
+    batches = []
+    fail = False
+
+    def send(self, notification, tokens):
+        if StubPushClient.fail:
+            raise ConnectionError('push service down')
+        StubPushClient.batches.append(list(tokens))
+        return [token for token in tokens if token.startswith('dead')]
+
+
+@override_settings(PUSH_CLIENT='tests.test_notification.StubPushClient', PUSH_BATCH_SIZE=2)
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        StubPushClient.batches = []
+        StubPushClient.fail = False
+        self.user = UserAdminFactory.create()
+        for token in ['a', 'b', 'dead-c', 'd', 'e']:
+            FCMDevice.objects.create(user=self.user, registration_id=token, type='android', active=True)
+
+    def test_dispatch_in_batches(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            notification = enqueue_notification('Titulo', 'Cuerpo', [self.user])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(StubPushClient.batches, [])
+
+        self.assertTrue(dispatch_notification(notification.pk))
+        self.assertEqual(StubPushClient.batches, [['a', 'b'], ['d', 'dead-c'], ['e']])
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, Notification.SENT)
+        self.assertEqual((notification.sent, notification.deactivated), (5, 1))
+        self.assertFalse(FCMDevice.objects.get(registration_id='dead-c').active)
+        # Ya enviada, no se repite
+        self.assertFalse(dispatch_notification(notification.pk))
+
+    def test_retry_after_failure(self):
+        with self.captureOnCommitCallbacks():
+            notification = enqueue_notification('Titulo', 'Cuerpo', [self.user.pk])
+        StubPushClient.fail = True
+        self.assertFalse(dispatch_notification(notification.pk))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), (Notification.FAILED, 1))
+
+        StubPushClient.fail = False
+        self.assertTrue(dispatch_notification(notification.pk))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts, notification.sent), (Notification.SENT, 2, 5))
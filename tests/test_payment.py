@@ -0,0 +1,58 @@
+from django.test import TestCase
+
+from apps.core.models import Policy
+from apps.payment.models import Payment
+from apps.payment.services import approve_payments, reject_payments
+from tests.factories import PolicyFactory, PaymentFactory
+
+
+class PaymentServicesTestCase(TestCase):
+    def create_policy(self, payments):
+        policy = PolicyFactory.create()
+        return policy, PaymentFactory.create_batch(payments, policy=policy)
+
+    def assertPassed(self, policy):
+        policy.refresh_from_db()
+        self.assertEqual(policy.status, Policy.PASSED)
+        self.assertIsNotNone(policy.number)
+        self.assertIsNotNone(policy.due_date)
+        self.assertEqual(policy.file_status, Policy.FILE_RENDERING)
+
+    def test_approve_payments_matches_signals(self):
+        # Camino anterior: guardar el pago dispara post_save_payment y post_save_policy
+        signal_policy, (signal_payment,) = self.create_policy(1)
+        with self.captureOnCommitCallbacks():
+            signal_payment.status = Payment.ACCEPTED
+            signal_payment.save()
+        self.assertPassed(signal_policy)
+
+        paid, (paid_payment,) = self.create_policy(1)
+        pending, (approved, still_pending) = self.create_policy(2)
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(approve_payments([paid_payment.id, approved.id]), 2)
+
+        self.assertPassed(paid)
+        self.assertNotEqual(paid.number, signal_policy.number)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, Policy.PENDING_APPROVAL)
+        self.assertIsNone(pending.number)
+        self.assertEqual(pending.file_status, Policy.FILE_NONE)
+        self.assertEqual(
+            dict(Payment.objects.filter(policy=pending).values_list('id', 'status')),
+            {approved.id: Payment.ACCEPTED, still_pending.id: Payment.PENDING}
+        )
+
+        # Aprobar el pago restante pasa la poliza
+        with self.captureOnCommitCallbacks():
+            approve_payments([still_pending.id])
+        self.assertPassed(pending)
+
+    def test_reject_payments(self):
+        policy, (payment,) = self.create_policy(1)
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(reject_payments([payment.id], 'Referencia invalida'), 1)
+        payment.refresh_from_db()
+        policy.refresh_from_db()
+        self.assertEqual((payment.status, payment.commentary), (Payment.REJECTED, 'Referencia invalida'))
+        self.assertEqual(policy.status, Policy.PAYMENT_REJECTED)
+        self.assertIsNone(policy.number)
@@ -0,0 +1,206 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.analytics.services import refresh_rollups
+from apps.core.models import Policy, BranchOffice
+from apps.core.pdf import ready_status
+from apps.core.search import refresh_related_documents
+from apps.core.services import policy_branch_office_days
+from apps.core.tasks import render_policy_pdf
+from apps.payment.models import Payment
+from rc871_backend.pagination import encode_cursor
+from tests.factories import UserAdminFactory, UseFactory, PlanFactory, CoverageFactory, PremiumFactory, \
+    PolicyFactory, PolicyCoverageFactory, PaymentFactory
+
+
+class PolicyQueriesTestCase(TestCase):
+    def setUp(self):
+        self.user = UserAdminFactory.create()
+        self.client.force_login(self.user)
+        self.use = UseFactory.create()
+        self.plan = PlanFactory.create()
+        self.plan.uses.add(self.use)
+        self.coverages = CoverageFactory.create_batch(2)
+        for coverage in self.coverages:
+            coverage.plans.add(self.plan)
+            PremiumFactory.create(coverage=coverage, use=self.use, plan=self.plan)
+
+    def create_policies(self, count):
+        for _ in range(count):
+            policy = PolicyFactory.create(plan=self.plan, vehicle__use=self.use)
+            for coverage in self.coverages:
+                PolicyCoverageFactory.create(policy=policy, coverage=coverage)
+            PaymentFactory.create(policy=policy)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertBoundedQueries(self, url):
+        self.create_policies(2)
+        self.count_queries(url)
+        few = self.count_queries(url)
+        self.create_policies(8)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+
+    def test_policy_list_queries(self):
+        self.assertBoundedQueries('/api/core/policy/')
+
+    def test_payment_list_queries(self):
+        self.assertBoundedQueries('/api/payment/payment/')
+
+    def test_policy_list_cursor(self):
+        self.create_policies(5)
+        pages = []
+        url = '/api/core/policy/?cursor=&limit=2'
+        while url:
+            data = self.client.get(url).json()
+            self.assertIsNone(data['count'])
+            pages.append(data)
+            url = data['next']
+        ids = [policy['id'] for page in pages for policy in page['results']]
+        expected = Policy.objects.order_by('-created', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+        self.assertEqual(len(set(ids)), self.client.get('/api/core/policy/').json()['count'])
+
+        # `previous` devuelve la pagina anterior
+        self.assertIsNone(pages[0]['previous'])
+        for index, page in enumerate(pages[1:]):
+            previous = self.client.get(page['previous']).json()
+            self.assertEqual(previous['results'], pages[index]['results'])
+
+        for cursor in ['garbage', encode_cursor(['x', 'y']), encode_cursor(['x'])]:
+            response = self.client.get('/api/core/policy/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+    def test_payment_list_cursor(self):
+        # Los numeros de pago salen de bloques por proceso, el orden es por fecha de creacion
+        self.create_policies(3)
+        ids = []
+        url = '/api/payment/payment/?cursor=&limit=2'
+        while url:
+            data = self.client.get(url).json()
+            ids += [payment['id'] for payment in data['results']]
+            url = data['next']
+        expected = Payment.objects.order_by('-created', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+
+    def test_policy_list_streaming(self):
+        self.create_policies(3)
+        response = self.client.get('/api/core/policy/?not_paginator=true')
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), 3)
+
+        with self.settings(UNPAGINATED_MAX_ROWS=2):
+            response = self.client.get('/api/core/policy/?not_paginator=true')
+        self.assertEqual(response.status_code, 400)
+
+    def test_policy_search(self):
+        self.create_policies(3)
+        policy = Policy.objects.select_related('taker').first()
+        self.assertIn(policy.taker.name.lower(), policy.search_document)
+
+        data = self.client.get('/api/core/policy/', {'search': policy.taker.name.upper()}).json()
+        self.assertIn(str(policy.id), [row['id'] for row in data['results']])
+
+        policy.vehicle.model.mark.description = 'Marca buscada'
+        policy.vehicle.model.mark.save()
+        refresh_related_documents('core.Policy', 'vehicle__model__mark', policy.vehicle.model.mark_id)
+        data = self.client.get('/api/core/policy/', {'search': 'marca buscada'}).json()
+        self.assertEqual([row['id'] for row in data['results']], [str(policy.id)])
+
+    def test_policy_pdf_marked_stale_on_write(self):
+        policy = PolicyFactory.create(plan=self.plan, vehicle__use=self.use)
+        Policy.objects.filter(pk=policy.pk).update(file_status=Policy.FILE_READY, file_hash='hash')
+        policy.refresh_from_db()
+
+        policy.file_hash = 'other'
+        policy.save(update_fields=['file_hash'])
+        self.assertEqual(Policy.objects.get(pk=policy.pk).file_status, Policy.FILE_READY)
+
+        policy.total_amount = 30
+        policy.save(update_fields=['total_amount'])
+        self.assertEqual(policy.file_status, Policy.FILE_NONE)
+        self.assertEqual(Policy.objects.get(pk=policy.pk).file_status, Policy.FILE_NONE)
+
+        Policy.objects.filter(pk=policy.pk).update(file_status=Policy.FILE_READY)
+        PolicyCoverageFactory.create(policy=policy, coverage=self.coverages[0])
+        self.assertEqual(Policy.objects.get(pk=policy.pk).file_status, Policy.FILE_NONE)
+
+    def test_policy_save_skips_unchanged_document(self):
+        policy = PolicyFactory.create(plan=self.plan, vehicle__use=self.use)
+        policy = Policy.objects.get(pk=policy.pk)
+        policy.total_amount = 30
+        # Solo el UPDATE, las relaciones del documento no se leen
+        with self.assertNumQueries(1):
+            policy.save()
+
+        policy.taker = self.user
+        policy.save()
+        self.assertIn('admin', Policy.objects.get(pk=policy.pk).search_document)
+
+    def test_policy_pdf_lost_render_queued_again(self):
+        policy = PolicyFactory.create(plan=self.plan, vehicle__use=self.use, status=Policy.PASSED, number=1)
+        lost = timezone.now() - timedelta(seconds=settings.PDF_RENDER_TIMEOUT + 1)
+        Policy.objects.filter(pk=policy.pk).update(file_status=Policy.FILE_RENDERING, file_requested=lost)
+
+        url = '/api/core/policy/{0}/pdf/'.format(policy.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.client.get(url).status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        requested = Policy.objects.get(pk=policy.pk).file_requested
+        self.assertGreater(requested, lost)
+
+        # Recien encolada no se repite
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.client.get(url).status_code, 202)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Policy.objects.get(pk=policy.pk).file_requested, requested)
+
+    def test_policy_pdf_render_not_passed(self):
+        policy = PolicyFactory.create(plan=self.plan, vehicle__use=self.use)
+        Policy.objects.filter(pk=policy.pk).update(file_status=Policy.FILE_RENDERING)
+        self.assertFalse(render_policy_pdf(str(policy.pk)))
+        self.assertEqual(Policy.objects.get(pk=policy.pk).file_status, Policy.FILE_NONE)
+
+    def test_policy_pdf_edited_while_rendering(self):
+        policy = PolicyFactory.create(plan=self.plan, vehicle__use=self.use)
+        Policy.objects.filter(pk=policy.pk).update(file_status=Policy.FILE_RENDERING)
+        rendering = Policy.objects.get(pk=policy.pk)
+
+        edited = Policy.objects.get(pk=policy.pk)
+        edited.total_amount = 30
+        edited.save()
+        edited = Policy.objects.get(pk=policy.pk)
+        self.assertEqual(edited.file_status, Policy.FILE_RENDERING)
+        self.assertEqual(edited.file_version, rendering.file_version + 1)
+
+        # El render que leyo la version anterior no deja el pdf listo
+        Policy.objects.filter(pk=policy.pk).update(file_status=ready_status(rendering.file_version))
+        self.assertEqual(Policy.objects.get(pk=policy.pk).file_status, Policy.FILE_NONE)
+        Policy.objects.filter(pk=policy.pk).update(file_status=ready_status(edited.file_version))
+        self.assertEqual(Policy.objects.get(pk=policy.pk).file_status, Policy.FILE_READY)
+
+    def test_policy_branch_office_daily(self):
+        # La serie diaria sale del acumulado de analytics, los no superusuarios solo ven lo que crearon
+        office = BranchOffice.objects.create(description='Centro')
+        first = PolicyFactory.create(adviser__branch_office=office)
+        PolicyFactory.create_batch(2, adviser__branch_office=office)
+        refresh_rollups(full=True)
+
+        response = self.client.get('/api/core/home/policy_for_branch_office_daily/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'day': timezone.localdate().isoformat(), 'branch_office': str(office.id), 'quantity': 3}
+        ])
+        self.assertEqual([row['quantity'] for row in policy_branch_office_days(first.created_by)], [1])
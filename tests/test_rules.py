@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from money.money import Money
+
+from rc871_backend.utils.rules import exec_with_return, evaluate_many, compile_rule, RuleCache
+
+RULE = """
+base = price * params.rate
+if 'fixed' in params:
+    base = base + params.fixed
+max(base, ZERO)
+"""
+
+
+class RulesTestCase(SimpleTestCase):
+    def test_exec_with_return(self):
+        price = Money('100', settings.CURRENCY)
+        params = {'rate': Decimal('0.5'), 'fixed': '10'}
+        self.assertEqual(exec_with_return(RULE, price, params), Money('60', settings.CURRENCY))
+        # Los parametros del llamador no cambian
+        self.assertEqual(params['fixed'], '10')
+        self.assertIsNone(exec_with_return('total = price * 2', 1, {}))
+        self.assertEqual(exec_with_return('values = [1, 2]\nsum(value * price for value in values)', 2, {}), 6)
+
+    def test_evaluate_many(self):
+        rows = [(Money(str(amount), settings.CURRENCY), {'rate': Decimal('0.1')}) for amount in (10, 20, 30)]
+        self.assertEqual(
+            evaluate_many(RULE, rows), [Money(str(amount), settings.CURRENCY) for amount in (1, 2, 3)]
+        )
+        self.assertIs(compile_rule(RULE), compile_rule(RULE))
+
+    def test_restricted_namespace(self):
+        with self.assertRaises(ImportError):
+            exec_with_return('import os', 1, {})
+        with self.assertRaises(NameError):
+            exec_with_return('open("/etc/passwd")', 1, {})
+
+    def test_cache_bounded(self):
+        cache = RuleCache(2)
+        first = cache.get('1')
+        cache.get('2')
+        cache.get('1')
+        cache.get('3')
+        self.assertEqual(len(cache.rules), 2)
+        self.assertIs(cache.get('1'), first)
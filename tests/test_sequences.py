@@ -0,0 +1,20 @@
+from django.test import TransactionTestCase
+
+from rc871_backend.utils.sequences import SequenceAllocator
+
+
+class SequenceAllocatorTestCase(TransactionTestCase):
+    def test_blocks_not_shared(self):
+        # Dos asignadores del mismo nombre hacen de dos procesos
+        first = SequenceAllocator('test_allocator', block_size=5)
+        second = SequenceAllocator('test_allocator', block_size=5)
+
+        self.assertEqual([first.next_value() for _ in range(3)], [1, 2, 3])
+        self.assertEqual([second.next_value() for _ in range(3)], [6, 7, 8])
+        self.assertEqual(first.next_values(4), [4, 5, 11, 12])
+        self.assertEqual(second.next_values(2), [9, 10])
+
+    def test_gapless(self):
+        allocator = SequenceAllocator('test_gapless', gapless=True)
+        self.assertEqual([allocator.next_value(), allocator.next_value()], [1, 2])
+        self.assertEqual(allocator.next_values(3), [3, 4, 5])
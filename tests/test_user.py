@@ -1,6 +1,9 @@
+import uuid
+
 from django.test import TestCase, Client
 
-from apps.security.models import User
+from apps.security.models import User, Module, Workflow, Role
+from apps.security.services import get_workflows, compute_workflows, compact_workflows
 from tests.factories import UserAdminFactory
 
 
@@ -25,6 +28,41 @@ class UserTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_login_email_ignores_case(self):
+        self.user.set_password('admin123')
+        self.user.save(update_fields=['password'])
+        response = self.c.post(
+            '/api/token/',
+            {
+                "username": "Admin@Admin.com",
+                "password": "admin123"
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_ambiguous_case(self):
+        self.user.set_password('admin123')
+        self.user.save(update_fields=['password'])
+        other = User.objects.create(username='Admin', email='admin@example.com', name='Other', last_name='User')
+        other.set_password('other123')
+        other.save(update_fields=['password'])
+
+        for username, password in [('admin', 'admin123'), ('ADMIN', 'admin123'), ('Admin', 'other123')]:
+            response = self.c.post('/api/token/', {"username": username, "password": password})
+            self.assertEqual(response.status_code, 200, username)
+
+    def test_token_revoked_with_jwt_id(self):
+        self.user.set_password('admin123')
+        self.user.save(update_fields=['password'])
+        token = self.c.post('/api/token/', {"username": "admin", "password": "admin123"}).json()['token']
+        headers = {'HTTP_AUTHORIZATION': 'Bearer {0}'.format(token)}
+        self.assertEqual(self.c.get('/api/security/user/', **headers).status_code, 200)
+        self.assertEqual(self.c.get('/api/security/user/', **headers).status_code, 200)
+
+        self.user.jwt_id = uuid.uuid4()
+        self.user.save(update_fields=['jwt_id'])
+        self.assertEqual(self.c.get('/api/security/user/', **headers).status_code, 401)
+
     def test_user_list(self):
         self.user.set_password('admin123')
         self.user.save(update_fields=['password'])
@@ -54,3 +92,24 @@ class UserTestCase(TestCase):
         self.assertEqual(client.is_staff, False)
         self.assertEqual(client.is_adviser, False)
 
+    def test_workflows(self):
+        module = Module.objects.create(title='Pólizas')
+        own = Workflow.objects.create(module=module, title='Pólizas', url='policies')
+        granted = Workflow.objects.create(module=module, title='Pagos', url='payments')
+        role = Role.objects.create(name='Asesor')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_work_flows.add(own)
+            self.user.roles.add(role)
+        self.assertEqual(get_workflows(self.user)[0]['workflows'], [
+            {'id': str(own.id), 'title': 'Pólizas', 'url': 'policies', 'icon': None}
+        ])
+
+        # El cambio del rol invalida los menus cacheados de sus usuarios
+        with self.captureOnCommitCallbacks(execute=True):
+            role.workflows.add(granted)
+        urls = [workflow['url'] for workflow in get_workflows(self.user)[0]['workflows']]
+        self.assertEqual(urls, ['policies', 'payments'])
+        self.assertEqual(get_workflows(self.user), compute_workflows(self.user))
+        self.assertEqual(compact_workflows(compute_workflows(self.user)), [
+            ['Pólizas', None, [['Pólizas', 'policies', None], ['Pagos', 'payments', None]]]
+        ])